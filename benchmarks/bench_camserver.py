@@ -0,0 +1,99 @@
+"""Loopback throughput benchmark for the image transfer of the camera server.
+
+Compares sending images as pickled responses (the old protocol) with the
+framed protocol in `instamatic.server.framing`, where the image data are
+sent as raw bytes and received directly into a (reusable) numpy array.
+
+To use:
+    Run `python benchmarks/bench_camserver.py`
+
+A server thread on localhost sends the same image `--frames` times for
+each image size, and the client reports frames/s and MB/s.
+"""
+import argparse
+import pickle
+import socket
+import threading
+import time
+
+import numpy as np
+
+from instamatic.server.framing import array_header
+from instamatic.server.framing import is_array_header
+from instamatic.server.framing import recv_array
+from instamatic.server.framing import recv_frame
+from instamatic.server.framing import send_array
+from instamatic.server.framing import send_frame
+
+
+def serve(server: socket.socket, arr: np.ndarray, mode: str) -> None:
+    """Answer every request on the first connection with image `arr`."""
+    conn, addr = server.accept()
+    with conn:
+        while recv_frame(conn):
+            if mode == 'pickle':
+                send_frame(conn, pickle.dumps((200, arr)))
+            else:
+                send_frame(conn, pickle.dumps((200, array_header(arr))))
+                send_array(conn, arr)
+
+
+def run(arr: np.ndarray, mode: str, frames: int) -> float:
+    """Request `frames` images from a local server thread, returns the time
+    in seconds."""
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(('localhost', 0))
+    server.listen(1)
+
+    thread = threading.Thread(target=serve, args=(server, arr, mode), daemon=True)
+    thread.start()
+
+    client = socket.create_connection(server.getsockname())
+    request = pickle.dumps({'attr_name': 'getImage', 'args': (), 'kwargs': {}})
+
+    out = None
+
+    t0 = time.perf_counter()
+    for i in range(frames):
+        send_frame(client, request)
+        status, data = pickle.loads(recv_frame(client))
+        if is_array_header(data):
+            out = recv_array(client, out=out, **data)
+    t1 = time.perf_counter()
+
+    client.close()
+    thread.join()
+    server.close()
+
+    return t1 - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+
+    parser.add_argument('-n', '--frames', action='store', type=int, dest='frames',
+                        help='Number of frames to transfer per run (default: %(default)s)')
+    parser.add_argument('-s', '--sizes', action='store', type=int, nargs='+', dest='sizes',
+                        help='Image sizes (pixels along one edge) (default: %(default)s)')
+    parser.add_argument('-d', '--dtype', action='store', type=str, dest='dtype',
+                        help='Image data type (default: %(default)s)')
+
+    parser.set_defaults(frames=200, sizes=(512, 1024, 2048, 4096), dtype='uint16')
+    options = parser.parse_args()
+
+    print(f'{"size":>10s} {"mode":>8s} {"frames/s":>10s} {"MB/s":>10s}')
+
+    for size in options.sizes:
+        arr = np.random.randint(0, 1000, size=(size, size)).astype(options.dtype)
+        frames = max(10, int(options.frames * (512 / size)**2))
+
+        for mode in ('pickle', 'framed'):
+            dt = run(arr, mode=mode, frames=frames)
+            fps = frames / dt
+            mbps = fps * arr.nbytes / 1024**2
+            print(f'{size:>4d}x{size:<5d} {mode:>8s} {fps:10.1f} {mbps:10.1f}')
+
+
+if __name__ == '__main__':
+    main()
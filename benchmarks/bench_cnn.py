@@ -0,0 +1,69 @@
+"""Benchmark for scoring diffraction patterns with the crystal-quality CNN
+(`instamatic.neural_network`).
+
+To use:
+    Run `python benchmarks/bench_cnn.py`
+
+Compares the loop-based layers (one image at a time) with the batched
+engine (`predict_batch`) in float64 and float32, and reports the largest
+deviation of the scores from the reference.
+"""
+import argparse
+import time
+
+import numpy as np
+
+
+def predict_loop(image, weights):
+    from instamatic.neural_network.neural_network import conv_layer
+    from instamatic.neural_network.neural_network import logistic
+    from instamatic.neural_network.neural_network import max_pooling
+    from instamatic.neural_network.neural_network import relu
+
+    x = image
+    for i in range(0, 8, 2):
+        x = max_pooling(relu(conv_layer(x, weights[i], weights[i + 1])))
+    x = relu(conv_layer(x, weights[8], weights[9]))
+    flattened = x.reshape((1, 1600))
+    dense1 = relu(np.tensordot(flattened, weights[10], axes=(1, 0)) + weights[11])
+    dense2 = relu(np.tensordot(dense1, weights[12], axes=(1, 0)) + weights[13])
+    dense3 = np.tensordot(dense2, weights[14], axes=(1, 0)) + weights[15]
+    return logistic(dense3)[0][0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+
+    parser.add_argument('-n', '--images', action='store', type=int, dest='n_images',
+                        help='Number of images to score (default: %(default)s)')
+
+    parser.set_defaults(n_images=16)
+    options = parser.parse_args()
+
+    from instamatic.neural_network import predict_batch
+    from instamatic.neural_network.neural_network import weights
+
+    rng = np.random.default_rng(0)
+    images = rng.random((options.n_images, 150, 150, 1)) * 0.05
+
+    t0 = time.perf_counter()
+    reference = np.array([predict_loop(image, weights) for image in images])
+    t1 = time.perf_counter()
+    reference_time = t1 - t0
+
+    print(f'{options.n_images} images of 150x150')
+    print(f'{"":20s} {"ms/image":>10s} {"speedup":>8s} {"max error":>10s}')
+    print(f'{"loop":20s} {reference_time / options.n_images * 1000:10.1f} {1:7.1f}x {0:10.1e}')
+
+    for name, dtype in (('batch (float64)', np.float64), ('batch (float32)', np.float32)):
+        t0 = time.perf_counter()
+        scores = predict_batch(images, dtype=dtype)
+        t1 = time.perf_counter()
+        dt = t1 - t0
+        error = np.abs(scores - reference).max()
+        print(f'{name:20s} {dt / options.n_images * 1000:10.1f} {reference_time / dt:7.1f}x {error:10.1e}')
+
+
+if __name__ == '__main__':
+    main()
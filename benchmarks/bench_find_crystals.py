@@ -0,0 +1,125 @@
+"""Benchmark for the segmentation engines of the crystal finder
+(`instamatic.processing.find_crystals`).
+
+To use:
+    Run `python benchmarks/bench_find_crystals.py [IMG ...]`
+
+Runs `find_crystals` with the `random_walker` and `watershed` engines on
+the given images (any format supported by `instamatic.formats`), or on
+synthetic images if none are given. Reports the time per step, and the
+agreement of the watershed segmentation and crystal positions with the
+random walker.
+"""
+import argparse
+from collections import defaultdict
+
+import numpy as np
+
+
+def synthetic_images(n: int, size: int = 512):
+    """Generate images with dark, randomly placed crystals on a bright
+    background."""
+    rng = np.random.default_rng(0)
+    yy, xx = np.mgrid[:size, :size]
+
+    for i in range(n):
+        img = np.full((size, size), 200.0)
+        for j in range(rng.integers(5, 20)):
+            cx, cy = rng.integers(20, size - 20, size=2)
+            rx, ry = rng.integers(4, 20, size=2)
+            img[((xx - cx) / rx)**2 + ((yy - cy) / ry)**2 < 1] = rng.uniform(30, 120)
+        yield f'synthetic_{i}', img + rng.normal(0, 8, size=(size, size))
+
+
+def stored_images(fns):
+    from instamatic.formats import read_image
+
+    for fn in fns:
+        img, h = read_image(fn)
+        yield fn, img
+
+
+def match_positions(xy0, xy1, tolerance: float) -> tuple:
+    """Return the fraction of positions in `xy0` that have a neighbour in
+    `xy1` within `tolerance`, and the mean distance of the matches."""
+    if len(xy0) == 0 or len(xy1) == 0:
+        return float(len(xy0) == len(xy1)), 0.0
+
+    distances = np.linalg.norm(xy0[:, None] - xy1[None], axis=-1).min(axis=1)
+    matched = distances < tolerance
+    return matched.mean(), distances[matched].mean() if matched.any() else np.nan
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+
+    parser.add_argument('args', type=str, nargs='*', metavar='IMG',
+                        help='Images to find crystals in (default: synthetic images)')
+    parser.add_argument('-n', '--images', action='store', type=int, dest='n_images',
+                        help='Number of synthetic images (default: %(default)s)')
+    parser.add_argument('-m', '--magnification', action='store', type=int, dest='magnification',
+                        help='Magnification (mag1) to look up the pixelsize (default: first in the calibration)')
+    parser.add_argument('-t', '--tolerance', action='store', type=float, dest='tolerance',
+                        help='Distance (px) within which crystal positions agree (default: %(default)s)')
+
+    parser.set_defaults(n_images=10, magnification=None, tolerance=5.0)
+    options = parser.parse_args()
+
+    from instamatic import config
+    from instamatic.image_utils import autoscale
+    from instamatic.processing.find_crystals import find_crystals
+    from instamatic.processing.find_crystals import segment_crystals
+
+    magnification = options.magnification or next(iter(config.calibration['mag1']['pixelsize']))
+
+    if options.args:
+        images = stored_images(options.args)
+    else:
+        images = synthetic_images(options.n_images)
+
+    methods = ('random_walker', 'watershed')
+    timings = {method: defaultdict(float) for method in methods}
+    agreement = defaultdict(list)
+
+    for name, img in images:
+        positions = {}
+        segmentations = {}
+        for method in methods:
+            t = {}
+            crystals = find_crystals(img, magnification, timings=t, method=method)
+            for key, value in t.items():
+                timings[method][key] += value
+            positions[method] = np.array([(c.x, c.y) for c in crystals]).reshape(-1, 2)
+
+            small, scale = autoscale(img, maxdim=256)
+            segmentations[method] = segment_crystals(small, method=method)[1] > 0
+
+        rw, ws = segmentations['random_walker'], segmentations['watershed']
+        union = (rw | ws).sum()
+        iou = (rw & ws).sum() / union if union else 1.0
+        recall, distance = match_positions(positions['random_walker'], positions['watershed'], options.tolerance)
+
+        agreement['iou'].append(iou)
+        agreement['recall'].append(recall)
+        agreement['distance'].append(distance)
+
+        print(f'{name}: {len(positions["random_walker"])} / {len(positions["watershed"])} crystals, '
+              f'IoU {iou:.3f}, matched {recall:.1%}')
+
+    n = len(agreement['iou'])
+    print(f'\n{n} images, ms/image')
+    keys = ('threshold', 'morphology', 'segmentation', 'clustering', 'total')
+    print(f'{"":15s}' + ''.join(f'{key:>14s}' for key in keys))
+    for method in methods:
+        print(f'{method:15s}' + ''.join(f'{timings[method][key] / n * 1000:14.1f}' for key in keys))
+
+    speedup = timings['random_walker']['total'] / timings['watershed']['total']
+    print(f'\nSpeedup: {speedup:.1f}x')
+    print(f'Mask IoU (mean/min): {np.mean(agreement["iou"]):.3f} / {np.min(agreement["iou"]):.3f}')
+    print(f'Positions matched within {options.tolerance} px: {np.mean(agreement["recall"]):.1%}, '
+          f'mean distance {np.nanmean(agreement["distance"]):.2f} px')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Benchmark for collecting the image header (`TEMController.to_dict`).
+
+Runs against `SimuMicroscope` with an artificial delay injected into every
+getter call to mimic the latency of a real microscope (about 50 ms per
+call on a JEOL 2100, 265 ms for the stage position).
+
+To use:
+    Run `python benchmarks/bench_header.py`
+
+Compares the sequential collection (`--workers 1`), the concurrent
+collection, and the concurrent collection with cached values.
+"""
+import argparse
+import contextlib
+import io
+import time
+
+import numpy as np
+
+
+class LatentMicroscope:
+    """Wraps a microscope object and sleeps before every `get*`/`is*`
+    call."""
+
+    def __init__(self, tem, latency: float = 0.050, stage_latency: float = 0.265):
+        super().__init__()
+        self._tem = tem
+        self._latency = latency
+        self._stage_latency = stage_latency
+
+    def __getattr__(self, attr):
+        func = getattr(self._tem, attr)
+
+        if not callable(func) or not attr.startswith(('get', 'is')):
+            return func
+
+        delay = self._stage_latency if attr == 'getStagePosition' else self._latency
+
+        def wrapper(*args, **kwargs):
+            time.sleep(delay)
+            return func(*args, **kwargs)
+
+        return wrapper
+
+
+def run(ctrl, repeat: int) -> np.ndarray:
+    timings = []
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        ctrl.to_dict()
+        t1 = time.perf_counter()
+        timings.append(t1 - t0)
+    return np.array(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+
+    parser.add_argument('-l', '--latency', action='store', type=float, dest='latency',
+                        help='Latency per getter call in seconds (default: %(default)s)')
+    parser.add_argument('-s', '--stage_latency', action='store', type=float, dest='stage_latency',
+                        help='Latency of the stage getter in seconds (default: %(default)s)')
+    parser.add_argument('-w', '--workers', action='store', type=int, dest='workers',
+                        help='Number of threads for the concurrent run (default: %(default)s)')
+    parser.add_argument('-n', '--repeat', action='store', type=int, dest='repeat',
+                        help='Number of headers to collect per run (default: %(default)s)')
+
+    parser.set_defaults(latency=0.050, stage_latency=0.265, workers=4, repeat=10)
+    options = parser.parse_args()
+
+    from instamatic import config
+    from instamatic.TEMController.simu_microscope import SimuMicroscope
+    from instamatic.TEMController.TEMController import TEMController
+
+    tem = LatentMicroscope(SimuMicroscope(),
+                           latency=options.latency,
+                           stage_latency=options.stage_latency)
+
+    # Settings that do not change during a data collection
+    max_age = {key: 60.0 for key in ('FunctionMode', 'GunShift', 'GunTilt', 'BeamTilt',
+                                     'ImageShift1', 'ImageShift2', 'DiffShift',
+                                     'Magnification', 'DiffFocus', 'Brightness', 'SpotSize')}
+
+    runs = (
+        ('sequential', 1, {}),
+        ('concurrent', options.workers, {}),
+        ('concurrent+cache', options.workers, max_age),
+    )
+
+    print()
+    print(f'Latency per call: {options.latency*1000:.0f} ms, stage: {options.stage_latency*1000:.0f} ms')
+    print(f'{"":20s} {"mean (ms)":>10s} {"min (ms)":>10s} {"max (ms)":>10s} {"speedup":>8s}')
+
+    reference = None
+    for name, workers, max_age in runs:
+        config.settings.header_max_workers = workers
+        config.settings.header_max_age = max_age
+        with contextlib.redirect_stdout(io.StringIO()):
+            ctrl = TEMController(tem=tem, cam=None)
+
+        timings = run(ctrl, repeat=options.repeat) * 1000
+        ctrl.close()
+
+        mean = timings.mean()
+        if reference is None:
+            reference = mean
+
+        print(f'{name:20s} {mean:10.1f} {timings.min():10.1f} {timings.max():10.1f} {reference/mean:7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
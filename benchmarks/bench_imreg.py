@@ -0,0 +1,66 @@
+"""Benchmark for registering images against a single reference
+(`instamatic.imreg`).
+
+To use:
+    Run `python benchmarks/bench_imreg.py`
+
+Compares `translation`, which transforms both images for every call, with
+`Registration` in float64, float32 and with multi-threaded FFTs, and
+counts the shifts that differ from those of `translation`.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+
+    parser.add_argument('-n', '--images', action='store', type=int, dest='n_images',
+                        help='Number of images to register per size (default: %(default)s)')
+    parser.add_argument('-s', '--sizes', action='store', type=int, nargs='+', dest='sizes',
+                        help='Image sizes to test (default: %(default)s)')
+
+    parser.set_defaults(n_images=8, sizes=[512, 1024, 2048, 4096])
+    options = parser.parse_args()
+
+    from instamatic.imreg import Registration
+    from instamatic.imreg import translation
+
+    rng = np.random.default_rng(0)
+    workers = os.cpu_count()
+
+    for size in options.sizes:
+        reference = rng.random((size, size), dtype=np.float32)
+        shifts = rng.integers(-size // 4, size // 4, size=(options.n_images, 2))
+        imgs = [np.roll(reference, shift, axis=(0, 1)) + rng.random((size, size), dtype=np.float32) * 0.1 for shift in shifts]
+
+        t0 = time.perf_counter()
+        expected = np.array([translation(reference, img) for img in imgs])
+        t1 = time.perf_counter()
+        reference_time = t1 - t0
+
+        print(f'\n{options.n_images} images of {size}x{size}')
+        print(f'{"":28s} {"ms/image":>10s} {"speedup":>8s} {"mismatch":>9s}')
+        print(f'{"translation":28s} {reference_time / options.n_images * 1000:10.1f} {1:7.1f}x {0:9d}')
+
+        for name, kwargs in (
+            ('Registration (float64)', {}),
+            ('Registration (float32)', {'dtype': np.float32}),
+            (f'Registration (f32, {workers} thr)', {'dtype': np.float32, 'workers': workers}),
+        ):
+            t0 = time.perf_counter()
+            reg = Registration(reference, **kwargs)
+            batch_size = max(1, 2**24 // size**2)
+            result = reg.translations(imgs, batch_size=batch_size)
+            t1 = time.perf_counter()
+            dt = t1 - t0
+            mismatch = np.any(result != expected, axis=1).sum()
+            print(f'{name:28s} {dt / options.n_images * 1000:10.1f} {reference_time / dt:7.1f}x {mismatch:9d}')
+
+
+if __name__ == '__main__':
+    main()
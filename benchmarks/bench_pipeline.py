@@ -0,0 +1,247 @@
+"""End-to-end throughput benchmark of the data collection pipelines against
+the simulated microscope and camera.
+
+The simulation is configured with a synthetic diffraction pattern in the
+camera dtype, a readout latency per frame, a latency for every call to the
+microscope, and a stage speed (see `CameraSimu` and `SimuMicroscope`).
+
+To use:
+    Run `python benchmarks/bench_pipeline.py [stage ...]`
+
+Stages:
+    get_image      `TEMController.get_image` with the full header
+    cred           cRED data collection with the `StreamWriter`
+    serialed       serialED acquisition loop (stage move, image, diffraction
+                   patterns per crystal), written to one HDF5 container or
+                   one file per frame
+    imgconversion  `ImgConversionTPX` (flatfield, beam centers) and SMV export
+
+For every stage, the number of frames/s, the latency percentiles per
+frame, and the peak memory allocated (tracemalloc) are reported.
+"""
+import argparse
+import contextlib
+import io
+import tempfile
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+
+def report(name: str, nframes: int, total: float, latencies=(), peak: int = 0) -> None:
+    """Print a line with the results of a stage."""
+    if len(latencies):
+        p50, p90, p99 = np.percentile(np.array(latencies) * 1000, (50, 90, 99))
+    else:
+        p50 = p90 = p99 = np.nan
+    print(f'{name:24s} {nframes:7d} {nframes / total:9.1f} {p50:8.1f} {p90:8.1f} {p99:8.1f} {peak / 1024**2:9.1f}')
+
+
+@contextlib.contextmanager
+def measure():
+    """Measure the wall time and peak memory of the block, yields a dict
+    that is filled in on exit."""
+    result = {}
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result['total'] = time.perf_counter() - t0
+        result['peak'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+
+def bench_get_image(ctrl, options) -> None:
+    ctrl.cam.block()
+
+    latencies = []
+    with measure() as m:
+        for i in range(options.frames):
+            t0 = time.perf_counter()
+            ctrl.get_image(exposure=options.exposure)
+            latencies.append(time.perf_counter() - t0)
+
+    ctrl.cam.unblock()
+    report('get_image', options.frames, m['total'], latencies, m['peak'])
+
+
+def bench_cred(ctrl, options, drc: Path) -> None:
+    from unittest.mock import MagicMock
+    from instamatic.experiments import cred
+
+    stop_event = threading.Event()
+    duration = options.frames * (options.exposure + options.readout)
+    timer = threading.Timer(duration, stop_event.set)
+
+    exp = cred.experiment.Experiment(ctrl, path=drc / 'cred', stop_event=stop_event,
+                                     log=MagicMock(), mode='simulate', exposure_time=options.exposure)
+
+    with measure() as m, contextlib.redirect_stdout(io.StringIO()):
+        timer.start()
+        exp.start_collection()
+
+    headers = cred_headers(drc / 'cred')
+    latencies = [h['ImageGetTimeEnd'] - h['ImageGetTimeStart'] for h in headers]
+
+    report('cred (acquisition)', exp.nframes, exp.total_time, latencies)
+    report('cred (incl. writing)', exp.nframes, m['total'], (), m['peak'])
+
+
+def cred_headers(drc: Path) -> list:
+    from instamatic.formats import read_tiff
+    return [read_tiff(fn)[1] for fn in sorted((drc / 'tiff').glob('*.tiff'))]
+
+
+def bench_serialed(ctrl, options, drc: Path) -> None:
+    from instamatic.formats import HDF5Container
+    from instamatic.formats import write_hdf5
+
+    ncrystals = options.crystals
+    npositions = max(1, options.frames // (ncrystals + 1))
+
+    for mode in ('container', 'files'):
+        out = drc / f'serialed_{mode}'
+        out.mkdir()
+
+        container = HDF5Container(out / 'serialed.h5') if mode == 'container' else None
+
+        latencies = []
+        x0, y0, _, _, _ = ctrl.stage.get()
+
+        with measure() as m:
+            for i in range(npositions):
+                ctrl.stage.set(x=x0 + 5000 * i, y=y0)
+
+                t0 = time.perf_counter()
+                img, h = ctrl.get_image(exposure=options.exposure)
+                latencies.append(time.perf_counter() - t0)
+                if container:
+                    container.append('images', img, h, image=i)
+                else:
+                    write_hdf5(out / f'image_{i:04d}.h5', img, header=h)
+
+                for k in range(ncrystals):
+                    ctrl.beamshift.set(1000 * k, 1000 * k)
+                    ctrl.diffshift.set(1000 * k, 1000 * k)
+
+                    t0 = time.perf_counter()
+                    img, h = ctrl.get_image(exposure=options.exposure)
+                    latencies.append(time.perf_counter() - t0)
+                    if container:
+                        container.append('data', img, h, image=i, crystal=k)
+                    else:
+                        write_hdf5(out / f'image_{i:04d}_{k:04d}.h5', img, header=h)
+
+            if container:
+                container.close()
+
+        report(f'serialed ({mode})', npositions * (ncrystals + 1), m['total'], latencies, m['peak'])
+
+
+def bench_imgconversion(ctrl, options, drc: Path) -> None:
+    from instamatic.formats import write_tiff
+    from instamatic.processing.ImgConversionTPX import ImgConversionTPX as ImgConversion
+
+    ctrl.cam.block()
+    frames = [ctrl.get_image(exposure=options.exposure, header_keys=None) for i in range(options.frames)]
+    ctrl.cam.unblock()
+
+    flatfield = drc / 'flatfield.tiff'
+    write_tiff(flatfield, np.random.uniform(0.9, 1.1, size=frames[0][0].shape))
+
+    with measure() as m, contextlib.redirect_stdout(io.StringIO()):
+        buffer = [(i + 1, img, h) for i, (img, h) in enumerate(frames)]
+        conv = ImgConversion(buffer=buffer, osc_angle=0.1, start_angle=0.0, end_angle=0.1 * len(frames),
+                             rotation_axis=-2.24, acquisition_time=0.1, flatfield=flatfield,
+                             pixelsize=0.01, physical_pixelsize=0.055, wavelength=0.0251)
+    report('imgconversion (init)', options.frames, m['total'], (), m['peak'])
+
+    smv = drc / 'SMV'
+    smv.mkdir()
+    latencies = []
+    with measure() as m:
+        for i in conv.observed_range:
+            t0 = time.perf_counter()
+            conv.write_smv(smv, i)
+            latencies.append(time.perf_counter() - t0)
+    report('imgconversion (smv)', options.frames, m['total'], latencies, m['peak'])
+
+
+STAGES = ('get_image', 'cred', 'serialed', 'imgconversion')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+
+    parser.add_argument('stages', type=str, nargs='*', metavar='stage',
+                        help=f'Stages to run: {", ".join(STAGES)} (default: all)')
+    parser.add_argument('-n', '--frames', action='store', type=int, dest='frames',
+                        help='Number of frames per stage (default: %(default)s)')
+    parser.add_argument('-e', '--exposure', action='store', type=float, dest='exposure',
+                        help='Exposure time in seconds (default: %(default)s)')
+    parser.add_argument('-r', '--readout', action='store', type=float, dest='readout',
+                        help='Readout latency of the camera in seconds (default: %(default)s)')
+    parser.add_argument('-l', '--latency', action='store', type=float, dest='latency',
+                        help='Latency per call to the microscope in seconds (default: %(default)s)')
+    parser.add_argument('-s', '--stage_speed', action='store', type=float, dest='stage_speed',
+                        help='Stage speed in nm/s (default: %(default)s)')
+    parser.add_argument('-d', '--dimensions', action='store', type=int, nargs=2, dest='dimensions',
+                        help='Camera dimensions (default: %(default)s)')
+    parser.add_argument('-t', '--dtype', action='store', type=str, dest='dtype',
+                        help='Camera data type (default: %(default)s)')
+    parser.add_argument('-c', '--crystals', action='store', type=int, dest='crystals',
+                        help='Crystals per position for serialED (default: %(default)s)')
+
+    parser.set_defaults(frames=100, exposure=0.01, readout=0.005, latency=0.005, stage_speed=1_000_000.0,
+                        dimensions=(516, 516), dtype='uint16', crystals=4)
+    options = parser.parse_args()
+
+    for stage in options.stages:
+        if stage not in STAGES:
+            parser.error(f'Unknown stage: {stage}')
+
+    from instamatic import config
+    from instamatic.camera import Camera
+    from instamatic.TEMController.simu_microscope import SimuMicroscope
+    from instamatic.TEMController.TEMController import TEMController
+
+    config.camera.update({'pattern': 'diffraction',
+                          'dtype': options.dtype,
+                          'readout_latency': options.readout,
+                          'dimensions': list(options.dimensions),
+                          'default_binsize': 1})
+    config.microscope.update({'rpc_latency': options.latency,
+                              'stage_speed_xy': options.stage_speed})
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        ctrl = TEMController(tem=SimuMicroscope(), cam=Camera(config.camera.name, as_stream=True))
+
+    print()
+    print(f'Camera: {options.dimensions[0]}x{options.dimensions[1]} {options.dtype}, '
+          f'exposure: {options.exposure*1000:.0f} ms, readout: {options.readout*1000:.0f} ms')
+    print(f'Microscope: {options.latency*1000:.0f} ms per call, stage: {options.stage_speed/1000:.0f} um/s')
+    print()
+    print(f'{"":24s} {"frames":>7s} {"frames/s":>9s} {"p50 (ms)":>8s} {"p90 (ms)":>8s} {"p99 (ms)":>8s} {"peak (MB)":>9s}')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        drc = Path(tmp)
+        for stage in options.stages or STAGES:
+            if stage == 'get_image':
+                bench_get_image(ctrl, options)
+            elif stage == 'cred':
+                bench_cred(ctrl, options, drc)
+            elif stage == 'serialed':
+                bench_serialed(ctrl, options, drc)
+            elif stage == 'imgconversion':
+                bench_imgconversion(ctrl, options, drc)
+
+    ctrl.close()
+
+
+if __name__ == '__main__':
+    main()
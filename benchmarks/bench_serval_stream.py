@@ -0,0 +1,117 @@
+"""Frame rate of the Serval camera interface, with a trigger per frame
+(`CameraServal.getImage`) and with the continuous frame stream
+(`CameraServal.getFrameStream`).
+
+To use:
+    Run `python benchmarks/bench_serval_stream.py`
+
+By default, the frames come from the stand-in Serval server in
+`instamatic.camera.serval_simu`, started on a free local port. Pass
+`--url` to measure against a running Serval server instead.
+
+For each exposure time, the script reports the frames/s, the time per
+frame on top of the exposure, and the number of HTTP requests per frame
+(stand-in server only).
+"""
+import argparse
+import http.client
+import json
+import time
+from urllib.parse import urlsplit
+
+from instamatic.camera.serval_stream import decode_image
+from instamatic.camera.serval_stream import ServalStream
+
+
+def request(conn, method: str, path: str, body=None):
+    conn.request(method, path, body=json.dumps(body) if body is not None else None)
+    response = conn.getresponse()
+    data = response.read()
+    if response.getheader('Content-Type', '').startswith('application/json'):
+        return json.loads(data)
+    return data
+
+
+def run_per_frame(url: str, exposure: float, frames: int) -> float:
+    """Collect `frames` frames the way `CameraServal.getImage` does, returns
+    the time in seconds."""
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port)
+
+    config = request(conn, 'GET', '/detector/config')
+    request(conn, 'PUT', '/detector/config', dict(config, TriggerMode='AUTOTRIGSTART_TIMERSTOP', nTriggers=1))
+
+    t0 = time.perf_counter()
+    for i in range(frames):
+        request(conn, 'PUT', '/detector/config', dict(config, TriggerMode='AUTOTRIGSTART_TIMERSTOP', nTriggers=1,
+                                                      ExposureTime=exposure, TriggerPeriod=exposure + 0.00050001))
+
+        db = request(conn, 'GET', '/dashboard')
+        if db['Measurement'] is None or db['Measurement']['Status'] != 'DA_RECORDING':
+            request(conn, 'GET', '/measurement/start')
+
+        request(conn, 'GET', '/measurement/trigger/start')
+        decode_image(request(conn, 'GET', '/measurement/image'))
+    t1 = time.perf_counter()
+
+    request(conn, 'GET', '/measurement/stop')
+    request(conn, 'PUT', '/detector/config', config)
+    conn.close()
+
+    return t1 - t0
+
+
+def run_stream(url: str, exposure: float, frames: int) -> float:
+    """Collect `frames` frames from a `ServalStream`, returns the time in
+    seconds."""
+    with ServalStream(url, exposure=exposure) as stream:
+        t0 = time.perf_counter()
+        for frame in stream:
+            if frame.index >= frames:
+                break
+        t1 = time.perf_counter()
+
+    return t1 - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+
+    parser.add_argument('-n', '--frames', action='store', type=int, dest='frames',
+                        help='Number of frames per run (default: %(default)s)')
+    parser.add_argument('-e', '--exposures', action='store', type=float, nargs='+', dest='exposures',
+                        help='Exposure times in s (default: %(default)s)')
+    parser.add_argument('-u', '--url', action='store', type=str, dest='url',
+                        help='Url of a running Serval server (default: use the stand-in server)')
+
+    parser.set_defaults(frames=100, exposures=(0.002, 0.01, 0.05), url=None)
+    options = parser.parse_args()
+
+    server = None
+    if options.url:
+        url = options.url
+    else:
+        from instamatic.camera.serval_simu import ServalSimuServer
+        server = ServalSimuServer(port=0)
+        server.start()
+        url = server.url
+
+    print(f'{"exposure":>10s} {"mode":>10s} {"frames/s":>10s} {"overhead":>10s} {"requests":>10s}')
+
+    for exposure in options.exposures:
+        for mode, func in (('per-frame', run_per_frame), ('stream', run_stream)):
+            requests = server.requests if server else 0
+            dt = func(url, exposure=exposure, frames=options.frames)
+            requests = (server.requests - requests) / options.frames if server else float('nan')
+
+            fps = options.frames / dt
+            overhead = dt / options.frames - exposure
+            print(f'{exposure:10.3f} {mode:>10s} {fps:10.1f} {overhead * 1000:8.2f}ms {requests:10.1f}')
+
+    if server:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
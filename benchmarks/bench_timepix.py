@@ -0,0 +1,72 @@
+"""Benchmark for converting the Timepix readout to an image.
+
+Compares the per-frame conversion of `CameraTPX.acquireData` before and
+after the pixel map: `arrangeData` + `correctCross` + `np.rot90` on a new
+array for every frame, against `PixelMap` writing into arrays from a
+`BufferPool`. Both return the rotated image as a view. Does not need the
+camera.
+
+To use:
+    Run `python benchmarks/bench_timepix.py`
+"""
+import argparse
+import time
+
+import numpy as np
+
+from instamatic.camera.framebuffer import BufferPool
+from instamatic.camera.timepix_pixelmap import arrangeData
+from instamatic.camera.timepix_pixelmap import correctCross
+from instamatic.camera.timepix_pixelmap import PixelMap
+
+
+def run_reference(raw: np.ndarray, repeat: int, factor: float) -> np.ndarray:
+    timings = []
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        arr = raw.copy()  # `readMatrix` allocates the readout
+        out = arrangeData(arr)
+        correctCross(out, factor=factor)
+        out = np.rot90(out, k=3)
+        timings.append(time.perf_counter() - t0)
+    return np.array(timings)
+
+
+def run_pixelmap(raw: np.ndarray, repeat: int, factor: float) -> np.ndarray:
+    pixelmap = PixelMap(factor=factor)
+    readout = np.empty_like(raw)
+    buffers = BufferPool(PixelMap.shape, dtype=raw.dtype)
+
+    timings = []
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        readout[:] = raw  # `readMatrix` fills the preallocated readout
+        out = pixelmap(readout, out=buffers.get())
+        timings.append(time.perf_counter() - t0)
+    return np.array(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+
+    parser.add_argument('-n', '--repeat', action='store', type=int, dest='repeat',
+                        help='Number of frames to convert (default: %(default)s)')
+
+    parser.add_argument('-f', '--factor', action='store', type=float, dest='factor',
+                        help='Correction ratio for the cross (default: %(default)s)')
+
+    parser.set_defaults(repeat=1000, factor=2.15)
+    options = parser.parse_args()
+
+    rng = np.random.default_rng()
+    raw = rng.integers(0, 11810, size=PixelMap.size).astype(np.int16)
+
+    for name, func in (('reference', run_reference), ('pixelmap', run_pixelmap)):
+        timings = func(raw, options.repeat, options.factor) * 1000
+        print(f'{name:10s} mean: {timings.mean():6.3f} ms, median: {np.median(timings):6.3f} ms, '
+              f'p99: {np.percentile(timings, 99):6.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""Benchmark for exporting a rotation dataset to TIFF/SMV/MRC
+(`ImgConversion.threadpoolwriter`).
+
+To use:
+    Run `python benchmarks/bench_writers.py`
+
+Writes a synthetic dataset (float32 frames, as after the flatfield
+correction) in all three formats with:
+    legacy     one task per frame per format, each converting the frame
+               (the writer before `write_frame`)
+    threads    one task per frame, converted once (`write_frame`)
+    processes  as `threads`, in a process pool
+"""
+import argparse
+import concurrent.futures
+import contextlib
+import io
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+def legacy_make_adsc_header(header: dict) -> bytes:
+    out = b'{\n'
+    for key in header:
+        out += f'{key}={header[key]};\n'.encode()
+    pad = int(header['HEADER_BYTES']) - len(out) - 2
+    return out + b'}' + (pad + 1) * b'\x00'
+
+
+def legacy_writer(conv, tiff_path: Path, smv_path: Path, mrc_path: Path, workers: int) -> None:
+    """The export as it was done before, one future per frame per format."""
+    from instamatic.formats import write_mrc
+    from instamatic.formats import write_tiff
+
+    def write_tiff_(i):
+        img = np.round(conv.data[i], 0).astype(np.uint16)
+        write_tiff(tiff_path / f'{i:05d}.tiff', img, header=conv.headers[i])
+
+    def write_mrc_(i):
+        img = np.round(conv.data[i], 0).astype(np.uint16)
+        write_mrc(mrc_path / f'{i:05d}.mrc', np.flipud(img).astype(np.uint16))
+
+    def write_smv_(i):
+        img = np.ushort(conv.data[i])
+        out = legacy_make_adsc_header(conv.get_smv_header(i, img.shape))
+        img = np.round(img, 0).astype(np.uint16, copy=False)
+        with open(smv_path / f'{i:05d}.img', 'wb') as f:
+            f.write(out)
+            f.write(img.tobytes())
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for i in conv.observed_range:
+            futures.append(executor.submit(write_tiff_, i))
+            futures.append(executor.submit(write_mrc_, i))
+            futures.append(executor.submit(write_smv_, i))
+        for future in futures:
+            future.result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+
+    parser.add_argument('-n', '--frames', action='store', type=int, dest='frames',
+                        help='Number of frames (default: %(default)s)')
+    parser.add_argument('-s', '--size', action='store', type=int, dest='size',
+                        help='Frame size (default: %(default)s)')
+    parser.add_argument('-w', '--workers', action='store', type=int, dest='workers',
+                        help='Number of workers (default: %(default)s)')
+
+    parser.set_defaults(frames=1000, size=516, workers=8)
+    options = parser.parse_args()
+
+    from instamatic.processing.ImgConversionTPX import ImgConversionTPX as ImgConversion
+
+    rng = np.random.default_rng(0)
+    noise = rng.poisson(20, size=(options.size * 2, options.size)).astype(np.float32)
+    buffer = []
+    for i in range(options.frames):
+        offset = rng.integers(options.size)
+        img = noise[offset:offset + options.size] * np.float32(1.03)
+        buffer.append((i + 1, img, {'ImageGetTime': time.time(), 'ImageExposureTime': 0.1}))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        conv = ImgConversion(buffer=buffer, osc_angle=0.1, start_angle=0.0, end_angle=0.1 * options.frames,
+                             rotation_axis=-2.24, acquisition_time=0.1, flatfield=None,
+                             pixelsize=0.01, physical_pixelsize=0.055, wavelength=0.0251)
+
+    print(f'{options.frames} frames of {options.size}x{options.size}, {options.workers} workers')
+    print(f'{"":12s} {"total (s)":>10s} {"frames/s":>10s} {"speedup":>8s}')
+
+    reference = None
+    for name in ('legacy', 'threads', 'processes'):
+        with tempfile.TemporaryDirectory() as drc:
+            drc = Path(drc)
+            tiff_path, smv_path, mrc_path = drc / 'tiff', drc / 'SMV', drc / 'RED'
+
+            t0 = time.perf_counter()
+            if name == 'legacy':
+                for path in (tiff_path, smv_path / conv.smv_subdrc, mrc_path):
+                    path.mkdir(parents=True)
+                legacy_writer(conv, tiff_path, smv_path / conv.smv_subdrc, mrc_path, options.workers)
+            else:
+                conv.threadpoolwriter(tiff_path=tiff_path, smv_path=smv_path, mrc_path=mrc_path,
+                                      workers=options.workers, processes=(name == 'processes'))
+            dt = time.perf_counter() - t0
+
+        reference = reference or dt
+        print(f'{name:12s} {dt:10.2f} {options.frames / dt:10.1f} {reference / dt:7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
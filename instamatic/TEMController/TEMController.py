@@ -8,6 +8,7 @@ import numpy as np
 from .deflectors import *
 from .lenses import *
 from .microscope import Microscope
+from .snapshot import HeaderSnapshot
 from .stage import *
 from .states import *
 from instamatic import config
@@ -15,6 +16,7 @@ from instamatic.camera import Camera
 from instamatic.exceptions import TEMControllerError
 from instamatic.formats import write_tiff
 from instamatic.image_utils import rotate_image
+from instamatic.telemetry import metrics
 
 
 _ctrl = None  # store reference of ctrl so it can be accessed without re-initializing
@@ -24,6 +26,7 @@ default_tem = config.microscope.name
 
 use_tem_server = config.settings.use_tem_server
 use_cam_server = config.settings.use_cam_server
+metrics_port = config.settings.metrics_port
 
 
 def initialize(tem_name: str = default_tem, cam_name: str = default_cam, stream: bool = True) -> 'TEMController':
@@ -62,6 +65,10 @@ def initialize(tem_name: str = default_tem, cam_name: str = default_cam, stream:
     else:
         cam = None
 
+    if metrics_port:
+        metrics.serve(metrics_port)
+        print(f'Metrics   : http://localhost:{metrics_port}/metrics')
+
     global _ctrl
     ctrl = _ctrl = TEMController(tem=tem, cam=cam)
 
@@ -117,6 +124,11 @@ class TEMController:
         self.autoblank = False
         self._saved_alignments = config.get_alignments()
 
+        self._header = HeaderSnapshot(self._header_getters(),
+                                      max_workers=config.settings.header_max_workers,
+                                      max_age=config.settings.header_max_age)
+        self._wrap_setters()
+
         print()
         print(self)
         self.store()
@@ -156,8 +168,62 @@ class TEMController:
     @spotsize.setter
     def spotsize(self, value: int):
         self.tem.setSpotSize(value)
+        self._header.invalidate('SpotSize')
 
-    def acquire_at_items(self, *args, **kwargs) -> None:
+    def _header_getters(self) -> dict:
+        """Return the getters used to collect the microscope state for the
+        image header (see `to_dict`)."""
+        # Each of these costs about 40-60 ms per call on a JEOL 2100, stage is 265 ms per call
+        return {
+            'FunctionMode': self.tem.getFunctionMode,
+            'GunShift': self.gunshift.get,
+            'GunTilt': self.guntilt.get,
+            'BeamShift': self.beamshift.get,
+            'BeamTilt': self.beamtilt.get,
+            'ImageShift1': self.imageshift1.get,
+            'ImageShift2': self.imageshift2.get,
+            'DiffShift': self.diffshift.get,
+            'StagePosition': self.stage.get,
+            'Magnification': self.magnification.get,
+            'DiffFocus': self.difffocus.get,
+            'Brightness': self.brightness.get,
+            'SpotSize': self.tem.getSpotSize,
+        }
+
+    def _wrap_setters(self) -> None:
+        """Make the setters of the control objects invalidate the
+        corresponding entries in the header cache."""
+        header = self._header
+
+        for key, obj in (
+            ('GunShift', self.gunshift),
+            ('GunTilt', self.guntilt),
+            ('BeamShift', self.beamshift),
+            ('BeamTilt', self.beamtilt),
+            ('ImageShift1', self.imageshift1),
+            ('ImageShift2', self.imageshift2),
+            ('DiffShift', self.diffshift),
+        ):
+            obj._setter = header.invalidating(obj._setter, key)
+            obj._neutral = header.invalidating(obj._neutral, key)
+
+        self.stage._setter = header.invalidating(self.stage._setter, 'StagePosition')
+        self.magnification._setter = header.invalidating(self.magnification._setter, 'Magnification')
+        self.magnification._indexsetter = header.invalidating(self.magnification._indexsetter, 'Magnification')
+        self.difffocus._setter = header.invalidating(self.difffocus._setter, 'DiffFocus')
+        self.brightness._setter = header.invalidating(self.brightness._setter, 'Brightness')
+        self.mode._setter = header.invalidating(self.mode._setter, 'FunctionMode', 'Magnification', 'DiffFocus')
+        # `defocus` switches to diffraction mode if needed
+        self.difffocus._set_function_mode = self.mode._setter
+
+    def invalidate_header_cache(self, *keys) -> None:
+        """Invalidate cached header values for the given keys (all if none
+        are given). Only needed if the microscope is changed outside of the
+        `TEMController` (e.g. directly through `ctrl.tem` or on the TEM
+        itself) while caching is enabled through `max_age`."""
+        self._header.invalidate(*keys)
+
+    def acquire_at_items(self, *args, **kwargs) -> 'AcquireAtItems':
         """Class to automated acquisition at many stage locations. The
         acquisition functions must be callable (or a list of callables) that
         accept `ctrl` as an argument. In case a list of callables is given,
@@ -178,6 +244,14 @@ class TEMController:
             This function is run after the last acquisition item has run.
         backlash: bool
         Move the stage with backlash correction.
+        settle_delay: float
+            Time (s) to wait after the stage has moved before acquiring.
+
+        Returns
+        -------
+        aai: `AcquireAtItems`
+            The instance that was run, `aai.timings` holds the time taken
+            by each phase per item.
         """
         from instamatic.acquire_at_items import AcquireAtItems
 
@@ -186,6 +260,8 @@ class TEMController:
         aai = AcquireAtItems(ctrl, *args, **kwargs)
         aai.start()
 
+        return aai
+
     def run_script_at_items(self, nav_items: list, script: str, backlash: bool = True) -> None:
         """"Run the given script at all coordinates defined by the nav_items.
 
@@ -281,7 +357,7 @@ class TEMController:
         return stagematrix
 
     def align_to(self,
-                 ref_img: 'np.array',
+                 ref_img: 'np.array | Registration',
                  apply: bool = True,
                  verbose: bool = False,
                  ) -> list:
@@ -291,8 +367,10 @@ class TEMController:
 
         Parameters
         ----------
-        ref_img : np.array
-            Reference image that the microscope will be aligned to
+        ref_img : np.array or Registration
+            Reference image that the microscope will be aligned to. Pass an
+            `instamatic.imreg.Registration` to reuse its spectrum when
+            aligning to the same reference repeatedly.
         apply : bool
             Toggle to translate the stage to center the image
         verbose : bool
@@ -303,7 +381,7 @@ class TEMController:
         stage_shift : np.array[2]
             The stage shift vector determined from cross correlation
         """
-        from skimage.registration import phase_cross_correlation
+        from instamatic.imreg import Registration
 
         current_x, current_y = self.stage.xy
 
@@ -314,7 +392,10 @@ class TEMController:
 
         img = self.get_rotated_image()
 
-        pixel_shift, error, phasediff = phase_cross_correlation(ref_img, img, upsample_factor=10)
+        if not isinstance(ref_img, Registration):
+            ref_img = Registration(ref_img)
+
+        pixel_shift, error, phasediff = ref_img.phase_cross_correlation(img, upsample_factor=10)
 
         stage_shift = np.dot(pixel_shift, stagematrix)
         stage_shift[0] = -stage_shift[0]  # match TEM Coordinate system
@@ -442,38 +523,15 @@ class TEMController:
             If any keys are specified, dict is returned with only the given properties
 
         self.to_dict('all') or self.to_dict() will return all properties
-        """
 
-        # Each of these costs about 40-60 ms per call on a JEOL 2100, stage is 265 ms per call
-        funcs = {
-            'FunctionMode': self.tem.getFunctionMode,
-            'GunShift': self.gunshift.get,
-            'GunTilt': self.guntilt.get,
-            'BeamShift': self.beamshift.get,
-            'BeamTilt': self.beamtilt.get,
-            'ImageShift1': self.imageshift1.get,
-            'ImageShift2': self.imageshift2.get,
-            'DiffShift': self.diffshift.get,
-            'StagePosition': self.stage.get,
-            'Magnification': self.magnification.get,
-            'DiffFocus': self.difffocus.get,
-            'Brightness': self.brightness.get,
-            'SpotSize': self.tem.getSpotSize,
-        }
-
-        dct = {}
-
-        if 'all' in keys or not keys:
-            keys = funcs.keys()
+        The values are collected concurrently and may be served from the cache
+        (see `config.settings.header_max_age`), see `snapshot.HeaderSnapshot`.
+        """
 
-        for key in keys:
-            try:
-                dct[key] = funcs[key]()
-            except ValueError:
-                # print(f"No such key: `{key}`")
-                pass
+        if 'all' in keys:
+            keys = ()
 
-        return dct
+        return self._header.get(keys)
 
     def from_dict(self, dct: dict):
         """Restore microscope parameters from dict."""
@@ -495,7 +553,7 @@ class TEMController:
         }
 
         mode = dct['FunctionMode']
-        self.tem.setFunctionMode(mode)
+        self.mode.set(mode)
 
         for k, v in dct.items():
             if k in funcs:
@@ -508,6 +566,8 @@ class TEMController:
             except TypeError:
                 func(v)
 
+        self._header.invalidate()
+
     def get_raw_image(self, exposure: float = None, binsize: int = None) -> np.ndarray:
         """Simplified function equivalent to `get_image` that only returns the
         raw data array.
@@ -524,7 +584,8 @@ class TEMController:
         arr : np.array
             Image as 2D numpy array.
         """
-        return self.cam.getImage(exposure=exposure, binsize=binsize)
+        with metrics.timer('camera_get_image_seconds', camera=self.cam.name):
+            return self.cam.getImage(exposure=exposure, binsize=binsize)
 
     def get_future_image(self, exposure: float = None, binsize: int = None) -> 'future':
         """Simplified function equivalent to `get_image` that returns the raw
@@ -626,8 +687,10 @@ class TEMController:
 
         if not header_keys:
             h = {}
-        else:
+        elif isinstance(header_keys, str):
             h = self.to_dict(header_keys)
+        else:
+            h = self.to_dict(*header_keys)
 
         if self.autoblank:
             self.beam.unblank()
@@ -637,6 +700,7 @@ class TEMController:
         arr = self.get_rotated_image(exposure=exposure, binsize=binsize)
 
         h['ImageGetTimeEnd'] = time.perf_counter()
+        metrics.observe('get_image_seconds', h['ImageGetTimeEnd'] - h['ImageGetTimeStart'])
 
         if self.autoblank:
             self.beam.blank()
@@ -701,6 +765,7 @@ class TEMController:
         print(f"Microscope alignment restored from '{name}'")
 
     def close(self):
+        self._header.close()
         try:
             self.cam.close()
         except AttributeError:
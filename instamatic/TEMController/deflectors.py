@@ -14,6 +14,7 @@ class Deflector:
         self._tem = tem
         self._getter = None
         self._setter = None
+        self._neutral = self._tem.setNeutral
         self.key = 'def'
 
     def __repr__(self):
@@ -58,7 +59,7 @@ class Deflector:
         self.set(x=x, y=y)
 
     def neutral(self):
-        self._tem.setNeutral(self.key)
+        self._neutral(self.key)
 
 
 class GunShift(Deflector):
@@ -42,6 +42,7 @@ class DiffFocus(Lens):
         super().__init__(tem=tem)
         self._getter = self._tem.getDiffFocus
         self._setter = self._tem.setDiffFocus
+        self._set_function_mode = self._tem.setFunctionMode
         self.is_defocused = False
 
     def set(self, value: int, confirm_mode: bool = True):
@@ -61,7 +62,7 @@ class DiffFocus(Lens):
         try:
             self._focused_value = current = self.get()
         except ValueError:
-            self._tem.setFunctionMode('diff')
+            self._set_function_mode('diff')
             self._focused_value = current = self.get()
 
         target = current + offset
@@ -1,23 +1,30 @@
 import atexit
 import datetime
+import itertools
 import json
+import logging
 import pickle
 import socket
 import subprocess as sp
 import threading
 import time
+from concurrent.futures import Future
 from functools import wraps
 
 from instamatic import config
 from instamatic.exceptions import exception_list
 from instamatic.exceptions import TEMCommunicationError
+from instamatic.server.framing import PREFIX
+from instamatic.server.framing import recv_frame
 from instamatic.server.serializer import dumper
 from instamatic.server.serializer import loader
+from instamatic.telemetry import metrics
 
 
+logger = logging.getLogger(__name__)
+
 HOST = config.settings.tem_server_host
 PORT = config.settings.tem_server_port
-BUFSIZE = 1024
 
 
 class ServerError(Exception):
@@ -42,13 +49,20 @@ class MicroscopeClient:
 
     For documentation, see the actual python interface to the microscope
     API.
+
+    Every request is tagged with an id, and the responses are matched up
+    by a receiver thread, so the client can be used from several threads
+    at the same time (e.g. `ctrl.to_dict`). Use `batch` to send a number of
+    calls in a single round trip.
     """
 
     def __init__(self, name):
         super().__init__()
 
         self.name = name
-        self._bufsize = BUFSIZE
+        self._ids = itertools.count()
+        self._pending = {}
+        self._lock = threading.Lock()
 
         try:
             self.connect()
@@ -75,8 +89,13 @@ class MicroscopeClient:
     def connect(self):
         self.s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.s.connect((HOST, PORT))
+        self.s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._closed = False
         print(f'Connected to TEM server ({HOST}:{PORT})')
 
+        self._receiver = threading.Thread(target=self._receive, args=(self.s,), name='MicroscopeClient', daemon=True)
+        self._receiver.start()
+
     def __getattr__(self, func_name):
 
         try:
@@ -93,16 +112,62 @@ class MicroscopeClient:
 
         return wrapper
 
-    def _eval_dct(self, dct):
-        """Takes approximately 0.2-0.3 ms per call if HOST=='localhost'."""
-
-        self.s.send(dumper(dct))
-
-        response = self.s.recv(self._bufsize)
-
-        if response:
-            status, data = loader(response)
-
+    def _receive(self, sock):
+        """Receive the responses and hand them to the waiting callers."""
+        while True:
+            try:
+                response = recv_frame(sock)
+            except OSError:
+                response = b''
+
+            if not response:
+                break
+
+            try:
+                request_id, status, data = loader(response)
+            except Exception as e:
+                # the stream cannot be trusted anymore, fail all pending calls
+                logger.exception(e)
+                break
+
+            with self._lock:
+                future = self._pending.pop(request_id, None)
+            if future is None:
+                logger.warning(f'Response for unknown request id: {request_id!r}')
+                continue
+            future.set_result((status, data))
+
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._closed = True
+        for future in pending.values():
+            future.set_exception(ConnectionError('Connection to TEM server closed'))
+
+    def _send(self, dcts: list) -> list:
+        """Send the requests in `dcts` in one go, returns a `Future` for each
+        of them with the `(status, data)` response."""
+        futures = []
+        payload = bytearray()
+
+        with self._lock:
+            if self._closed:
+                raise ConnectionError('Connection to TEM server closed')
+
+            for dct in dcts:
+                request_id = next(self._ids)
+                message = dumper(dict(dct, id=request_id))
+                payload += PREFIX.pack(len(message)) + message
+
+                future = Future()
+                self._pending[request_id] = future
+                futures.append(future)
+
+            self.s.sendall(payload)
+
+        return futures
+
+    @staticmethod
+    def _unpack(status, data):
         if status == 200:
             return data
 
@@ -113,6 +178,28 @@ class MicroscopeClient:
         else:
             raise ConnectionError(f'Unknown status code: {status}')
 
+    def _eval_dct(self, dct):
+        """Takes approximately 0.2-0.3 ms per call if HOST=='localhost'."""
+        with metrics.timer('tem_rpc_seconds', func=dct['func_name']):
+            future, = self._send([dct])
+            response = future.result()
+        return self._unpack(*response)
+
+    def batch(self):
+        """Collect calls and send them to the server in a single round trip.
+
+        Usage:
+            with tem.batch() as batch:
+                batch.getBeamShift()
+                batch.getStagePosition()
+            beamshift, stagepos = batch.results
+
+        The calls are sent when the block exits, and the results are
+        available as `batch.results` in the order the calls were made.
+        If any of the calls failed, the first error is raised.
+        """
+        return Batch(self)
+
     def _init_dict(self):
         from instamatic.TEMController.microscope import get_tem
         tem = get_tem(self.name)
@@ -129,6 +216,46 @@ class MicroscopeClient:
             config.settings.use_goniotool = self.is_goniotool_available()
 
 
+class Batch:
+    """Collects calls to the TEM server, see `MicroscopeClient.batch`."""
+
+    def __init__(self, client):
+        super().__init__()
+        self._client = client
+        self._calls = []
+        self.results = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        if kind is None:
+            self.results = self.send()
+
+    def __getattr__(self, func_name):
+        if func_name not in self._client._dct:
+            raise AttributeError(f'`{self._client.__class__.__name__}` object has no attribute `{func_name}`')
+
+        def wrapper(*args, **kwargs):
+            self._calls.append({'func_name': func_name,
+                                'args': args,
+                                'kwargs': kwargs})
+
+        return wrapper
+
+    def send(self) -> list:
+        """Send the collected calls, returns a list with the results."""
+        calls, self._calls = self._calls, []
+        if not calls:
+            return []
+
+        with metrics.timer('tem_rpc_seconds', func='batch'):
+            responses = [future.result() for future in self._client._send(calls)]
+        metrics.inc('tem_rpc_batched_calls_total', len(calls))
+
+        return [self._client._unpack(*response) for response in responses]
+
+
 class TraceVariable:
     """Simple class to trace a variable over time.
 
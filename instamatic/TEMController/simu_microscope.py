@@ -1,3 +1,4 @@
+import functools
 import random
 import time
 from typing import Tuple
@@ -31,12 +32,31 @@ MAX = 65535
 MIN = 0
 
 
+def add_latency(func, latency: float):
+    """Wrap `func` so that every call is delayed by `latency` seconds."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        time.sleep(latency)
+        return func(*args, **kwargs)
+
+    return wrapper
+
+
 class SimuMicroscope:
     """Simulates a microscope connection.
 
     Has the same variables as the real JEOL/FEI equivalents, but does
     not make any function calls. The initial lens/deflector/stage values
     are randomized based on the config file loaded.
+
+    The following keys in the microscope config control the simulation:
+
+    rpc_latency:
+        Delay in seconds for every call to the microscope (default: 0)
+    stage_speed_xy, stage_speed_z:
+        Speed of the stage in nm/s (default: 1_000_000 and 100_000)
+    stage_speed_a:
+        Rotation speed of the stage in degrees/s (default: 20)
     """
 
     def __init__(self, name: str = 'simulate'):
@@ -119,13 +139,13 @@ class SimuMicroscope:
         self._stage_dict = {}
         for key in ('a', 'b', 'x', 'y', 'z'):
             if key in ('a', 'b'):
-                speed = 20.0  # degree / sec
+                speed = getattr(config.microscope, 'stage_speed_a', 20.0)  # degree / sec
                 current = random.randint(-40, 40)
             elif key in ('x', 'y'):
-                speed = 1_000_000.0  # nm / sec
+                speed = getattr(config.microscope, 'stage_speed_xy', 1_000_000.0)  # nm / sec
                 current = random.randint(-100000, 100000)
             elif key == 'z':
-                speed = 100_000.0  # nm / sec
+                speed = getattr(config.microscope, 'stage_speed_z', 100_000.0)  # nm / sec
                 current = random.randint(-10000, 10000)
 
             self._stage_dict[key] = {
@@ -150,6 +170,18 @@ class SimuMicroscope:
                 self.goniotool_available = False
                 config.settings.use_goniotool = False
 
+        self.rpc_latency = getattr(config.microscope, 'rpc_latency', 0.0)
+        if self.rpc_latency:
+            self._set_latency(self.rpc_latency)
+
+    def _set_latency(self, latency: float):
+        """Delay all calls to the public methods by `latency` seconds to
+        model the communication overhead with a real microscope."""
+        for name in dir(type(self)):
+            if name.startswith('_') or not callable(getattr(type(self), name)):
+                continue
+            setattr(self, name, add_latency(getattr(type(self), name).__get__(self), latency))
+
     def is_goniotool_available(self):
         """Return goniotool status."""
         return self.goniotool_available
@@ -0,0 +1,152 @@
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from typing import Callable
+from typing import Iterable
+
+
+_MISSING = object()
+
+
+class HeaderSnapshot:
+    """Collects the microscope state for image headers.
+
+    With `max_workers > 1`, the getters are called concurrently on a
+    small thread pool, so that the latency of the individual calls (40-60
+    ms per call on a JEOL 2100, 265 ms for the stage) overlaps instead of
+    adding up. The getters must then be safe to call from other threads,
+    which is the case for the TEM server client, but not for the COM
+    interfaces of the JEOL/FEI microscopes.
+
+    Values can optionally be cached. Every key has a version number that
+    is bumped by `invalidate`; a cached value is only reused if its
+    version is still current and it is not older than the staleness
+    budget given for that key in `max_age` (seconds). Keys that are not
+    listed in `max_age` are always read from the microscope.
+
+    getters: dict
+        Mapping of header key -> callable returning the value
+    max_workers: int
+        Number of threads used to fetch the values, 1 (default) calls the
+        getters sequentially
+    max_age: dict
+        Mapping of header key -> staleness budget in seconds
+    """
+
+    def __init__(self, getters: dict, max_workers: int = 1, max_age: dict = None):
+        self._getters = dict(getters)
+        self.max_age = dict(max_age or {})
+
+        if max_workers > 1:
+            self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='header')
+        else:
+            self._executor = None
+
+        self._lock = threading.Lock()
+        self._cache = {}
+        self._versions = defaultdict(int)
+
+    def keys(self) -> tuple:
+        return tuple(self._getters.keys())
+
+    def invalidate(self, *keys) -> None:
+        """Mark the given keys as changed, so the next call to `get` reads
+        them from the microscope.
+
+        If no keys are given, the whole cache is invalidated.
+        """
+        if not keys:
+            keys = self._getters.keys()
+
+        with self._lock:
+            for key in keys:
+                self._versions[key] += 1
+                self._cache.pop(key, None)
+
+    def invalidating(self, func: Callable, *keys) -> Callable:
+        """Wrap setter `func` so that it invalidates `keys` when called."""
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.invalidate(*keys)
+
+        return wrapper
+
+    def _lookup(self, key: str, now: float):
+        """Return the cached value for `key`, or `_MISSING` if it is stale."""
+        max_age = self.max_age.get(key, 0)
+        if not max_age:
+            return _MISSING
+
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return _MISSING
+
+            value, timestamp, version = entry
+            if version != self._versions[key]:
+                return _MISSING
+
+        if now - timestamp > max_age:
+            return _MISSING
+
+        return value
+
+    def _fetch(self, key: str):
+        """Read `key` from the microscope and store it in the cache."""
+        with self._lock:
+            version = self._versions[key]
+
+        timestamp = time.perf_counter()
+        value = self._getters[key]()
+
+        with self._lock:
+            self._cache[key] = (value, timestamp, version)
+
+        return value
+
+    def get(self, keys: Iterable[str] = None) -> dict:
+        """Return a dict with the values for `keys` (all keys if not given).
+
+        Keys for which the getter raises a `ValueError` (e.g.
+        `DiffFocus` outside of diffraction mode) are left out.
+        """
+        if not keys:
+            keys = self._getters.keys()
+
+        now = time.perf_counter()
+
+        results = {}
+        for key in keys:
+            if key not in self._getters:
+                raise KeyError(f'No such header key: `{key}`')
+
+            value = self._lookup(key, now)
+            if value is not _MISSING:
+                results[key] = value
+            elif self._executor:
+                results[key] = self._executor.submit(self._fetch, key)
+            else:
+                results[key] = _MISSING
+
+        dct = {}
+        for key, value in results.items():
+            try:
+                if value is _MISSING:
+                    value = self._fetch(key)
+                elif isinstance(value, Future):
+                    value = value.result()
+            except ValueError:
+                continue
+            dct[key] = value
+
+        return dct
+
+    def close(self) -> None:
+        if self._executor:
+            self._executor.shutdown(wait=False)
@@ -1,4 +1,9 @@
+import threading
+import time
 from collections import defaultdict
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
 import numpy as np
 from tqdm.auto import tqdm
@@ -30,6 +35,20 @@ class AcquireAtItems:
         sequence _after_ the main acquisition function.
     backlash: bool
         Move the stage with backlash correction.
+    settle_delay: float
+        Time (s) to wait after the stage has moved before acquiring.
+    max_workers: int
+        Number of threads for the tasks submitted with `AcquireAtItems.submit`,
+        i.e. writing the data of an item while the stage moves to the next one.
+    max_pending: int
+        Maximum number of submitted tasks that may be waiting, `submit`
+        blocks when this number is reached. This limits the memory used
+        when writing is slower than the acquisition.
+
+    The time taken by each phase (`move`, `settle`, `acquire`, and those
+    recorded by the acquisition functions using `AcquireAtItems.timer`,
+    e.g. `expose`/`readout`/`write`) is stored per item in
+    `AcquireAtItems.timings`.
 
     Returns
     -------
@@ -43,7 +62,10 @@ class AcquireAtItems:
                  pre_acquire=None,
                  post_acquire=None,
                  every_n: dict = {},
-                 backlash: bool = True):
+                 backlash: bool = True,
+                 settle_delay: float = 0.0,
+                 max_workers: int = 1,
+                 max_pending: int = 4):
         super().__init__()
 
         self.nav_items = nav_items
@@ -69,6 +91,14 @@ class AcquireAtItems:
             print(f'Post-acquire:', ', '.join([func.__name__ for func in self._post_acquire]))
 
         self.backlash = backlash
+        self.settle_delay = settle_delay
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+
+        self.timings = []
+        self._executor = None
+        self._futures = []
+        self._pending = threading.BoundedSemaphore(max_pending)
 
     # blank placeholders
     _acquire = ()
@@ -131,6 +161,59 @@ class AcquireAtItems:
 
         set_xy(x=x, y=y)
 
+    @contextmanager
+    def timer(self, phase: str, timing: dict = None):
+        """Context manager to record the time taken by `phase` in
+        `AcquireAtItems.timings` for the current item (or in `timing`)."""
+        if timing is None:
+            timing = self.timings[-1] if self.timings else {}
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            timing[phase] = timing.get(phase, 0.0) + time.perf_counter() - t0
+
+    def submit(self, func, *args, phase: str = 'write', **kwargs) -> Future:
+        """Run `func(*args, **kwargs)` in the background while the
+        acquisition continues with the next item, e.g. to write the data to
+        disk while the stage moves. The time it takes is recorded as
+        `phase` for the current item.
+
+        Blocks while `max_pending` tasks are waiting. Returns a `Future`,
+        errors are reported at the end of `AcquireAtItems.start`.
+        """
+        timing = self.timings[-1] if self.timings else {}
+
+        def task():
+            try:
+                with self.timer(phase, timing=timing):
+                    return func(*args, **kwargs)
+            finally:
+                self._pending.release()
+
+        self._pending.acquire()
+        future = self._executor.submit(task)
+        self._futures.append(future)
+        return future
+
+    def wait(self) -> None:
+        """Wait for all submitted tasks to finish, and report errors."""
+        for future in self._futures:
+            exception = future.exception()
+            if exception:
+                print(f'\nBackground task failed: {exception!r}')
+        self._futures = []
+
+    def print_timings(self) -> None:
+        """Print the mean time per item for each phase."""
+        totals = defaultdict(float)
+        for timing in self.timings:
+            for phase, dt in timing.items():
+                totals[phase] += dt
+
+        n_items = max(len(self.timings), 1)
+        print('Time per item:', ', '.join(f'{phase} {dt / n_items:.2f} s' for phase, dt in totals.items()))
+
     def start(self, start_index: int = 0):
         """Start serial acquisition protocol.
 
@@ -139,9 +222,6 @@ class AcquireAtItems:
         start_index : int
             Start acquisition from this item.
         """
-        import time
-        import msvcrt
-
         ctrl = self.ctrl
         nav_items = self.nav_items[start_index:]
 
@@ -150,6 +230,9 @@ class AcquireAtItems:
         print(f'\nAcquiring on {ntot} items.')
         print('Press <Ctrl-C> or ⬛ to interrupt.\n')
 
+        self.timings = []
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
         self.move_to_item(nav_items[0])  # pre-move
         self.pre_acquire(ctrl)
 
@@ -163,8 +246,18 @@ class AcquireAtItems:
                 ctrl.current_item = item
                 ctrl.current_i = i
 
-                self.move_to_item(item)
-                self.acquire(ctrl, i=i)
+                self.timings.append({})
+
+                # submitted tasks of the previous item run during the move
+                with self.timer('move'):
+                    self.move_to_item(item)
+
+                if self.settle_delay:
+                    with self.timer('settle'):
+                        time.sleep(self.settle_delay)
+
+                with self.timer('acquire'):
+                    self.acquire(ctrl, i=i)
 
             except (Exception, KeyboardInterrupt) as e:
                 print(repr(e.with_traceback(None)))
@@ -173,9 +266,16 @@ class AcquireAtItems:
 
         t1 = time.perf_counter()
 
+        self.wait()
+        self._executor.shutdown()
+
+        t2 = time.perf_counter()
+
         self.post_acquire(ctrl)
 
         dt = t1 - t0
         n_items = i + 1
         print(f'Total time taken: {dt:.0f} s for {n_items} items ({dt/n_items:.2f} s/item)')
+        print(f'Waited {t2 - t1:.1f} s for the background tasks to finish')
+        self.print_timings()
         print('\nAll done!')
@@ -6,7 +6,9 @@ import mrcfile
 import numpy as np
 from pyserialem import read_nav_file
 
+from instamatic.formats import MRCStack
 from instamatic.formats import read_tiff
+from instamatic.formats.util import InvalidHeaderException
 
 
 class Browser:
@@ -23,9 +25,14 @@ class Browser:
     def set_images(self, mmm: str = 'mmm.mrc'):
         """Set the path to the image data (medium mag).
 
-        Must be mrc format and contain multiple pages.
+        Must be mrc format and contain multiple pages. Stacks that
+        `MRCStack` cannot read (e.g. with a non-standard header) are opened
+        with `mrcfile` in permissive mode.
         """
-        self.mmap = mrcfile.mmap(mmm)
+        try:
+            self.mmap = MRCStack(mmm, no_strict_mrc=True)
+        except (OSError, ValueError, KeyError, InvalidHeaderException):
+            self.mmap = mrcfile.mmap(mmm, permissive=True)
 
     def set_nav_file(self, nav: str = 'output.nav'):
         """Set the `.nav` file to load the stage/image coordinates from."""
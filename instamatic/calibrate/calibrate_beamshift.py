@@ -3,10 +3,9 @@ import os
 import pickle
 import sys
 
-import matplotlib.pyplot as plt
 import numpy as np
-from skimage.registration import phase_cross_correlation
 
+from .correlate import CrossCorrelator
 from .filenames import *
 from .fit import fit_affine_transformation
 from instamatic import config
@@ -81,6 +80,8 @@ class CalibBeamShift:
         pickle.dump(self, open(fout, 'wb'))
 
     def plot(self, to_file=None, outdir=''):
+        import matplotlib.pyplot as plt
+
         if not self.has_data:
             return
 
@@ -133,7 +134,6 @@ def calibrate_beamshift_live(ctrl, gridsize=None, stepsize=None, save_images=Fal
     return:
         instance of Calibration class with conversion methods
     """
-
     exposure = kwargs.get('exposure', ctrl.cam.default_exposure)
     binsize = kwargs.get('binsize', ctrl.cam.default_binsize)
 
@@ -166,6 +166,10 @@ def calibrate_beamshift_live(ctrl, gridsize=None, stepsize=None, save_images=Fal
     x_grid, y_grid = np.meshgrid(np.arange(-n, n + 1) * stepsize, np.arange(-n, n + 1) * stepsize)
     tot = gridsize * gridsize
 
+    # images are correlated while the next one is being acquired
+    correlator = CrossCorrelator()
+    reference = correlator.reference(img_cent)
+
     i = 0
     for dx, dy in np.stack([x_grid, y_grid]).reshape(2, -1).T:
         ctrl.beamshift.set(x=x_cent + dx, y=y_cent + dy)
@@ -178,11 +182,9 @@ def calibrate_beamshift_live(ctrl, gridsize=None, stepsize=None, save_images=Fal
         img, h = ctrl.get_image(exposure=exposure, binsize=binsize, out=outfile, comment=comment, header_keys='BeamShift')
         img = imgscale(img, scale)
 
-        shift, error, phasediff = phase_cross_correlation(img_cent, img, upsample_factor=10)
-
         beamshift = np.array(h['BeamShift'])
         beampos.append(beamshift)
-        shifts.append(shift)
+        shifts.append(correlator.submit(reference, img))
 
         i += 1
 
@@ -191,6 +193,9 @@ def calibrate_beamshift_live(ctrl, gridsize=None, stepsize=None, save_images=Fal
 
     ctrl.beamshift.set(*beamshift_cent)
 
+    shifts = [future.result()[0] for future in shifts]
+    correlator.close()
+
     # correct for binsize, store in binsize=1
     shifts = np.array(shifts) * binsize / scale
     beampos = np.array(beampos) - np.array(beamshift_cent)
@@ -234,6 +239,9 @@ def calibrate_beamshift_from_image_fn(center_fn, other_fn):
     shifts = []
     beampos = []
 
+    correlator = CrossCorrelator()
+    reference = correlator.reference(img_cent)
+
     for fn in other_fn:
         img, h = load_img(fn)
         img = imgscale(img, scale)
@@ -243,10 +251,11 @@ def calibrate_beamshift_from_image_fn(center_fn, other_fn):
         print('Image:', fn)
         print('Beamshift: x={} | y={}'.format(*beamshift))
 
-        shift, error, phasediff = phase_cross_correlation(img_cent, img, upsample_factor=10)
-
         beampos.append(beamshift)
-        shifts.append(shift)
+        shifts.append(correlator.submit(reference, img))
+
+    shifts = [future.result()[0] for future in shifts]
+    correlator.close()
 
     # correct for binsize, store as binsize=1
     shifts = np.array(shifts) * binsize / scale
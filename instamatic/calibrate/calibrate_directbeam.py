@@ -5,8 +5,8 @@ import sys
 
 import matplotlib.pyplot as plt
 import numpy as np
-from skimage.registration import phase_cross_correlation
 
+from .correlate import CrossCorrelator
 from .filenames import *
 from .fit import fit_affine_transformation
 from instamatic import config
@@ -225,6 +225,10 @@ def calibrate_directbeam_live(ctrl, key='DiffShift', gridsize=None, stepsize=Non
     x_grid, y_grid = np.meshgrid(np.arange(-n, n + 1) * stepsize, np.arange(-n, n + 1) * stepsize)
     tot = gridsize * gridsize
 
+    # images are correlated while the next one is being acquired
+    correlator = CrossCorrelator()
+    reference = correlator.reference(img_cent)
+
     for i, (dx, dy) in enumerate(np.stack([x_grid, y_grid]).reshape(2, -1).T):
         i += 1
 
@@ -238,16 +242,17 @@ def calibrate_directbeam_live(ctrl, key='DiffShift', gridsize=None, stepsize=Non
         img, h = ctrl.get_image(exposure=exposure, binsize=binsize, out=outfile, comment=comment, header_keys=key)
         img = imgscale(img, scale)
 
-        shift, error, phasediff = phase_cross_correlation(img_cent, img, upsample_factor=10)
-
         readout = np.array(h[key])
         readouts.append(readout)
-        shifts.append(shift)
+        shifts.append(correlator.submit(reference, img))
 
     print('')
     # print "\nReset to center"
     attr.set(*readout_cent)
 
+    shifts = [future.result()[0] for future in shifts]
+    correlator.close()
+
     # correct for binsize, store in binsize=1
     shifts = np.array(shifts) * binsize / scale
     readouts = np.array(readouts) - np.array(readout_cent)
@@ -277,6 +282,9 @@ def calibrate_directbeam_from_file(center_fn, other_fn, key='DiffShift'):
     shifts = []
     readouts = []
 
+    correlator = CrossCorrelator()
+    reference = correlator.reference(img_cent)
+
     for i, fn in enumerate(other_fn):
         print(fn)
         img, h = load_img(fn)
@@ -287,10 +295,11 @@ def calibrate_directbeam_from_file(center_fn, other_fn, key='DiffShift'):
         print('Image:', fn)
         print('{}: dx={} | dy={}'.format(key, *readout))
 
-        shift, error, phasediff = phase_cross_correlation(img_cent, img, upsample_factor=10)
-
         readouts.append(readout)
-        shifts.append(shift)
+        shifts.append(correlator.submit(reference, img))
+
+    shifts = [future.result()[0] for future in shifts]
+    correlator.close()
 
     # correct for binsize, store in binsize=1
     shifts = np.array(shifts) * binsize / scale
@@ -4,9 +4,9 @@ import matplotlib.pyplot as plt
 import numpy as np
 import yaml
 from scipy import stats
-from skimage.registration import phase_cross_correlation
 
 from instamatic import config
+from instamatic.calibrate.correlate import CrossCorrelator
 from instamatic.calibrate.fit import fit_affine_transformation
 from instamatic.formats import read_tiff
 from instamatic.formats import write_tiff
@@ -39,10 +39,18 @@ def get_outlier_filter(data, threshold: float = 2.0) -> list:
 
 
 def cross_correlate_image_pairs(pairs: tuple) -> list:
-    """Cross correlate image pairs."""
+    """Cross correlate image pairs in parallel."""
+    with CrossCorrelator() as correlator:
+        futures = [correlator.submit(img0, img1) for img0, img1 in pairs]
+    return collect_translations(futures)
+
+
+def collect_translations(futures: list) -> list:
+    """Wait for the cross correlations (see `CrossCorrelator.submit`) and
+    return the translations."""
     translations = []
-    for img0, img1 in pairs:
-        translation, error, phasediff = phase_cross_correlation(img0, img1, upsample_factor=10)
+    for future in futures:
+        translation, error, phasediff = future.result()
         print(f'shift {translation} error {error:.4f} phasediff {phasediff:.4f}')
         translations.append(translation)
     return translations
@@ -161,6 +169,8 @@ def calibrate_stage_from_stageshifts(ctrl,
     mode = ctrl.mode.get()
     binning = ctrl.cam.getBinning()
 
+    # correlate the pairs while the stage moves to the next position
+    correlator = CrossCorrelator()
     pairs = []
 
     for i, (n_steps, step) in enumerate(args):
@@ -184,7 +194,7 @@ def calibrate_stage_from_stageshifts(ctrl,
             if drc:
                 write_tiff(drc / f'{i}_{j}.tiff', img)
 
-            pairs.append((last_img, img))
+            pairs.append(correlator.submit(last_img, img))
             stage_shifts.append((dx, dy))
 
             current_stage_pos = ctrl.stage
@@ -196,7 +206,8 @@ def calibrate_stage_from_stageshifts(ctrl,
         # return to original position
         ctrl.stage.xy = (stage_x, stage_y)
 
-    translations = cross_correlate_image_pairs(pairs)
+    translations = collect_translations(pairs)
+    correlator.close()
 
     # Filter outliers
     sel = get_outlier_filter(translations)
@@ -0,0 +1,72 @@
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from instamatic.imreg import Registration
+
+
+class CrossCorrelator:
+    """Run the cross correlations of a calibration routine on a thread pool,
+    so that the next image can be acquired while the previous one is being
+    registered.
+
+    The correlations are done with `instamatic.imreg.Registration`. If many
+    images are correlated with the same reference image, pass the
+    `Registration` from `reference` to `submit`, so that the spectrum of
+    the reference is computed only once.
+
+    upsample_factor: int
+        Passed to `skimage.registration.phase_cross_correlation`
+    max_workers: int
+        Number of threads to use
+
+    Usage:
+        with CrossCorrelator() as cc:
+            reference = cc.reference(img_cent)
+            futures = [cc.submit(reference, img) for img in images]
+        shifts = [future.result()[0] for future in futures]
+    """
+
+    def __init__(self, upsample_factor: int = 10, max_workers: int = None):
+        super().__init__()
+        self.upsample_factor = upsample_factor
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        self.close()
+
+    @staticmethod
+    def reference(img: np.ndarray) -> Registration:
+        """Return a `Registration` for reference image `img`, to pass to
+        `submit` or `correlate`."""
+        return Registration(img)
+
+    def correlate(self, reference, img: np.ndarray) -> (np.ndarray, float, float):
+        """Return the shift of `img` with respect to `reference` (an image
+        or a `Registration`), together with the error and the phase
+        difference."""
+        if not isinstance(reference, Registration):
+            reference = Registration(reference)
+
+        # does not use the scratch buffers of `Registration`, so it can
+        # be called from several threads with the same reference
+        return reference.phase_cross_correlation(img, upsample_factor=self.upsample_factor)
+
+    def submit(self, reference, img: np.ndarray) -> Future:
+        """Schedule the correlation of `img` with `reference` on the thread
+        pool, returns a future with the result of `correlate`."""
+        return self.executor.submit(self.correlate, reference, img)
+
+    def map(self, pairs) -> list:
+        """Correlate all `(reference, img)` pairs in parallel, returns a list
+        with the results of `correlate`."""
+        futures = [self.submit(reference, img) for reference, img in pairs]
+        return [future.result() for future in futures]
+
+    def close(self) -> None:
+        """Wait for the scheduled correlations and stop the threads."""
+        self.executor.shutdown(wait=True)
@@ -1,6 +1,5 @@
 from collections import namedtuple
 
-import lmfit
 import numpy as np
 
 
@@ -42,6 +41,8 @@ def fit_affine_transformation(a, b,
         translation matrices to transform `a` to `b`. The raw parameters can
         be accessed through the corresponding attributes.
     """
+    import lmfit
+
     params = lmfit.Parameters()
     params.add('angle', value=x0.get('angle', 0), vary=rotation, min=-np.pi, max=np.pi)
     params.add('sx', value=x0.get('sx', 1), vary=scaling)
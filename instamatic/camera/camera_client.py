@@ -1,6 +1,7 @@
 import atexit
 import socket
 import subprocess as sp
+import threading
 import time
 from functools import wraps
 
@@ -9,8 +10,13 @@ import numpy as np
 from instamatic import config
 from instamatic.exceptions import exception_list
 from instamatic.exceptions import TEMCommunicationError
+from instamatic.server.framing import is_array_header
+from instamatic.server.framing import recv_array
+from instamatic.server.framing import recv_frame
+from instamatic.server.framing import send_frame
 from instamatic.server.serializer import pickle_dumper as dumper
 from instamatic.server.serializer import pickle_loader as loader
+from instamatic.telemetry import metrics
 
 
 if config.settings.cam_use_shared_memory:
@@ -57,6 +63,13 @@ class CamClient:
         self.streamable = False  # overrides cam settings
         self.verbose = False
 
+        # Receive images into the same array every time, this avoids allocating memory
+        # for every image, but the caller must copy the data if they need to be kept
+        self.reuse_buffer = False
+        self._image_buffer = None
+
+        self._lock = threading.Lock()
+
         try:
             self.connect()
         except ConnectionRefusedError:
@@ -85,10 +98,6 @@ class CamClient:
 
         atexit.register(self.s.close)
 
-        xres, yres = self.getImageDimensions()
-        bitdepth = 4
-        self._imagebufsize = bitdepth * xres * yres + self._bufsize
-
     @property
     def is_local_connection(self):
         """Check if the socket connection is a local connection."""
@@ -120,20 +129,25 @@ class CamClient:
 
     def _eval_dct(self, dct):
         """Takes approximately 0.2-0.3 ms per call if HOST=='localhost'."""
-        self.s.send(dumper(dct))
+        dct['shared_memory'] = self.use_shared_memory
 
-        acquiring_image = dct['attr_name'] == 'getImage'
+        # one request at a time, otherwise the replies of different threads can interleave
+        with self._lock, metrics.timer('cam_rpc_seconds', func=dct['attr_name']):
+            send_frame(self.s, dumper(dct))
 
-        if acquiring_image and not self.use_shared_memory:
-            response = self.s.recv(self._imagebufsize)
-        else:
-            response = self.s.recv(self._bufsize)
+            response = recv_frame(self.s)
+            if not response:
+                raise ConnectionError('Connection to CAM server closed')
 
-        if response:
             status, data = loader(response)
 
-        if self.use_shared_memory and acquiring_image:
-            data = self.get_data_from_shared_memory(**data)
+            if is_array_header(data):
+                out = self._image_buffer if self.reuse_buffer else None
+                data = recv_array(self.s, out=out, **data)
+                if self.reuse_buffer:
+                    self._image_buffer = data
+            elif self.use_shared_memory and status == 200 and dct['attr_name'] == 'getImage':
+                data = self.get_data_from_shared_memory(**data)
 
         if status == 200:
             return data
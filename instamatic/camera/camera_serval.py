@@ -6,12 +6,16 @@ import numpy as np
 from serval_toolkit.camera import Camera as ServalCamera
 
 from instamatic import config
+from instamatic.camera.serval_stream import ServalStream
 logger = logging.getLogger(__name__)
 
 # Start servers in serval_toolkit:
 # 1. `java -jar .\emu\tpx3_emu.jar`
 # 2. `java -jar .\server\serv-2.1.3.jar`
 # 3. launch `instamatic`
+#
+# Without a detector, `python -m instamatic.camera.serval_simu` starts a
+# stand-in for the Serval server with simulated frames.
 
 
 class CameraServal:
@@ -97,6 +101,31 @@ class CameraServal:
 
         return arr
 
+    def getFrameStream(self, exposure=None, binsize=None, maxsize: int = 64) -> ServalStream:
+        """Return a stream of frames from a measurement that keeps running
+        with the `CONTINUOUS` trigger mode, see `ServalStream`. This avoids
+        the configuration and trigger requests that `getImage` makes for
+        every frame.
+
+        exposure:
+            Exposure time in seconds.
+        binsize:
+            Which binning to use, the frames are binned in software.
+        maxsize:
+            Maximum number of frames waiting to be picked up, older frames
+            are dropped (counted in `ServalStream.ndropped`)
+
+        Usage:
+            with cam.getFrameStream(exposure=0.1) as stream:
+                frame = stream.get()
+        """
+        if exposure is None:
+            exposure = self.default_exposure
+        if not binsize:
+            binsize = self.default_binsize
+
+        return ServalStream(self.url, exposure=exposure, binsize=binsize, maxsize=maxsize)
+
     def getImageDimensions(self) -> (int, int):
         """Get the binned dimensions reported by the camera."""
         binning = self.getBinning()
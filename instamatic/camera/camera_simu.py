@@ -1,6 +1,7 @@
 import atexit
 import logging
 import time
+from pathlib import Path
 
 import numpy as np
 
@@ -8,9 +9,71 @@ from instamatic import config
 logger = logging.getLogger(__name__)
 
 
+def simulate_diffraction_pattern(shape: tuple, n_spots: int = 100, seed: int = None) -> np.ndarray:
+    """Generate a synthetic diffraction pattern with the primary beam near
+    the center of the image and Bragg spots on a random 2D lattice.
+
+    shape: tuple
+        Shape of the image
+    n_spots: int
+        Approximate number of Bragg spots
+    seed: int
+        Seed for the random number generator
+
+    Returns the pattern as a float32 array, with intensities up to 1.0.
+    """
+    from scipy import ndimage
+
+    rng = np.random.RandomState(seed)
+    ny, nx = shape
+    center = np.array(shape) / 2 + rng.uniform(-5, 5, size=2)
+
+    # reciprocal lattice with spots (h, k) at center + h*a + k*b
+    length = min(shape) / (2 * np.sqrt(n_spots))
+    angle = rng.uniform(0, np.pi)
+    gamma = rng.uniform(np.pi / 3, 2 * np.pi / 3)
+    a = length * rng.uniform(0.8, 1.2) * np.array((np.cos(angle), np.sin(angle)))
+    b = length * rng.uniform(0.8, 1.2) * np.array((np.cos(angle + gamma), np.sin(angle + gamma)))
+
+    n = int(np.sqrt(n_spots))
+    h, k = np.mgrid[-n:n + 1, -n:n + 1].reshape(2, -1)
+    coords = center + np.outer(h, a) + np.outer(k, b)
+    intensities = rng.exponential(0.05, size=len(coords)) * np.exp(-np.hypot(h, k) / n)
+
+    sel = (h != 0) | (k != 0)
+    i, j = np.round(coords[sel]).astype(int).T
+    inside = (i >= 0) & (i < ny) & (j >= 0) & (j < nx)
+
+    img = np.zeros(shape, dtype=np.float32)
+    np.add.at(img, (i[inside], j[inside]), intensities[sel][inside])
+    img = ndimage.gaussian_filter(img, 1.5) * 2 * np.pi * 1.5**2
+
+    # primary beam and diffuse background
+    yy, xx = np.ogrid[:ny, :nx]
+    r2 = (yy - center[0])**2 + (xx - center[1])**2
+    img += np.exp(-r2 / (2 * 3.0**2)) + 0.02 * np.exp(-np.sqrt(r2) / (min(shape) / 8))
+
+    return img.astype(np.float32)
+
+
 class CameraSimu:
     """Simple class that simulates the camera interface and mocks the method
-    calls."""
+    calls.
+
+    The following keys in the camera config control the simulation:
+
+    pattern:
+        `noise` (default) returns uniform random noise, `diffraction`
+        returns a synthetic diffraction pattern with shot noise
+    dtype:
+        Data type of the images, e.g. `uint16` (default: `int64`)
+    readout_latency:
+        Time in seconds added to the exposure for every image (default: 0)
+    """
+
+    pattern = 'noise'
+    dtype = 'int64'
+    readout_latency = 0.0
 
     def __init__(self, name='simulate'):
         """Initialize camera module."""
@@ -32,6 +95,9 @@ class CameraSimu:
         self._exposure = self.default_exposure
         self._autoincrement = True
         self._start_record_time = -1
+        self._start_record_index = 0
+        self._record_start = 0.0
+        self._deleted = set()
 
     def load_defaults(self):
         if self.name != config.settings.camera:
@@ -61,12 +127,43 @@ class CameraSimu:
         dim_x = int(dim_x / binsize)
         dim_y = int(dim_y / binsize)
 
-        time.sleep(exposure)
+        time.sleep(exposure + self.readout_latency)
 
-        arr = np.random.randint(256, size=(dim_x, dim_y))
+        if self.pattern == 'diffraction':
+            arr = self._diffraction_frame((dim_x, dim_y))
+        else:
+            arr = np.random.randint(256, size=(dim_x, dim_y)).astype(self.dtype, copy=False)
 
         return arr
 
+    def _diffraction_frame(self, shape: tuple) -> np.ndarray:
+        """Return a noisy frame of the simulated diffraction pattern, scaled
+        to the dynamic range of the camera.
+
+        The pattern and a block of noise are generated once per image
+        shape. For every frame, a random slice of the noise is taken and
+        the spot intensities are varied, which is fast enough to keep up
+        with high frame rates.
+        """
+        cache = self.__dict__.setdefault('_pattern_cache', {})
+        if shape not in cache:
+            rng = np.random.RandomState(len(cache))
+            pattern = simulate_diffraction_pattern(shape, seed=len(cache)) * 0.9 * self.dynamic_range
+            noise = rng.normal(0, 1, size=(2 * shape[0], shape[1])).astype(np.float32)
+            cache[shape] = pattern, np.sqrt(pattern + 1), noise
+
+        pattern, sigma, noise = cache[shape]
+        offset = np.random.randint(shape[0])
+
+        arr = pattern * np.random.uniform(0.8, 1.2)
+        arr += sigma * noise[offset:offset + shape[0]]
+
+        dtype = np.dtype(self.dtype)
+        if dtype.kind in 'ui':
+            info = np.iinfo(dtype)
+            np.clip(arr, 0, info.max, out=arr)
+        return arr.astype(dtype)
+
     def acquireImage(self) -> int:
         """For TVIPS compatibility."""
         return 1
@@ -126,22 +223,28 @@ class CameraSimu:
         self._image_index = value
 
     def get_image_index(self):
+        """While recording, the index of the last frame that was
+        completed."""
+        t1 = self._start_record_time
+        if t1 >= 0:
+            n_images = int((time.perf_counter() - t1) / self._exposure)
+            return self._start_record_index + n_images
         return self._image_index
 
     def stop_record(self) -> None:
         t1 = self._start_record_time
         if t1 >= 0:
             t2 = time.perf_counter()
-            n_images = int((t2 - t1) / self._exposure)
-            new_index = self.get_image_index() + n_images
+            new_index = self.get_image_index()
+            self._start_record_time = -1
             self.set_image_index(new_index)
             print('stop_record', t1, t2, self._exposure, new_index)
-            self._start_record_time = -1
         else:
             pass
 
     def start_record(self) -> None:
-        self._start_record_time = time.perf_counter()
+        self._start_record_index = self._image_index
+        self._record_start = self._start_record_time = time.perf_counter()
 
     def stop_liveview(self) -> None:
         self.stop_record()
@@ -157,11 +260,36 @@ class CameraSimu:
     def get_exposure(self) -> int:
         return self._exposure
 
+    def _check_image_index(self, image_index: int) -> None:
+        if image_index in self._deleted:
+            raise IndexError(f'Image #{image_index} was deleted')
+
     def get_timestamps(self, start_index, end_index):
-        return list(range(20))
+        """Timestamps (s) of the frames of the last recording."""
+        timestamps = []
+        for image_index in range(start_index, end_index + 1):
+            self._check_image_index(image_index)
+            timestamps.append(self._record_start + (image_index - self._start_record_index) * self._exposure)
+        return timestamps
 
     def getBinning(self):
         return self.default_binsize
 
-    def writeTiffs(self, start_index: int, stop_index: int, path: str, clear_buffer=True) -> None:
-        pass
+    def writeTiff(self, image_index, filename: str) -> None:
+        from instamatic.formats import write_tiff
+
+        self._check_image_index(image_index)
+        dim_x, dim_y = self.getImageDimensions()
+        arr = np.random.randint(256, size=(dim_x, dim_y)).astype(np.uint16)
+        write_tiff(filename, arr)
+
+    def writeTiffs(self, start_index: int, stop_index: int, path: str, clear_buffer=False) -> None:
+        path = Path(path)
+        for i, image_index in enumerate(range(start_index, stop_index + 1)):
+            self.writeTiff(image_index, str(path / f'{i:04d}.tiff'))
+            if clear_buffer:
+                self.deleteImageByIndex(image_index)
+
+    def deleteImageByIndex(self, img_index: int, drc_index: int = None) -> None:
+        self._check_image_index(img_index)
+        self._deleted.add(img_index)
@@ -10,6 +10,10 @@ from pathlib import Path
 import numpy as np
 
 from instamatic import config
+from instamatic.camera.framebuffer import BufferPool
+from instamatic.camera.timepix_pixelmap import arrangeData
+from instamatic.camera.timepix_pixelmap import correctCross
+from instamatic.camera.timepix_pixelmap import PixelMap
 from instamatic.utils import high_precision_timers
 high_precision_timers.enable()
 
@@ -22,33 +26,6 @@ class LockingError(RuntimeError):
     pass
 
 
-def arrangeData(raw, out=None):
-    """10000 loops, best of 3: 81.3 s per loop."""
-    s = 256 * 256
-    q1 = raw[0:s].reshape(256, 256)
-    q2 = raw[s:2 * s].reshape(256, 256)
-    q3 = raw[2 * s:3 * s][::-1].reshape(256, 256)
-    q4 = raw[3 * s:4 * s][::-1].reshape(256, 256)
-
-    if out is None:
-        out = np.empty((516, 516), dtype=raw.dtype)
-    out[0:256, 0:256] = q1
-    out[0:256, 260:516] = q2
-    out[260:516, 0:256] = q4
-    out[260:516, 260:516] = q3
-
-    return out
-
-
-def correctCross(raw, factor=2.15):
-    """100000 loops, best of 3: 18 us per loop."""
-    raw[255:258] = raw[255] / factor
-    raw[:, 255:258] = raw[:, 255:256] / factor
-
-    raw[258:261] = raw[260] / factor
-    raw[:, 258:261] = raw[:, 260:261] / factor
-
-
 class CameraTPX:
     def __init__(self, name='pytimepix'):
         libdrc = Path(__file__).parent
@@ -281,12 +258,10 @@ class CameraTPX:
 
         # self.closeShutter()
 
-        arr = self.readMatrix()
+        arr = self.readMatrix(self._readout)
 
-        out = arrangeData(arr)
-        correctCross(out, factor=self.correction_ratio)
-
-        out = np.rot90(out, k=3)
+        # arrangeData + correctCross + np.rot90(k=3), into a buffer from the pool
+        out = self.pixelmap(arr, out=self._buffers.get())
 
         return out
 
@@ -307,6 +282,11 @@ class CameraTPX:
 
         self.streamable = True
 
+        # reused for every frame, see `acquireData`
+        self.pixelmap = PixelMap(factor=self.correction_ratio)
+        self._readout = np.empty(PixelMap.size, dtype=np.int16)
+        self._buffers = BufferPool(PixelMap.shape, dtype=np.int16)
+
 
 def initialize(config, name='pytimepix'):
     from pathlib import Path
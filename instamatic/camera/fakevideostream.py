@@ -3,7 +3,7 @@ import threading
 import numpy as np
 
 from .camera import Camera
-from instamatic.image_utils import autoscale
+from .framebuffer import FrameBuffer
 
 
 class VideoStream(threading.Thread):
@@ -30,9 +30,8 @@ class VideoStream(threading.Thread):
 
         self.streamable = self.cam.streamable
 
-        self.display_dim = 512
-
-        self.frame, scale = autoscale(np.ones(self.dimensions), maxdim=self.display_dim)
+        self.buffer = FrameBuffer(size=1)
+        self.buffer.put(np.ones(self.dimensions))
 
     def __getattr__(self, attrname):
         """Pass attribute lookups to self.cam to prevent AttributeError."""
@@ -45,10 +44,15 @@ class VideoStream(threading.Thread):
             except AttributeError:
                 raise reraise_on_fail
 
+    @property
+    def frame(self):
+        """Copy of the most recent frame."""
+        return self.buffer.get()
+
     def getImage(self, exposure=None, binsize=None):
         frame = self.cam.getImage(exposure=exposure, binsize=binsize)
 
-        self.frame, scale = autoscale(frame, maxdim=self.display_dim)
+        self.buffer.put(frame)
 
         return frame
 
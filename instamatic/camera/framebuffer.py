@@ -0,0 +1,137 @@
+import sys
+import threading
+
+import numpy as np
+
+
+class FrameBuffer:
+    """Fixed-size ring buffer for the frames from a video stream.
+
+    The frames are copied into `size` preallocated slots, and numbered
+    with a sequence number (starting at 1). Consumers can wait for the next
+    frame (`wait`) or get views of the latest frames without copying
+    (`latest`). A view is valid until the slot is reused, i.e. after
+    `size` more frames have been put into the buffer.
+
+    A new set of slots is allocated when the shape or dtype of the frames
+    changes (e.g. after changing the binning).
+
+    size: int
+        Number of frames to keep
+    """
+
+    def __init__(self, size: int = 8):
+        super().__init__()
+
+        self.size = size
+        self.count = 0
+        self._slots = None
+        self._seqs = np.zeros(size, dtype=int)
+        self._condition = threading.Condition()
+
+    def __len__(self):
+        return min(self.count, self.size)
+
+    def put(self, frame: np.ndarray) -> int:
+        """Copy `frame` into the next slot, returns its sequence number."""
+        frame = np.asarray(frame)
+
+        with self._condition:
+            slots = self._slots
+            if slots is None or slots.shape[1:] != frame.shape or slots.dtype != frame.dtype:
+                self._slots = slots = np.empty((self.size, *frame.shape), dtype=frame.dtype)
+                self._seqs[:] = 0
+
+            seq = self.count + 1
+            slot = seq % self.size
+            slots[slot] = frame
+            self._seqs[slot] = seq
+            self.count = seq
+
+            self._condition.notify_all()
+
+        return seq
+
+    def latest(self, n: int = 1) -> list:
+        """Return up to `n` of the most recent frames as a list of `(seq,
+        frame)` tuples, oldest first.
+
+        The frames are views into the buffer, copy them if they must
+        be kept.
+        """
+        with self._condition:
+            if self._slots is None:
+                return []
+            n = min(n, len(self))
+            seqs = range(self.count - n + 1, self.count + 1)
+            return [(seq, self._slots[seq % self.size]) for seq in seqs if self._seqs[seq % self.size] == seq]
+
+    def get(self) -> np.ndarray:
+        """Return a copy of the most recent frame (or None)."""
+        with self._condition:
+            if self._slots is None or self.count == 0:
+                return None
+            return self._slots[self.count % self.size].copy()
+
+    def wait(self, seq: int = 0, timeout: float = None) -> (int, np.ndarray):
+        """Wait until a frame newer than `seq` is available, returns the
+        latest `(seq, frame)` (a view, see `latest`), or `(seq, None)` if
+        the timeout expires.
+
+        The number of frames skipped is the difference between the
+        returned and the given sequence number minus one.
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self.count > seq, timeout=timeout):
+                return seq, None
+            return self.count, self._slots[self.count % self.size]
+
+
+class BufferPool:
+    """Pool of preallocated arrays of the same shape and dtype, to avoid
+    allocating a new array for every frame.
+
+    `get` returns the arrays round-robin. An array is only handed out
+    again once nobody else holds a reference to it (or to a view of it),
+    so frames that are still waiting in a queue are never overwritten.
+    If all arrays are in use, a new one is allocated in place of the
+    next one in the pool (`nallocated` counts these).
+
+    shape, dtype:
+        Shape and dtype of the arrays
+    size: int
+        Number of arrays in the pool
+    """
+
+    def __init__(self, shape: tuple, dtype, size: int = 4):
+        super().__init__()
+
+        self.shape = shape
+        self.dtype = np.dtype(dtype)
+        self.size = size
+        self.nallocated = 0
+
+        self._buffers = [np.empty(shape, dtype=dtype) for n in range(size)]
+        self._next = 0
+        self._lock = threading.Lock()
+
+        # references to an array that is not in use, counted the same way as in `get`
+        buf = self._buffers[0]
+        self._free_refs = sys.getrefcount(buf)
+        del buf
+
+    def get(self) -> np.ndarray:
+        """Return an array that is not in use (contents undefined)."""
+        with self._lock:
+            for n in range(self.size):
+                i = (self._next + n) % self.size
+                buf = self._buffers[i]
+                if sys.getrefcount(buf) <= self._free_refs:
+                    self._next = i + 1
+                    return buf
+
+            i = self._next % self.size
+            buf = self._buffers[i] = np.empty(self.shape, dtype=self.dtype)
+            self._next = i + 1
+            self.nallocated += 1
+            return buf
@@ -0,0 +1,293 @@
+"""Stand-in for the Serval HTTP server, to develop and test the Serval
+camera interface without a detector.
+
+It implements the part of the Serval REST API that instamatic uses:
+
+    GET  /dashboard
+    GET  /detector/config, PUT /detector/config
+    GET  /server/destination, PUT /server/destination
+    GET  /measurement/start, /measurement/stop, /measurement/trigger/start
+    GET  /measurement/image
+
+Frames are generated at the times the detector would produce them, given
+the trigger mode, exposure time, trigger period and number of triggers.
+`/measurement/image` returns the next frame as PGM (or TIFF for 24 bit
+pixel depth), waiting until it has been exposed, or `204 No Content` if no
+frame is expected. If more than `queue_size` frames are waiting, the
+oldest are dropped, as in the Serval preview channel.
+
+To use:
+    python -m instamatic.camera.serval_simu --port 8080
+"""
+import io
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+import numpy as np
+
+DEFAULT_DETECTOR_CONFIG = {
+    'TriggerMode': 'AUTOTRIGSTART_TIMERSTOP',
+    'ExposureTime': 0.1,
+    'TriggerPeriod': 0.1005,
+    'nTriggers': 1,
+    'PixelDepth': 12,
+    'BiasVoltage': 100,
+}
+
+
+def write_pgm(arr: np.ndarray) -> bytes:
+    """Encode `arr` as binary (P5) PGM image."""
+    maxval = 65535 if arr.dtype.itemsize > 1 else 255
+    dtype = '>u2' if maxval > 255 else 'u1'
+    header = f'P5\n{arr.shape[1]} {arr.shape[0]}\n{maxval}\n'.encode()
+    return header + np.ascontiguousarray(arr, dtype=dtype).tobytes()
+
+
+class ServalSimu:
+    """State of the simulated detector and measurement."""
+
+    def __init__(self, shape: tuple = (512, 512), queue_size: int = 16):
+        super().__init__()
+        self.shape = shape
+        self.queue_size = queue_size
+
+        self.detector_config = dict(DEFAULT_DETECTOR_CONFIG)
+        self.destination = {}
+        self.status = None
+        self.frame_count = 0
+        self.dropped = 0
+
+        self._lock = threading.Lock()
+        self._t_trigger = None
+        self._n_triggered = 0
+        self._next_frame = 0
+
+        self._frames = {}
+
+    def dashboard(self) -> dict:
+        with self._lock:
+            measurement = None if self.status is None else {
+                'Status': self.status,
+                'FrameCount': self.frame_count,
+                'DroppedFrames': self.dropped,
+            }
+        return {'Server': {'SoftwareVersion': 'simu'}, 'Measurement': measurement}
+
+    def set_detector_config(self, config: dict) -> None:
+        with self._lock:
+            changed = any(self.detector_config.get(key) != value for key, value in config.items())
+            if changed and self.status == 'DA_RECORDING':
+                raise RuntimeError('Cannot change the detector configuration during a measurement')
+            self.detector_config.update(config)
+
+    def measurement_start(self) -> None:
+        with self._lock:
+            self.status = 'DA_RECORDING'
+            self.frame_count = 0
+            self.dropped = 0
+            self._t_trigger = None
+            self._n_triggered = 0
+            self._next_frame = 0
+
+    def measurement_stop(self) -> None:
+        with self._lock:
+            if self.status is not None:
+                self.status = 'DA_STOPPED'
+            self._t_trigger = None
+
+    def trigger_start(self) -> None:
+        """Start a train of `nTriggers` frames, one every trigger period."""
+        with self._lock:
+            if self.status != 'DA_RECORDING':
+                raise RuntimeError('No measurement is running')
+            self._t_trigger = time.perf_counter()
+            self._n_triggered = int(self.detector_config['nTriggers'])
+            self._next_frame = 0
+
+    def _frame_time(self, n: int) -> float:
+        """Time at which frame `n` of the train is read out."""
+        cfg = self.detector_config
+        return self._t_trigger + n * cfg['TriggerPeriod'] + cfg['ExposureTime']
+
+    def next_frame(self):
+        """Wait for the next frame of the train and return it, or None if
+        there is no frame to wait for."""
+        with self._lock:
+            if self.status != 'DA_RECORDING' or self._t_trigger is None:
+                return None
+            if self._next_frame >= self._n_triggered:
+                return None
+
+            now = time.perf_counter()
+            # frames that are ready but were not fetched
+            n_ready = int((now - self._t_trigger - self.detector_config['ExposureTime']) // self.detector_config['TriggerPeriod']) + 1
+            n_ready = min(n_ready, self._n_triggered)
+            if n_ready - self._next_frame > self.queue_size:
+                skip = n_ready - self._next_frame - self.queue_size
+                self.dropped += skip
+                self._next_frame += skip
+
+            n = self._next_frame
+            self._next_frame += 1
+            t = self._frame_time(n)
+
+        delay = t - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+        with self._lock:
+            self.frame_count += 1
+        return self.frame(n)
+
+    def frame(self, n: int) -> np.ndarray:
+        """Simulated frame number `n`. A few frames are generated once and
+        reused, so that the server keeps up with short exposure times."""
+        dtype = np.uint16 if self.detector_config['PixelDepth'] <= 16 else np.uint32
+        key = (n % 4, dtype)
+        if key not in self._frames:
+            rng = np.random.default_rng(key[0])
+            counts = rng.poisson(2, size=self.shape)
+            y, x = self.shape[0] // 2, self.shape[1] // 2
+            counts[y - 2:y + 3, x - 2:x + 3] += 1000
+            self._frames[key] = counts.astype(dtype)
+        return self._frames[key]
+
+    def encode(self, arr: np.ndarray) -> tuple:
+        """Encode `arr` in the format of the preview channel."""
+        if self.detector_config['PixelDepth'] == 24:
+            import tifffile
+            buf = io.BytesIO()
+            tifffile.imwrite(buf, arr)
+            return buf.getvalue(), 'image/tiff'
+        else:
+            return write_pgm(arr), 'image/x-portable-graymap'
+
+
+class ServalSimuServer:
+    """HTTP server for `ServalSimu`, run in a background thread.
+
+    Usage:
+        with ServalSimuServer(port=0) as server:
+            stream = ServalStream(server.url, exposure=0.01)
+    """
+
+    def __init__(self, host: str = 'localhost', port: int = 8080, **kwargs):
+        super().__init__()
+        self.simu = ServalSimu(**kwargs)
+        self.requests = 0
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        self.stop()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._server.serve_forever, name='serval-simu', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def _make_handler(self):
+        server = self
+        simu = self.simu
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def _send(self, status: int, body: bytes = b'', content_type: str = 'text/plain'):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_json(self, obj):
+                self._send(200, json.dumps(obj).encode(), 'application/json')
+
+            def _read_json(self):
+                length = int(self.headers.get('Content-Length', 0))
+                return json.loads(self.rfile.read(length))
+
+            def do_GET(self):
+                server.requests += 1
+                path = self.path.split('?')[0].rstrip('/')
+                try:
+                    if path == '/dashboard':
+                        self._send_json(simu.dashboard())
+                    elif path == '/detector/config':
+                        self._send_json(simu.detector_config)
+                    elif path == '/server/destination':
+                        self._send_json(simu.destination)
+                    elif path == '/measurement/start':
+                        simu.measurement_start()
+                        self._send(200, b'Measurement started')
+                    elif path == '/measurement/stop':
+                        simu.measurement_stop()
+                        self._send(200, b'Measurement stopped')
+                    elif path == '/measurement/trigger/start':
+                        simu.trigger_start()
+                        self._send(200, b'Triggered')
+                    elif path == '/measurement/image':
+                        arr = simu.next_frame()
+                        if arr is None:
+                            self._send(204)
+                        else:
+                            self._send(200, *simu.encode(arr))
+                    else:
+                        self._send(404, f'Not found: {path}'.encode())
+                except RuntimeError as e:
+                    self._send(409, str(e).encode())
+
+            def do_PUT(self):
+                server.requests += 1
+                path = self.path.split('?')[0].rstrip('/')
+                try:
+                    if path == '/detector/config':
+                        simu.set_detector_config(self._read_json())
+                        self._send(200, b'Detector configuration updated')
+                    elif path == '/server/destination':
+                        simu.destination = self._read_json()
+                        self._send(200, b'Destination updated')
+                    else:
+                        self._send(404, f'Not found: {path}'.encode())
+                except RuntimeError as e:
+                    self._send(409, str(e).encode())
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    import argparse
+
+    description = 'Stand-in for the Serval HTTP server, serves simulated frames.'
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--host', default='localhost', help='Host to listen on')
+    parser.add_argument('--port', type=int, default=8080, help='Port to listen on')
+    options = parser.parse_args()
+
+    server = ServalSimuServer(host=options.host, port=options.port)
+    print(f'Serval stand-in running at {server.url}, press <CTRL+C> to stop')
+    server._server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
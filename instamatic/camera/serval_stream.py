@@ -0,0 +1,249 @@
+import http.client
+import io
+import json
+import logging
+import queue
+import threading
+import time
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from instamatic.image_utils import bin_ndarray
+from instamatic.telemetry import metrics
+
+logger = logging.getLogger(__name__)
+
+# number of triggers for a measurement that runs until it is stopped
+CONTINUOUS_TRIGGERS = 2**31 - 1
+
+StreamFrame = namedtuple('StreamFrame', 'index t time image')
+StreamFrame.__doc__ = """Frame received from a `ServalStream`.
+
+index: Frame number, starting at 1. Frames dropped because the queue was
+    full leave a gap.
+t: Time the frame was received (s, `time.perf_counter` clock)
+time: Time the frame was received (s, `time.time` clock)
+image: Image as 2D numpy array
+"""
+
+
+def read_pgm(data: bytes) -> np.ndarray:
+    """Decode a binary (P5) PGM image."""
+    fields = []
+    pos = 0
+    while len(fields) < 4:
+        # skip whitespace and comments
+        while data[pos:pos + 1].isspace():
+            pos += 1
+        if data[pos:pos + 1] == b'#':
+            pos = data.index(b'\n', pos)
+            continue
+        end = pos
+        while not data[end:end + 1].isspace():
+            end += 1
+        fields.append(data[pos:end])
+        pos = end
+    pos += 1  # single whitespace before the raster
+
+    magic, width, height, maxval = fields
+    if magic != b'P5':
+        raise ValueError(f'Not a binary PGM image: {magic!r}')
+
+    dtype = '>u2' if int(maxval) > 255 else 'u1'
+    shape = (int(height), int(width))
+    return np.frombuffer(data, dtype=dtype, count=shape[0] * shape[1], offset=pos).reshape(shape)
+
+
+def decode_image(data: bytes) -> np.ndarray:
+    """Decode an image from the Serval preview channel (PGM or TIFF)."""
+    if data[:2] == b'P5':
+        return read_pgm(data)
+    else:
+        import tifffile
+        return tifffile.imread(io.BytesIO(data))
+
+
+class ServalStream:
+    """Keep a Serval measurement running with the `CONTINUOUS` trigger mode,
+    and receive the frames in a background thread.
+
+    Instead of reconfiguring the detector and triggering it for every
+    frame, as `CameraServal.getImage` does, the detector runs freely and
+    a thread fetches the frames from the preview channel of Serval
+    (`GET /measurement/image`) over a single keep-alive connection. The
+    frames are put on a queue as `StreamFrame`s, with the time they were
+    received. If the queue is full, the oldest frame is dropped, with a
+    warning in the log. The number of dropped frames is kept in
+    `ndropped` (`nreceived` counts all frames), and dropped frames leave
+    a gap in `StreamFrame.index`.
+
+    The detector configuration is restored and the measurement stopped
+    when the stream is stopped.
+
+    url:
+        Serval url, e.g. `http://localhost:8080`
+    exposure:
+        Exposure time in seconds
+    trigger_period:
+        Time between frames in seconds, defaults to `exposure`
+    binsize:
+        Bin the frames by this factor (summing the counts), the detector
+        itself does not bin
+    maxsize:
+        Maximum number of frames waiting in the queue
+
+    Usage:
+        with ServalStream(url, exposure=0.1) as stream:
+            for frame in stream:
+                print(frame.index, frame.image.mean())
+    """
+
+    def __init__(self, url: str, exposure: float, trigger_period: float = None, binsize: int = 1, maxsize: int = 64):
+        super().__init__()
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+
+        self.exposure = exposure
+        self.trigger_period = trigger_period or exposure
+        self.binsize = binsize or 1
+
+        self.nreceived = 0
+        self.ndropped = 0
+
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._exception = None
+        self._detector_config = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        self.stop()
+
+    def __iter__(self):
+        while self.running or not self._queue.empty():
+            frame = self.get(timeout=0.1)
+            if frame is not None:
+                yield frame
+
+    def _request(self, method: str, path: str, body=None):
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=10)
+        try:
+            if body is not None:
+                body = json.dumps(body)
+            conn.request(method, path, body=body)
+            response = conn.getresponse()
+            data = response.read()
+        finally:
+            conn.close()
+
+        if response.status >= 400:
+            raise ConnectionError(f'{method} {path}: {response.status} {data.decode(errors="replace")}')
+
+        return json.loads(data) if data and response.getheader('Content-Type', '').startswith('application/json') else data
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Configure the detector for continuous triggering, start the
+        measurement and the receiving thread."""
+        dashboard = self._request('GET', '/dashboard')
+        measurement = dashboard.get('Measurement')
+        if measurement and measurement.get('Status') == 'DA_RECORDING':
+            self._request('GET', '/measurement/stop')
+
+        self._detector_config = self._request('GET', '/detector/config')
+        detector_config = dict(self._detector_config,
+                               TriggerMode='CONTINUOUS',
+                               ExposureTime=self.exposure,
+                               TriggerPeriod=self.trigger_period,
+                               nTriggers=CONTINUOUS_TRIGGERS)
+        self._request('PUT', '/detector/config', detector_config)
+
+        self._request('GET', '/measurement/start')
+        self._request('GET', '/measurement/trigger/start')
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='serval-stream', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the measurement and restore the detector configuration."""
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+
+        self._request('GET', '/measurement/stop')
+        if self._detector_config is not None:
+            self._request('PUT', '/detector/config', self._detector_config)
+            self._detector_config = None
+
+        if self.ndropped:
+            logger.warning(f'Serval stream: {self.ndropped} of {self.nreceived} frames dropped')
+
+    def get(self, timeout: float = None):
+        """Return the next `StreamFrame`, or None if no frame arrived within
+        `timeout` seconds (default: wait until there is one, or the stream
+        stops). Raises the error if receiving the frames failed."""
+        while True:
+            try:
+                return self._queue.get(timeout=0.1 if timeout is None else timeout)
+            except queue.Empty:
+                if self._exception:
+                    raise self._exception
+                if timeout is not None or not self.running:
+                    return None
+
+    def _put(self, frame: StreamFrame) -> None:
+        while True:
+            try:
+                self._queue.put_nowait(frame)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    continue
+                if not self.ndropped:
+                    logger.warning('Serval stream: frames are not picked up fast enough, dropping the oldest frames')
+                self.ndropped += 1
+                metrics.inc('serval_stream_dropped_frames_total')
+
+    def _run(self) -> None:
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=max(10, 10 * self.trigger_period))
+        poll_interval = min(self.trigger_period / 4, 0.01)
+
+        try:
+            while not self._stop_event.is_set():
+                t0 = time.perf_counter()
+                conn.request('GET', '/measurement/image')
+                response = conn.getresponse()
+                data = response.read()
+
+                if response.status == 200:
+                    t = time.perf_counter()
+                    metrics.observe('serval_image_request_seconds', t - t0)
+                    self.nreceived += 1
+                    image = decode_image(data)
+                    if self.binsize > 1:
+                        image = bin_ndarray(image, binning=self.binsize, operation='sum')
+                    self._put(StreamFrame(self.nreceived, t, time.time(), image))
+                elif response.status == 204:
+                    # no new frame yet
+                    self._stop_event.wait(poll_interval)
+                else:
+                    raise ConnectionError(f'GET /measurement/image: {response.status} {data.decode(errors="replace")}')
+        except Exception as e:
+            logger.exception(e)
+            self._exception = e
+        finally:
+            conn.close()
@@ -0,0 +1,132 @@
+"""Conversion of the raw Timepix (Relaxd 2x2) readout to an image.
+
+The readout is a flat array with the four 256x256 chips one after the
+other. `arrangeData` places the chips in a 516x516 image, leaving a 4
+pixel gap between them, and `correctCross` fills the gap by spreading the
+counts of the larger pixels at the chip edges. The image is then rotated
+by 270 degrees.
+
+`PixelMap` compiles these steps into a lookup table, so that the image
+can be made from the readout into a preallocated array. It does not need
+the camera library, so that it can be tested on its own.
+"""
+import numpy as np
+
+CHIP_SIZE = 256
+GAP = 4
+IMAGE_SIZE = 2 * CHIP_SIZE + GAP
+
+
+def arrangeData(raw, out=None):
+    """10000 loops, best of 3: 81.3 s per loop."""
+    s = 256 * 256
+    q1 = raw[0:s].reshape(256, 256)
+    q2 = raw[s:2 * s].reshape(256, 256)
+    q3 = raw[2 * s:3 * s][::-1].reshape(256, 256)
+    q4 = raw[3 * s:4 * s][::-1].reshape(256, 256)
+
+    if out is None:
+        out = np.empty((516, 516), dtype=raw.dtype)
+    out[0:256, 0:256] = q1
+    out[0:256, 260:516] = q2
+    out[260:516, 0:256] = q4
+    out[260:516, 260:516] = q3
+
+    return out
+
+
+def correctCross(raw, factor=2.15):
+    """100000 loops, best of 3: 18 us per loop."""
+    raw[255:258] = raw[255] / factor
+    raw[:, 255:258] = raw[:, 255:256] / factor
+
+    raw[258:261] = raw[260] / factor
+    raw[:, 258:261] = raw[:, 260:261] / factor
+
+
+class PixelMap:
+    """Lookup table that turns the raw readout into the image.
+
+    Pixel `(i, j)` of the image before rotation is `raw[index[i, j]] *
+    gain[i, j]`, which is equivalent to `arrangeData` and `correctCross`.
+    The table is compiled into a copy of every chip (a flipped view of the
+    readout), and a single take/multiply for the pixels on the cross,
+    where the gain differs from 1. Like before, the rotation is a view
+    (`np.rot90(k=3)`).
+
+    Where the row and column corrections overlap, `correctCross` rounds
+    down twice, the table once, so these pixels can be 1 count higher.
+
+    factor:
+        Correction ratio for the cross pixels (`correction_ratio` in the
+        camera config)
+    """
+
+    shape = (IMAGE_SIZE, IMAGE_SIZE)
+    size = 4 * CHIP_SIZE * CHIP_SIZE
+    k = 3
+
+    def __init__(self, factor: float = 2.15):
+        super().__init__()
+        self.factor = factor
+        self.index, self.gain = self.build(factor)
+
+        # every chip is a (flipped) view of the readout
+        chips = np.arange(self.size).reshape(4, CHIP_SIZE, CHIP_SIZE)
+        self.blocks = []
+        for row in (0, CHIP_SIZE + GAP):
+            for col in (0, CHIP_SIZE + GAP):
+                dst = (slice(row, row + CHIP_SIZE), slice(col, col + CHIP_SIZE))
+                index = self.index[dst]
+                chip = index[0, 0] // (CHIP_SIZE * CHIP_SIZE)
+                step_row = 1 if index[1, 0] > index[0, 0] else -1
+                step_col = 1 if index[0, 1] > index[0, 0] else -1
+                src = (chip, slice(None, None, step_row), slice(None, None, step_col))
+                assert np.array_equal(chips[src], index), f'Chip at {(row, col)} is not a view of the readout'
+                self.blocks.append((dst, src))
+
+        cross = (self.gain != 1).ravel()
+        self.cross = np.flatnonzero(cross)
+        self.cross_index = self.index.ravel()[cross]
+        self.cross_gain = self.gain.ravel()[cross]
+
+    @staticmethod
+    def build(factor: float) -> (np.ndarray, np.ndarray):
+        """Return the index and gain tables for `factor`."""
+        index = np.full(PixelMap.shape, -1, dtype=np.intp)
+        arrangeData(np.arange(PixelMap.size, dtype=np.intp), out=index)
+        gain = np.ones(PixelMap.shape)
+
+        # follow the steps of `correctCross`
+        index[255:258] = index[255]
+        gain[255:258] = gain[255] / factor
+        index[:, 255:258] = index[:, 255:256]
+        gain[:, 255:258] = gain[:, 255:256] / factor
+
+        index[258:261] = index[260]
+        gain[258:261] = gain[260] / factor
+        index[:, 258:261] = index[:, 260:261]
+        gain[:, 258:261] = gain[:, 260:261] / factor
+
+        assert (index >= 0).all(), 'Gap between the chips is not filled'
+
+        return index, gain
+
+    def __call__(self, raw: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        """Make the image from readout `raw`, in `out` if it is given (a
+        C-contiguous array of `shape` with the dtype of `raw`).
+
+        Returns the rotated view of `out`.
+        """
+        if out is None:
+            out = np.empty(self.shape, dtype=raw.dtype)
+        elif not out.flags.c_contiguous:
+            raise ValueError('`out` must be C-contiguous')
+
+        chips = raw.reshape(4, CHIP_SIZE, CHIP_SIZE)
+        for dst, src in self.blocks:
+            out[dst] = chips[src]
+
+        out.reshape(-1)[self.cross] = np.take(raw, self.cross_index) * self.cross_gain
+
+        return np.rot90(out, k=self.k)
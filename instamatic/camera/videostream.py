@@ -2,6 +2,8 @@ import atexit
 import threading
 
 from .camera import Camera
+from .framebuffer import FrameBuffer
+from instamatic import config
 
 
 class ImageGrabber:
@@ -53,6 +55,10 @@ class ImageGrabber:
                 frame = self.cam.getImage(exposure=self.frametime, binsize=self.binsize)
                 self.callback(frame)
 
+            else:
+                # blocked, wait for the next acquisition instead of spinning
+                self.acquireInitiateEvent.wait(timeout=0.1)
+
     def start_loop(self):
         self.thread = threading.Thread(target=self.run, args=(), daemon=True)
         self.thread.start()
@@ -63,7 +69,12 @@ class ImageGrabber:
 
 
 class VideoStream(threading.Thread):
-    """Handle the continuous stream of incoming data from the ImageGrabber."""
+    """Handle the continuous stream of incoming data from the ImageGrabber.
+
+    The frames are kept in a ring buffer (`self.buffer`, see
+    `FrameBuffer`), from which the live view and other consumers can read
+    the latest frames.
+    """
 
     def __init__(self, cam='simulate'):
         threading.Thread.__init__(self)
@@ -81,7 +92,7 @@ class VideoStream(threading.Thread):
         self.name = self.cam.name
 
         self.frametime = self.default_exposure
-        self.frame = None
+        self.buffer = FrameBuffer(size=config.settings.videostream_buffer_size)
 
         self.grabber = self.setup_grabber()
 
@@ -103,16 +114,18 @@ class VideoStream(threading.Thread):
     def start(self):
         self.grabber.start_loop()
 
+    @property
+    def frame(self):
+        """Copy of the most recent frame."""
+        return self.buffer.get()
+
     def send_frame(self, frame, acquire=False):
+        self.buffer.put(frame)
         if acquire:
             self.grabber.lock.acquire(True)
-            self.acquired_frame = self.frame = frame
+            self.acquired_frame = frame
             self.grabber.lock.release()
             self.grabber.acquireCompleteEvent.set()
-        else:
-            self.grabber.lock.acquire(True)
-            self.frame = frame
-            self.grabber.lock.release()
 
     def setup_grabber(self):
         grabber = ImageGrabber(self.cam, callback=self.send_frame, frametime=self.frametime)
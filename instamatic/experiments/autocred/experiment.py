@@ -10,7 +10,6 @@ from pathlib import Path
 
 import numpy as np
 from scipy import ndimage
-from skimage.registration import phase_cross_correlation
 from tqdm.auto import tqdm
 
 from instamatic import config
@@ -24,11 +23,14 @@ from instamatic.calibrate.calibrate_imageshift12 import Calibrate_Imageshift2
 from instamatic.calibrate.calibrate_imageshift12 import Calibrate_Stage
 from instamatic.calibrate.center_z import center_z_height_HYMethod
 from instamatic.calibrate.filenames import *
+from instamatic.experiments.autocred.tracking import TrackingWorker
 from instamatic.formats import write_tiff
+from instamatic.imreg import Registration
 from instamatic.neural_network import predict
 from instamatic.neural_network import preprocess
 from instamatic.processing.find_crystals import find_crystals_timepix
 from instamatic.processing.ImgConversionTPX import ImgConversionTPX as ImgConversion
+from instamatic.telemetry import ExperimentTelemetry
 from instamatic.tools import find_beam_center
 from instamatic.tools import find_defocused_image_center
 
@@ -563,13 +565,6 @@ class Experiment:
             if self.verbose:
                 print('Auto tracking feature activated. Please remember to bring sample to proper Z height in order for autotracking to be effective.')
 
-            transform_imgshift_ = np.linalg.inv(transform_imgshift)
-            transform_imgshift2_ = np.linalg.inv(transform_imgshift2)
-            transform_imgshift_foc_ = np.linalg.inv(transform_imgshift_foc)
-            transform_imgshift2_foc_ = np.linalg.inv(transform_imgshift2_foc)
-
-            transform_beamshift_d_ = np.linalg.inv(transform_beamshift_d)
-
             self.logger.debug(f'Transform_imgshift: {transform_imgshift}')
             self.logger.debug(f'Transform_imgshift_foc: {transform_imgshift_foc}')
             self.logger.debug(f'Transform_imgshift2: {transform_imgshift2}')
@@ -614,8 +609,28 @@ class Experiment:
             img0var = self.img_var(img0_cropped, crystal_pos)
             appos0 = crystal_pos
 
+            # the spectrum of the reference is reused for every tracking image
+            registration = Registration(img0_cropped)
+
             self.logger.debug(f'Tracking method: {trackmethod}. Initial crystal_pos: {crystal_pos} by find_defocused_image_center.')
 
+            # the corrections are computed in the background and applied at the next frame
+            tracker = TrackingWorker(self,
+                                     transform_imgshift, transform_imgshift2,
+                                     transform_imgshift_foc, transform_imgshift2_foc,
+                                     transform_beamshift_d, transform_beamshift_d_defoc,
+                                     calib_beamshift=self.calib_beamshift,
+                                     reference_pos=appos0,
+                                     reference_var=img0var,
+                                     window_size=window_size,
+                                     registration=registration,
+                                     trackmethod=trackmethod,
+                                     imgvar_threshold=self.imgvar_threshold)
+            tracker.start()
+            imgvar = img0var
+        else:
+            tracker = None
+
         if self.unblank_beam:
             self.ctrl.beam.unblank()
 
@@ -650,6 +665,10 @@ class Experiment:
         """set acquisition time to be around 0.52 s in order to fix the image interval times."""
         acquisition_time = self.expt + 0.02
 
+        # frames that were not collected because an acquisition took too long
+        self.skipped_frames = {'diffraction': 0, 'tracking': 0}
+        telemetry = ExperimentTelemetry(Path(path) / 'metrics.jsonl', experiment='autocred')
+
         self.ctrl.cam.block()
         """To ensure lock got released in the block step."""
         time.sleep(0.1)
@@ -661,6 +680,45 @@ class Experiment:
 
         while not self.stopEvent.is_set():
             try:
+                """Apply the corrections from the last tracking image at the frame boundary"""
+                result = tracker.poll() if tracker is not None else None
+
+                if result is not None:
+                    self.logger.debug(f'Tracking result for frame {result.i} ({result.duration:.3f} s)')
+
+                    if result.stop:
+                        self.print_and_del(result.stop)
+                        self.stopEvent.set()
+
+                    if result.delta_beamshift is not None:
+                        imgvar = result.imgvar
+                        delta_beamshiftcoord = result.delta_beamshift
+                        delta_imageshiftcoord = result.delta_imageshift
+                        delta_imageshift2coord = result.delta_imageshift2
+
+                        bs_x0, bs_y0 = self.setandupdate_bs(bs_x0, bs_y0, delta_beamshiftcoord)
+
+                        if self.check_lens_close_to_limit_warning(lensname='beamshift', lensvalue=bs_x0) or self.check_lens_close_to_limit_warning(lensname='beamshift', lensvalue=bs_y0):
+                            self.logger.debug(f'Beamshift close to limit warning: bs_x0 = {bs_x0}, bs_y0 = {bs_y0}')
+                            self.stopEvent.set()
+
+                        self.ctrl.imageshift1.set(x=is_x0 - int(delta_imageshiftcoord[0]), y=is_y0 - int(delta_imageshiftcoord[1]))
+                        self.ctrl.imageshift2.set(x=is2_x0 - int(delta_imageshift2coord[0]), y=is2_y0 - int(delta_imageshift2coord[1]))
+
+                        is_x0 = is_x0 - int(delta_imageshiftcoord[0])
+                        is_y0 = is_y0 - int(delta_imageshiftcoord[1])
+                        is2_x0 = is2_x0 - int(delta_imageshift2coord[0])
+                        is2_y0 = is2_y0 - int(delta_imageshift2coord[1])
+
+                        if self.check_lens_close_to_limit_warning(lensname='imageshift1', lensvalue=is_x0) or self.check_lens_close_to_limit_warning(lensname='imageshift1', lensvalue=is_y0) or self.check_lens_close_to_limit_warning(lensname='imageshift2', lensvalue=is2_x0) or self.check_lens_close_to_limit_warning(lensname='imageshift2', lensvalue=is2_y0):
+                            self.logger.debug(f'Imageshift close to limit warning: is_x0 = {is_x0}, is_y0 = {is_y0}, is2_x0 = {is2_x0}, is2_y0 = {is2_y0}')
+                            self.stopEvent.set()
+
+                        self.logger.debug(f'Image Interval: {self.image_interval}, Imgvar/Img0var:{imgvar / img0var}')
+
+                    if self.stopEvent.is_set():
+                        continue
+
                 if i < self.nom_ii:
                     self.image_interval = self.robust_ii
                     numb_robustTrack += 1
@@ -679,10 +737,13 @@ class Experiment:
                 if numb_robustTrack > 10:
                     self.image_interval = self.nom_ii
                     img0var = imgvar
+                    if tracker is not None:
+                        tracker.reference_var = img0var
                     imgscale0 = imgscale
                     numb_robustTrack = 0
 
-                if i % self.image_interval == 0:  # aim to make this more dynamically adapted...
+                """The next tracking image is only taken when the corrections for the previous one have been applied"""
+                if tracker is not None and i % self.image_interval == 0 and not tracker.busy:  # aim to make this more dynamically adapted...
                     t_start = time.perf_counter()
 
                     """Guessing the next particle position by simply apply the same beamshift change as previous"""
@@ -694,91 +755,15 @@ class Experiment:
                     self.ctrl.difffocus.value = diff_focus_proper
 
                     image_buffer.append((i, img, h))
-
-                    crystal_pos, img_cropped, _ = self.image_cropper(img=img, window_size=window_size)
-
-                    self.logger.debug(f'crystal_pos: {crystal_pos} by find_defocused_image_center.')
-
-                    imgvar = self.img_var(img_cropped, crystal_pos)
-
-                    self.logger.debug(f'Image variance: {imgvar}')
-
-                    """If variance changed over 50%, then the crystal is outside the beam and stop data collection"""
-                    if imgvar / img0var < 0.2 or imgvar / img0var > 5:
-                        self.print_and_del('Collection stopping because crystal out of the beam...')
-                        self.stopEvent.set()
-                    if imgvar < self.imgvar_threshold:
-                        self.print_and_del('Image variance smaller than blank image.')
-                        self.stopEvent.set()
-
-                    if trackmethod == 'c':
-
-                        cc, err, diffphase = phase_cross_correlation(img0_cropped, img_cropped)
-                        self.logger.debug(f'Cross correlation result: {cc}')
-
-                        if self.guess_crystmove and i >= self.nom_ii:
-                            delta_beamshiftcoord1 = np.matmul(self.calib_beamshift.transform, cc)
-                            # print("Beam shift coordinates: {}".format(delta_beamshiftcoord))
-                            self.logger.debug(f'Beam shift coordinates: {delta_beamshiftcoord1}')
-                            bs_x0, bs_y0 = self.setandupdate_bs(bs_x0, bs_y0, delta_beamshiftcoord1)
-
-                            delta_beamshiftcoord = delta_beamshiftcoord1 + delta_beamshiftcoord
-
-                        else:
-                            delta_beamshiftcoord = np.matmul(self.calib_beamshift.transform, cc)
-                            # print("Beam shift coordinates: {}".format(delta_beamshiftcoord))
-                            self.logger.debug(f'Beam shift coordinates: {delta_beamshiftcoord}')
-                            bs_x0, bs_y0 = self.setandupdate_bs(bs_x0, bs_y0, delta_beamshiftcoord)
-
-                    elif trackmethod == 'p':
-
-                        shift = self.tracking_by_particlerecog(img)
-                        delta_beamshiftcoord = np.matmul(shift, transform_beamshift_d_defoc)
-                        self.logger.debug(f'Beam shift coordinates: {delta_beamshiftcoord}')
-
-                        bs_x0, bs_y0 = self.setandupdate_bs(bs_x0, bs_y0, delta_beamshiftcoord)
-
-                        if shift[0] == 512:
-                            self.stopEvent.set()
-                            continue
-
-                    if self.check_lens_close_to_limit_warning(lensname='beamshift', lensvalue=bs_x0) or self.check_lens_close_to_limit_warning(lensname='beamshift', lensvalue=bs_y0):
-                        self.logger.debug(f'Beamshift close to limit warning: bs_x0 = {bs_x0}, bs_y0 = {bs_y0}')
-                        self.stopEvent.set()
-
-                    crystal_pos, r = find_defocused_image_center(img)
-                    crystal_pos = crystal_pos[::-1]
-                    crystal_pos_dif = crystal_pos - appos0
-                    apmv = -crystal_pos_dif
-                    dpmv = delta_beamshiftcoord @ transform_beamshift_d_
-                    R = -transform_imgshift2_foc_ @ transform_imgshift_foc @ transform_imgshift_ + transform_imgshift2_
-                    mv = apmv - dpmv @ transform_imgshift_foc @ transform_imgshift_
-                    delta_imageshift2coord = np.matmul(mv, np.linalg.inv(R))
-                    delta_imageshiftcoord = dpmv @ transform_imgshift_foc - delta_imageshift2coord @ transform_imgshift2_foc_ @ transform_imgshift_foc
-
-                    diff_shift = delta_imageshiftcoord @ transform_imgshift_foc_ + delta_imageshift2coord @ transform_imgshift2_foc_
-                    img_shift = delta_imageshiftcoord @ transform_imgshift_ + delta_imageshift2coord @ transform_imgshift2_
-
-                    self.logger.debug(f'delta imageshiftcoord: {delta_imageshiftcoord}, delta imageshift2coord: {delta_imageshift2coord}')
-
-                    self.ctrl.imageshift1.set(x=is_x0 - int(delta_imageshiftcoord[0]), y=is_y0 - int(delta_imageshiftcoord[1]))
-                    self.ctrl.imageshift2.set(x=is2_x0 - int(delta_imageshift2coord[0]), y=is2_y0 - int(delta_imageshift2coord[1]))
-
-                    is_x0 = is_x0 - int(delta_imageshiftcoord[0])
-                    is_y0 = is_y0 - int(delta_imageshiftcoord[1])
-                    is2_x0 = is2_x0 - int(delta_imageshift2coord[0])
-                    is2_y0 = is2_y0 - int(delta_imageshift2coord[1])
-
-                    if self.check_lens_close_to_limit_warning(lensname='imageshift1', lensvalue=is_x0) or self.check_lens_close_to_limit_warning(lensname='imageshift1', lensvalue=is_y0) or self.check_lens_close_to_limit_warning(lensname='imageshift2', lensvalue=is2_x0) or self.check_lens_close_to_limit_warning(lensname='imageshift2', lensvalue=is2_y0):
-                        self.logger.debug(f'Imageshift close to limit warning: is_x0 = {is_x0}, is_y0 = {is_y0}, is2_x0 = {is2_x0}, is2_y0 = {is2_y0}')
-                        self.stopEvent.set()
-
-                    self.logger.debug(f'Image Interval: {self.image_interval}, Imgvar/Img0var:{imgvar / img0var}')
+                    tracker.submit(i, img)
+                    telemetry.frame(i, kind='image')
 
                     next_interval = t_start + acquisition_time
 
                     while time.perf_counter() > next_interval:
                         self.logger.debug('Skipping one image.')
+                        self.skipped_frames['tracking'] += 1
+                        telemetry.skipped(i, reason='tracking')
                         next_interval += acquisition_time
                         i += 1
 
@@ -795,12 +780,15 @@ class Experiment:
                         self.logger.debug(f'Image scale variation: {imgscale / imgscale0}')
 
                     buffer.append((i, img, h))
+                    telemetry.frame(i)
 
                     next_interval = t_start + acquisition_time
 
                     while time.perf_counter() > next_interval:
                         next_interval += acquisition_time
                         self.logger.debug('One image skipped because of too long acquisition or calculation time.')
+                        self.skipped_frames['diffraction'] += 1
+                        telemetry.skipped(i, reason='diffraction')
                         i += 1
 
                     diff = next_interval - time.perf_counter()
@@ -816,6 +804,14 @@ class Experiment:
                 self.print_and_del(e)
                 self.stopEvent.set()
 
+        if tracker is not None:
+            tracker.stop()
+            if tracker.durations:
+                self.logger.info(f'Tracking: {len(tracker.durations)} images, {np.mean(tracker.durations):.3f} s per image (max: {np.max(tracker.durations):.3f} s)')
+
+        self.logger.info('Skipped frames: {diffraction} after diffraction images, {tracking} after tracking images'.format(**self.skipped_frames))
+        telemetry.close()
+
         t1 = time.perf_counter()
 
         self.ctrl.cam.unblock()
@@ -881,6 +877,7 @@ class Experiment:
             print(f'Rotation axis: {rotation_angle} radians', file=f)
             print(f'Oscillation angle: {osangle} degrees', file=f)
             print(f'Number of frames: {len(buffer)}', file=f)
+            print(f'Number of skipped frames: {sum(self.skipped_frames.values())}', file=f)
             print(f'Particle found at stage position: x: {stageposx}, y: {stageposy}, z: {stageposz}', file=f)
 
         with open(log_rotaterange, 'a') as f:
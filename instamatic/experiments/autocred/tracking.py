@@ -0,0 +1,206 @@
+import queue
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from instamatic.telemetry import metrics
+
+
+TrackingResult = namedtuple('TrackingResult', 'i imgvar delta_beamshift delta_imageshift delta_imageshift2 stop duration')
+TrackingResult.__doc__ = """Corrections for the defocused image with frame number `i`.
+
+imgvar: Variance of the cropped image
+delta_beamshift, delta_imageshift, delta_imageshift2: Corrections to apply
+stop: Message if the data collection should be stopped, else None
+duration: Time it took to compute the corrections (s)
+"""
+
+
+class TrackingWorker:
+    """Compute the beam shift/image shift corrections for autocRED from the
+    defocused images in a background thread, so that the acquisition loop
+    does not have to wait for them.
+
+    The acquisition loop passes a defocused image with `submit`, and picks
+    up the corrections with `poll` at the next frame boundary. Only one
+    image is tracked at a time (`busy`): the corrections are relative to
+    the lens settings when the image was taken, so the next image is only
+    taken after the corrections for the previous one have been applied.
+
+    The inverse transforms and the composite matrices that map the beam
+    shift onto the image shifts are computed once, when the worker is
+    created.
+
+    experiment:
+        The autocRED `Experiment`, used for `image_cropper`, `img_var` and
+        `tracking_by_particlerecog`
+    transform_*:
+        Calibrated transforms, see `Experiment.auto_cred_collection`
+    calib_beamshift:
+        Beam shift calibration, used for cross correlation tracking
+    reference_pos:
+        Position of the crystal in the reference image
+    reference_var:
+        Variance of the reference image, can be updated during the data
+        collection
+    window_size:
+        Size of the window to crop the images
+    registration:
+        `Registration` with the cropped reference image, for cross
+        correlation tracking
+    trackmethod:
+        `p` for particle recognition, `c` for cross correlation
+    imgvar_threshold:
+        Stop if the image variance is below this value (blank image)
+    """
+
+    def __init__(self, experiment,
+                 transform_imgshift,
+                 transform_imgshift2,
+                 transform_imgshift_foc,
+                 transform_imgshift2_foc,
+                 transform_beamshift_d,
+                 transform_beamshift_d_defoc,
+                 calib_beamshift,
+                 reference_pos,
+                 reference_var: float,
+                 window_size: int,
+                 registration=None,
+                 trackmethod: str = 'p',
+                 imgvar_threshold: float = 0,
+                 ):
+        super().__init__()
+        self.experiment = experiment
+        self.calib_beamshift = calib_beamshift
+        self.reference_pos = np.array(reference_pos)
+        self.reference_var = reference_var
+        self.window_size = window_size
+        self.registration = registration
+        self.trackmethod = trackmethod
+        self.imgvar_threshold = imgvar_threshold
+
+        transform_imgshift_ = np.linalg.inv(transform_imgshift)
+        transform_imgshift2_ = np.linalg.inv(transform_imgshift2)
+        transform_imgshift2_foc_ = np.linalg.inv(transform_imgshift2_foc)
+
+        self.transform_beamshift_d_defoc = transform_beamshift_d_defoc
+        self.transform_beamshift_d_ = np.linalg.inv(transform_beamshift_d)
+        self.transform_imgshift_foc = transform_imgshift_foc
+
+        # diffraction pattern shift -> aperture shift with image shift 1
+        self.dp_to_ap = transform_imgshift_foc @ transform_imgshift_
+        # image shift 2 -> diffraction pattern shift, compensated by image shift 1
+        self.is2_to_is1 = transform_imgshift2_foc_ @ transform_imgshift_foc
+        R = -transform_imgshift2_foc_ @ transform_imgshift_foc @ transform_imgshift_ + transform_imgshift2_
+        self.R_ = np.linalg.inv(R)
+
+        self.durations = []
+
+        self._in = queue.Queue(maxsize=1)
+        self._out = queue.Queue()
+        self._busy = False
+        self._thread = None
+
+    def start(self) -> None:
+        """Start the worker thread."""
+        self._thread = threading.Thread(target=self._run, name='autocred-tracking', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the worker thread, pending images are finished first."""
+        if self._thread is not None:
+            self._in.put(None)
+            self._thread.join()
+            self._thread = None
+
+    @property
+    def busy(self) -> bool:
+        """True if an image was submitted and its corrections have not been
+        picked up with `poll` yet."""
+        return self._busy
+
+    def submit(self, i: int, img) -> bool:
+        """Pass defocused image `img` with frame number `i` to the worker.
+
+        Returns False if the worker is busy, in which case the image is
+        not tracked.
+        """
+        if self._busy:
+            return False
+        self._busy = True
+        self._in.put((i, img))
+        return True
+
+    def poll(self, timeout: float = None):
+        """Return the `TrackingResult` of the submitted image if it is
+        ready, else None. Waits at most `timeout` seconds (default: do
+        not wait)."""
+        try:
+            result = self._out.get(block=timeout is not None, timeout=timeout)
+        except queue.Empty:
+            return None
+
+        self._busy = False
+        self.durations.append(result.duration)
+        return result
+
+    def _run(self) -> None:
+        while True:
+            item = self._in.get()
+            if item is None:
+                break
+
+            i, img = item
+            t0 = time.perf_counter()
+            try:
+                result = self.track(i, img)
+            except Exception as e:
+                result = TrackingResult(i, None, None, None, None, f'Tracking failed: {e}', 0)
+            duration = time.perf_counter() - t0
+            metrics.observe('autocred_tracking_seconds', duration)
+            self._out.put(result._replace(duration=duration))
+
+    def track(self, i: int, img) -> TrackingResult:
+        """Compute the corrections for defocused image `img` with frame
+        number `i`."""
+        exp = self.experiment
+        stop = None
+
+        crystal_pos, img_cropped, _ = exp.image_cropper(img=img, window_size=self.window_size)
+        exp.logger.debug(f'crystal_pos: {crystal_pos} by find_defocused_image_center.')
+
+        imgvar = exp.img_var(img_cropped, crystal_pos)
+        exp.logger.debug(f'Image variance: {imgvar}')
+
+        # If variance changed over 50%, then the crystal is outside the beam and stop data collection
+        ratio = imgvar / self.reference_var
+        if ratio < 0.2 or ratio > 5:
+            stop = 'Collection stopping because crystal out of the beam...'
+        if imgvar < self.imgvar_threshold:
+            stop = 'Image variance smaller than blank image.'
+
+        if self.trackmethod == 'c':
+            cc, err, diffphase = self.registration.phase_cross_correlation(img_cropped)
+            exp.logger.debug(f'Cross correlation result: {cc}')
+            delta_beamshift = np.matmul(self.calib_beamshift.transform, cc)
+        else:
+            shift = exp.tracking_by_particlerecog(img)
+            delta_beamshift = np.matmul(shift, self.transform_beamshift_d_defoc)
+            if shift[0] == 512:
+                stop = 'Crystal lost.'
+                return TrackingResult(i, imgvar, delta_beamshift, np.zeros(2), np.zeros(2), stop, None)
+
+        exp.logger.debug(f'Beam shift coordinates: {delta_beamshift}')
+
+        # `image_cropper` gives the same position as `find_defocused_image_center`
+        apmv = -(crystal_pos - self.reference_pos)
+        dpmv = delta_beamshift @ self.transform_beamshift_d_
+        mv = apmv - dpmv @ self.dp_to_ap
+        delta_imageshift2 = mv @ self.R_
+        delta_imageshift = dpmv @ self.transform_imgshift_foc - delta_imageshift2 @ self.is2_to_is1
+
+        exp.logger.debug(f'delta imageshiftcoord: {delta_imageshift}, delta imageshift2coord: {delta_imageshift2}')
+
+        return TrackingResult(i, imgvar, delta_beamshift, delta_imageshift, delta_imageshift2, stop, None)
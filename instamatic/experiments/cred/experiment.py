@@ -9,7 +9,10 @@ import numpy as np
 import instamatic
 from instamatic import config
 from instamatic.formats import write_tiff
+from instamatic.image_utils import rotate_image
 from instamatic.processing.ImgConversionTPX import ImgConversionTPX as ImgConversion
+from instamatic.processing.stream_writer import StreamWriter
+from instamatic.telemetry import ExperimentTelemetry
 
 # degrees to rotate before activating data collection procedure
 ACTIVATION_THRESHOLD = 0.2
@@ -51,6 +54,10 @@ class Experiment:
         Specify which data types/input files should be written
     stop_event:
         Instance of `threading.Event()` that signals the experiment to be terminated.
+    use_stream:
+        Collect the diffraction frames from a continuously running camera
+        (`cam.getFrameStream`, Serval only) instead of calling `get_image` for
+        every frame. Not used with the image interval or the cam server.
     """
 
     def __init__(self, ctrl,
@@ -70,6 +77,7 @@ class Experiment:
                  write_dials: bool = True,
                  write_red: bool = True,
                  stop_event=None,
+                 use_stream: bool = False,
                  ):
         super().__init__()
         self.ctrl = ctrl
@@ -103,6 +111,15 @@ class Experiment:
 
         self.relax_beam_before_experiment = self.image_interval_enabled and config.settings.cred_relax_beam_before_experiment
 
+        self.use_stream = use_stream
+        if use_stream:
+            if not hasattr(ctrl.cam, 'getFrameStream') or config.settings.use_cam_server:
+                print_and_log('Frame stream is not available for this camera, frames are collected one by one.', logger=self.logger)
+                self.use_stream = False
+            elif self.image_interval_enabled:
+                print_and_log('Frame stream cannot be used with the image interval, frames are collected one by one.', logger=self.logger)
+                self.use_stream = False
+
         self.track_stage_position = config.settings.cred_track_stage_positions
         self.stage_positions = []
 
@@ -238,14 +255,62 @@ class Experiment:
 
         print('Done.')
 
+    def collect_stream(self, buffer, telemetry) -> int:
+        """Collect the diffraction frames from the frame stream of the camera
+        until the experiment is stopped, and pass them to `buffer`. Frames
+        that were dropped by the stream are skipped.
+
+        Returns the number of the next frame, like the loop in
+        `start_collection`.
+        """
+        mode = self.ctrl.mode.get()
+        mag = self.ctrl.magnification.value
+        binsize = self.ctrl.cam.default_binsize
+
+        i = 1
+
+        with self.ctrl.cam.getFrameStream(exposure=self.exposure, binsize=binsize) as stream:
+            while not self.stopEvent.is_set():
+                frame = stream.get(timeout=0.1)
+                if frame is None:
+                    continue
+
+                if frame.index > i:
+                    telemetry.skipped(i, frame.index - i, reason='stream')
+                    i = frame.index
+
+                img = rotate_image(frame.image, mode=mode, mag=mag)
+                h = {
+                    'ImageGetTime': frame.time,
+                    'ImageExposureTime': self.exposure,
+                    'ImageBinsize': binsize,
+                    'ImageResolution': img.shape,
+                    'ImageComment': '',
+                    'ImageCameraName': self.ctrl.cam.name,
+                }
+                buffer.put(i, img, h)
+                telemetry.frame(i, t=frame.t, queue=buffer.qsize())
+
+                i += 1
+
+        if stream.ndropped:
+            print_and_log(f'Warning: {stream.ndropped} of {stream.nreceived} frames were dropped by the frame stream.', logger=self.logger)
+
+        return i
+
     def start_collection(self) -> bool:
         """Main experimental function, returns True if experiment runs
         normally, False if it is interrupted for whatever reason."""
         self.setup_paths()
         self.log_start_status()
 
-        buffer = []
+        # frames are corrected and written while the data are being collected
+        buffer = StreamWriter(tiff_path=self.tiff_path,
+                              smv_path=self.smv_path,
+                              mrc_path=self.mrc_path,
+                              flatfield=self.flatfield)
         image_buffer = []
+        telemetry = ExperimentTelemetry(self.path / 'metrics.jsonl', experiment='cred')
 
         if self.ctrl.mode != 'diff':
             self.ctrl.mode.set('diff')
@@ -264,38 +329,47 @@ class Experiment:
 
         t0 = time.perf_counter()
 
-        while not self.stopEvent.is_set():
-            if i % self.image_interval == 0:
-                t_start = time.perf_counter()
-                acquisition_time = (t_start - t0) / (i - 1)
+        if self.use_stream:
+            i = self.collect_stream(buffer, telemetry)
+        else:
+            while not self.stopEvent.is_set():
+                if i % self.image_interval == 0:
+                    t_start = time.perf_counter()
+                    acquisition_time = (t_start - t0) / (i - 1)
 
-                self.ctrl.difffocus.set(self.diff_focus_defocused, confirm_mode=False)
-                img, h = self.ctrl.get_image(exposure_image, header_keys=None)
-                self.ctrl.difffocus.set(self.diff_focus_proper, confirm_mode=False)
+                    self.ctrl.difffocus.set(self.diff_focus_defocused, confirm_mode=False)
+                    img, h = self.ctrl.get_image(exposure_image, header_keys=None)
+                    self.ctrl.difffocus.set(self.diff_focus_proper, confirm_mode=False)
 
-                image_buffer.append((i, img, h))
+                    image_buffer.append((i, img, h))
+                    telemetry.frame(i, kind='image')
 
-                next_interval = t_start + acquisition_time
-                # print(f"{i} BLOOP! {next_interval-t_start:.3f} {acquisition_time:.3f} {t_start-t0:.3f}")
+                    next_interval = t_start + acquisition_time
+                    # print(f"{i} BLOOP! {next_interval-t_start:.3f} {acquisition_time:.3f} {t_start-t0:.3f}")
 
-                while time.perf_counter() > next_interval:
-                    next_interval += acquisition_time
-                    i += 1
-                    # print(f"{i} "SKIP!  {next_interval-t_start:.3f} {acquisition_time:.3f}")
+                    skipped = 0
+                    while time.perf_counter() > next_interval:
+                        next_interval += acquisition_time
+                        i += 1
+                        skipped += 1
+                        # print(f"{i} "SKIP!  {next_interval-t_start:.3f} {acquisition_time:.3f}")
+                    if skipped:
+                        telemetry.skipped(i, skipped, reason='image')
 
-                diff = next_interval - time.perf_counter()  # seconds
+                    diff = next_interval - time.perf_counter()  # seconds
 
-                if self.track_stage_position and diff > 0.1:
-                    self.stage_positions.append((i, self.ctrl.stage.get()))
+                    if self.track_stage_position and diff > 0.1:
+                        self.stage_positions.append((i, self.ctrl.stage.get()))
 
-                time.sleep(diff)
+                    time.sleep(diff)
 
-            else:
-                img, h = self.ctrl.get_image(self.exposure, header_keys=None)
-                # print(f"{i} Image!")
-                buffer.append((i, img, h))
+                else:
+                    img, h = self.ctrl.get_image(self.exposure, header_keys=None)
+                    # print(f"{i} Image!")
+                    buffer.put(i, img, h)
+                    telemetry.frame(i, queue=buffer.qsize())
 
-            i += 1
+                i += 1
 
         t1 = time.perf_counter()
 
@@ -306,6 +380,10 @@ class Experiment:
 
         self.ctrl.cam.unblock()
 
+        print('Waiting for data writer...')
+        buffer.close()
+        telemetry.close()
+
         if self.mode == 'simulate':
             # simulate somewhat realistic end numbers
             self.ctrl.stage.x += np.random.randint(-5000, 5000)
@@ -352,7 +430,7 @@ class Experiment:
         self.log_end_status()
 
         if self.nframes <= 3:
-            print_and_log(f'Not enough frames collected. Data will not be written (nframes={self.nframes})', logger=self.logger)
+            print_and_log(f'Not enough frames collected. Input files will not be written (nframes={self.nframes})', logger=self.logger)
             return False
 
         self.write_data(buffer)
@@ -373,13 +451,13 @@ class Experiment:
 
         return True
 
-    def write_data(self, buffer: list):
-        """Write diffraction data in the buffer.
-
-        The image buffer is passed as a list of tuples, where each tuple contains the
-        index (int), image data (2D numpy array), metadata/header (dict).
+    def write_data(self, buffer: StreamWriter):
+        """Write the input files for the diffraction data.
 
-        The buffer index must start at 1.
+        The frames have already been written to disk by the
+        `StreamWriter` during data collection, only the SMV headers
+        need to be updated with the final oscillation angle and beam
+        center.
         """
 
         img_conv = ImgConversion(buffer=buffer,
@@ -388,7 +466,7 @@ class Experiment:
                                  end_angle=self.end_angle,
                                  rotation_axis=self.rotation_axis,
                                  acquisition_time=self.acquisition_time,
-                                 flatfield=self.flatfield,
+                                 flatfield=None,
                                  pixelsize=self.pixelsize,
                                  physical_pixelsize=self.physical_pixelsize,
                                  wavelength=self.wavelength,
@@ -396,11 +474,9 @@ class Experiment:
                                  stretch_azimuth=self.stretch_azimuth,
                                  )
 
-        print('Writing data files...')
-        img_conv.threadpoolwriter(tiff_path=self.tiff_path,
-                                  mrc_path=self.mrc_path,
-                                  smv_path=self.smv_path,
-                                  workers=8)
+        if self.smv_path:
+            print('Updating SMV headers...')
+            img_conv.write_smv_headers(self.smv_path)
 
         print('Writing input files...')
         if self.write_dials:
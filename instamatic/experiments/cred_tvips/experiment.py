@@ -10,7 +10,9 @@ from scipy.interpolate import interp1d
 
 import instamatic
 from instamatic import config
+from instamatic.experiments.cred_tvips.harvester import FrameHarvester
 from instamatic.formats import write_tiff
+from instamatic.telemetry import ExperimentTelemetry
 from instamatic.tools import get_acquisition_time
 
 
@@ -156,6 +158,11 @@ class Experiment:
     exposure: float
         Exposure time in ms
     mode: str
+    harvest: bool
+        Write the frames to disk during the rotation (see `FrameHarvester`),
+        instead of after the rotation has stopped
+    clear_buffer: bool
+        Delete the frames from EMMENU once they are written
     """
 
     def __init__(self, ctrl,
@@ -164,7 +171,9 @@ class Experiment:
                  track: str = None,
                  exposure: float = 400,
                  mode: str = 'diff',
-                 rotation_speed: int = None):
+                 rotation_speed: int = None,
+                 harvest: bool = True,
+                 clear_buffer: bool = False):
         super().__init__()
 
         self.ctrl = ctrl
@@ -178,6 +187,8 @@ class Experiment:
         self.mode = mode
 
         self.rotation_speed = rotation_speed
+        self.harvest = harvest
+        self.clear_buffer = clear_buffer
 
         if track:
             self.load_tracking_file(track)
@@ -335,7 +346,17 @@ class Experiment:
         else:
             self.ctrl.stage.set(a=target_angle, wait=False)
 
+        path_data = self.path / 'tiff'
+        path_data.mkdir(exist_ok=True, parents=True)
+
         self.emmenu.start_record()  # start recording
+        telemetry = ExperimentTelemetry(self.path / 'metrics.jsonl', experiment='tvips')
+
+        if self.harvest:
+            harvester = FrameHarvester(self.emmenu, start_index=start_index, path=path_data, clear_buffer=self.clear_buffer)
+            harvester.start()
+        else:
+            harvester = None
 
         t0 = time.perf_counter()
         t_delta = t0
@@ -381,9 +402,17 @@ class Experiment:
                     break
                 if key == 'q':
                     self.ctrl.stage.stop()
+                    if harvester:
+                        harvester.stop()
                     raise InterruptedError('Data collection was interrupted!')
 
         t1 = time.perf_counter()
+
+        # join the harvester thread first, so that it does not talk to the
+        # camera (or cam server) at the same time as the main thread
+        if harvester:
+            harvester.stop()
+
         self.emmenu.stop_liveview()
 
         if self.ctrl.beam.is_blanked:
@@ -394,6 +423,10 @@ class Experiment:
 
         end_index = self.emmenu.get_image_index()
 
+        if harvester:
+            print('Writing remaining data files...')
+            harvester.harvest(end_index)
+
         self.t_start = t0
         self.t_end = t1
         self.total_time = t1 - t0
@@ -401,6 +434,7 @@ class Experiment:
         self.nframes = nframes = end_index - start_index + 1
         if nframes < 1:
             print('No frames measured??')
+            telemetry.close()
             return
 
         self.osc_angle = abs(end_angle - start_angle) / nframes
@@ -415,24 +449,32 @@ class Experiment:
         self.start_angle, self.end_angle = start_angle, end_angle
 
         try:
-            # sometimes breaks with:
-            # AttributeError: 'NoneType' object has no attribute 'EMVector'
-            timestamps = self.emmenu.get_timestamps(start_index, end_index)
+            if harvester:
+                timestamps = harvester.timestamps
+                if None in timestamps:
+                    raise AttributeError('Some timestamps could not be read')
+            else:
+                # sometimes breaks with:
+                # AttributeError: 'NoneType' object has no attribute 'EMVector'
+                timestamps = self.emmenu.get_timestamps(start_index, end_index)
         except AttributeError as e:
             print(e)
             print(f'Timestamps from {start_index} to {end_index}')
             timestamps = [1, 2, 3, 4, 5]  # just to make it work
+        else:
+            # frames are timed by EMMENU, relative to the start of the recording
+            for i, timestamp in enumerate(timestamps, start=start_index):
+                telemetry.frame(i, t=telemetry.t0 + timestamp - timestamps[0])
+        telemetry.close()
 
         self.timings = get_acquisition_time(timestamps, exp_time=self.exposure_time, savefig=True, drc=self.path)
 
         self.log_end_status()
         self.log_stage_positions()
 
-        print('Writing data files...')
-        path_data = self.path / 'tiff'
-        path_data.mkdir(exist_ok=True, parents=True)
-
-        self.emmenu.writeTiffs(start_index, end_index, path=path_data)
+        if not harvester:
+            print('Writing data files...')
+            self.emmenu.writeTiffs(start_index, end_index, path=path_data, clear_buffer=self.clear_buffer)
 
         if self.track:
             # Center crystal position
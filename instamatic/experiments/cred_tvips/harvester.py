@@ -0,0 +1,139 @@
+import logging
+import threading
+from pathlib import Path
+
+from instamatic.telemetry import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def _init_com():
+    """Join the multithreaded COM apartment that `CameraEMMENU` uses, so
+    that its interface can be called from this thread."""
+    try:
+        import comtypes
+    except ImportError:
+        return
+
+    try:
+        comtypes.CoInitializeEx(comtypes.COINIT_MULTITHREADED)
+    except OSError:
+        pass
+
+
+class FrameHarvester:
+    """Export the frames that EMMENU records during a rotation while the
+    rotation is still running.
+
+    A background thread polls `get_image_index` every `interval` seconds,
+    and writes the frames that were recorded since the last poll as TIFF
+    files to `path`, using the same names as `CameraEMMENU.writeTiffs`
+    (`0000.tiff` for `start_index`). Their time stamps are collected in
+    `timestamps`. With `clear_buffer=True`, the frames are deleted from
+    EMMENU once they are written, so that its memory does not fill up on
+    long rotations.
+
+    When the rotation has stopped, `stop` writes the remaining frames.
+    If the thread fails, the error is logged and all frames that were not
+    written yet are written by `stop` instead.
+
+    cam:
+        `CameraEMMENU` (or the simulated camera/cam server client)
+    start_index:
+        Image index of the first frame of the rotation
+    path:
+        Directory to write the TIFF files to
+    interval:
+        Time between polls (s)
+    clear_buffer:
+        Delete the frames from EMMENU after they are written
+
+    Usage:
+        cam.start_record()
+        harvester = FrameHarvester(cam, start_index=1, path=path)
+        harvester.start()
+        (rotate)
+        cam.stop_liveview()
+        harvester.stop(end_index=cam.get_image_index())
+    """
+
+    def __init__(self, cam, start_index: int, path: str, interval: float = 0.5, clear_buffer: bool = False):
+        super().__init__()
+        self.cam = cam
+        self.start_index = start_index
+        self.path = Path(path)
+        self.interval = interval
+        self.clear_buffer = clear_buffer
+
+        self.path.mkdir(exist_ok=True, parents=True)
+
+        self.next_index = start_index
+        self.timestamps = []
+
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def nframes(self) -> int:
+        """Number of frames written."""
+        return self.next_index - self.start_index
+
+    def start(self) -> None:
+        """Start polling EMMENU for new frames."""
+        self._thread = threading.Thread(target=self._run, name='emmenu-harvester', daemon=True)
+        self._thread.start()
+
+    def stop(self, end_index: int = None) -> None:
+        """Stop the thread and write the frames up to and including
+        `end_index`, if it is given."""
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+
+        if end_index is not None:
+            self.harvest(end_index)
+
+    def harvest(self, last_index: int) -> int:
+        """Write the frames from `next_index` up to and including
+        `last_index`, returns the number of frames written."""
+        first_index = self.next_index
+        if last_index < first_index:
+            return 0
+
+        with metrics.timer('emmenu_harvest_seconds'):
+            try:
+                timestamps = self.cam.get_timestamps(first_index, last_index)
+            except AttributeError as e:
+                # sometimes breaks with:
+                # AttributeError: 'NoneType' object has no attribute 'EMVector'
+                logger.warning(f'No timestamps for #{first_index}->#{last_index}: {e}')
+                timestamps = [None] * (last_index - first_index + 1)
+
+            for image_index, timestamp in zip(range(first_index, last_index + 1), timestamps):
+                fn = self.path / f'{image_index - self.start_index:04d}.tiff'
+                self.cam.writeTiff(image_index, str(fn))
+
+                if self.clear_buffer:
+                    self.cam.deleteImageByIndex(image_index)
+
+                self.timestamps.append(timestamp)
+                self.next_index = image_index + 1
+
+        n = last_index - first_index + 1
+        metrics.inc('emmenu_harvested_frames_total', n)
+        logger.debug(f'Harvested frames #{first_index}->#{last_index}')
+
+        return n
+
+    def _run(self) -> None:
+        _init_com()
+
+        while not self._stop_event.wait(self.interval):
+            try:
+                # the frame at the current index may still be written by EMMENU
+                self.harvest(self.cam.get_image_index() - 1)
+            except Exception as e:
+                logger.exception(e)
+                logger.warning(f'Frame harvesting stopped at #{self.next_index}, remaining frames are written after the rotation')
+                break
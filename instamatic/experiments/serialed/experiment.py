@@ -13,8 +13,9 @@ from instamatic.calibrate import CalibDirectBeam
 from instamatic.formats import *
 from instamatic.processing.find_crystals import find_crystals
 from instamatic.processing.find_crystals import find_crystals_timepix
-from instamatic.processing.flatfield import apply_flatfield_correction
-from instamatic.processing.flatfield import remove_deadpixels
+from instamatic.processing.flatfield import FlatfieldCorrector
+from instamatic.telemetry import ExperimentTelemetry
+from instamatic.telemetry import metrics
 
 
 def make_grid_on_stage(startpoint, endpoint, padding=2.0):
@@ -208,7 +209,7 @@ class Experiment:
             self.ctrl.mode.set('mag1')
             self.ctrl.store('image')
             self.ctrl.brightness.set(image_brightness)
-            self.ctrl.tem.setSpotSize(self.image_spotsize)
+            self.ctrl.spotsize = self.image_spotsize
 
             self.calib_beamshift = CalibBeamShift.live(self.ctrl, outdir=self.calibdir)
 
@@ -230,7 +231,7 @@ class Experiment:
         except OSError:
             self.ctrl.mode.set('diff')
             self.ctrl.store('diffraction')
-            self.ctrl.tem.setSpotSize(self.diff_spotsize)
+            self.ctrl.spotsize = self.diff_spotsize
 
             self.calib_directbeam = CalibDirectBeam.live(self.ctrl, outdir=self.calibdir)
 
@@ -242,6 +243,11 @@ class Experiment:
         self.change_spotsize = self.diff_spotsize != self.image_spotsize
         self.crystal_spread = kwargs.get('crystal_spread', 0.6)
 
+        # write all images to a single HDF5 file instead of one file per image,
+        # off by default because the browser/learn/movie scripts read the per-image files
+        self.use_container = kwargs.get('use_container', False)
+        self.compression = kwargs.get('compression', None)
+
         if self.ctrl.cam.name == 'timepix':
             self.find_crystals = find_crystals_timepix
             self.flatfield = kwargs.get('flatfield', 'flatfield.tiff')
@@ -252,6 +258,7 @@ class Experiment:
         if self.flatfield is not None:
             self.flatfield, h_flatfield = read_tiff(self.flatfield)
             self.deadpixels = h_flatfield['deadpixels']
+            self.corrector = FlatfieldCorrector(self.flatfield, deadpixels=self.deadpixels)
 
         # self.sample_rotation_angles = ( -10, -5, 5, 10 )
         # self.sample_rotation_angles = (-5, 5)
@@ -289,7 +296,7 @@ class Experiment:
         self.ctrl.mode.set('diff')
         self.ctrl.brightness.set(self.diff_brightness)
         self.ctrl.difffocus.set(self.diff_difffocus)
-        self.ctrl.tem.setSpotSize(self.diff_spotsize)
+        self.ctrl.spotsize = self.diff_spotsize
         input('\nPress <ENTER> to get neutral diffraction shift')
         self.neutral_diffshift = np.array(self.ctrl.diffshift.get())
         self.log.info('DiffShift(x=%d, y=%d)', *self.neutral_diffshift)
@@ -299,7 +306,7 @@ class Experiment:
         self.ctrl.brightness.max()
         self.calib_beamshift.center(self.ctrl)
         self.neutral_beamshift = self.ctrl.beamshift.get()
-        self.ctrl.tem.setSpotSize(self.image_spotsize)
+        self.ctrl.spotsize = self.image_spotsize
 
     def image_mode(self, delay=0.2):
         """Switch to image mode (mag1), reset beamshift/diffshift, spread
@@ -433,9 +440,8 @@ class Experiment:
 
     def apply_corrections(self, img, h):
         if self.flatfield is not None:
-            img = remove_deadpixels(img, deadpixels=self.deadpixels)
+            img = self.corrector(img)
             h['DeadPixelCorrection'] = True
-            img = apply_flatfield_correction(img, flatfield=self.flatfield)
             h['FlatfieldCorrection'] = True
         return img, h
 
@@ -468,19 +474,49 @@ class Experiment:
 
         input("\nPress <ENTER> to start experiment ('Ctrl-C' to interrupt)\n")
 
+        if self.use_container:
+            self.container = HDF5Container(self.expdir / 'serialed.h5', compression=self.compression)
+            self.log.info('Writing data to %s', self.container.fname)
+
+        telemetry = ExperimentTelemetry(self.expdir / 'metrics.jsonl', experiment='serialed')
+
+        try:
+            self.collect(header_keys, d_image, d_diff, telemetry=telemetry)
+        finally:
+            if self.use_container:
+                self.container.close()
+            telemetry.close()
+
+        print('\n\nData collection finished.')
+
+    def write(self, outfile, img, h, group, **index):
+        """Write the image to the HDF5 container under `group`, or to
+        `outfile` if the container is not used."""
+        with metrics.timer('write_seconds', format='hdf5'):
+            if self.use_container:
+                self.container.append(group, img, header=h, **index)
+            else:
+                write_hdf5(outfile, img, header=h)
+
+    def collect(self, header_keys, d_image, d_diff, telemetry=None):
+        """Loop over the stage positions and collect the images and
+        diffraction patterns. The timing of the frames is recorded with
+        `telemetry` (`ExperimentTelemetry`) if it is given."""
         for i, d_pos in enumerate(self.loop_positions()):
 
             outfile = self.imagedir / f'image_{i:04d}'
 
             if self.change_spotsize:
-                self.ctrl.tem.setSpotSize(self.image_spotsize)
+                self.ctrl.spotsize = self.image_spotsize
 
             img, h = self.ctrl.get_image(exposure=self.image_exposure, binsize=self.image_binsize, header_keys=header_keys)
+            if telemetry:
+                telemetry.frame(i, kind='image')
 
             if self.change_spotsize:
-                self.ctrl.tem.setSpotSize(self.image_spotsize)
+                self.ctrl.spotsize = self.image_spotsize
 
-            self.ctrl.tem.setSpotSize(self.diff_spotsize)
+            self.ctrl.spotsize = self.diff_spotsize
 
             im_mean = img.mean()
             if im_mean < self.image_threshold:
@@ -496,7 +532,7 @@ class Experiment:
                 h.update(d)
             h['exp_crystal_coords'] = crystal_coords
 
-            write_hdf5(outfile, img, header=h)
+            self.write(outfile, img, h, 'images', image=i)
 
             ncrystals = len(crystal_coords)
             if ncrystals == 0:
@@ -508,6 +544,8 @@ class Experiment:
                 outfile = self.datadir / f'image_{i:04d}_{k:04d}'
                 comment = f'Image {i} Crystal {k}'
                 img, h = self.ctrl.get_image(binsize=self.diff_binsize, exposure=self.diff_exposure, comment=comment, header_keys=header_keys)
+                if telemetry:
+                    telemetry.frame(i, crystal=k)
                 img, h = self.apply_corrections(img, h)
 
                 for d in (d_diff, d_pos, d_cryst):
@@ -522,7 +560,7 @@ class Experiment:
                 # quality = neural_network.predict(img_processed)
                 # h["crystal_quality"] = quality
 
-                write_hdf5(outfile, img, header=h)
+                self.write(outfile, img, h, 'data', image=i, crystal=k, rotation_angle=np.nan)
 
                 if self.sample_rotation_angles:
                     for rotation_angle in self.sample_rotation_angles:
@@ -531,19 +569,19 @@ class Experiment:
 
                         outfile = self.datadir / f'image_{i:04d}_{k:04d}_{rotation_angle}'
                         img, h = self.ctrl.get_image(exposure=self.diff_exposure, binsize=self.diff_binsize, comment=comment, header_keys=header_keys)
+                        if telemetry:
+                            telemetry.frame(i, crystal=k, rotation_angle=float(rotation_angle))
                         img, h = self.apply_corrections(img, h)
 
                         for d in (d_diff, d_pos, d_cryst):
                             h.update(d)
 
-                        write_hdf5(outfile, img, header=h)
+                        self.write(outfile, img, h, 'data', image=i, crystal=k, rotation_angle=float(rotation_angle))
 
                     self.ctrl.stage.a = 0
 
             self.image_mode()
 
-        print('\n\nData collection finished.')
-
 
 def main():
     import argparse
@@ -2,7 +2,6 @@ import os
 import warnings
 from pathlib import Path
 
-import h5py
 import numpy as np
 import tifffile
 import yaml
@@ -13,8 +12,11 @@ from .csvIO import read_csv
 from .csvIO import read_ycsv
 from .csvIO import write_csv
 from .csvIO import write_ycsv
+from .h5container import HDF5Container
+from .mrc import MRCStack
 from .mrc import read_image as read_mrc
 from .mrc import write_image as write_mrc
+from .xdscbf import read as read_cbf
 from .xdscbf import write as write_cbf
 
 
@@ -36,6 +38,10 @@ def read_image(fname: str) -> (np.array, dict):
     return img, h
 
 
+# the C emitter (if available) gives the same output, but is much faster
+_yaml_dumper = getattr(yaml, 'CDumper', yaml.Dumper)
+
+
 def write_tiff(fname: str, data, header: dict = None):
     """Simple function to write a tiff file.
 
@@ -48,7 +54,7 @@ def write_tiff(fname: str, data, header: dict = None):
         key/value pairs are stored as yaml in the TIFF ImageDescription tag
     """
     if isinstance(header, dict):
-        header = yaml.dump(header)
+        header = yaml.dump(header, Dumper=_yaml_dumper)
     if not header:
         header = ''
 
@@ -94,6 +100,8 @@ def write_hdf5(fname: str, data, header: dict = None):
         dictionary containing the metadata that should be saved
         key/value pairs are stored as attributes on the data
     """
+    import h5py
+
     fname = Path(fname).with_suffix('.h5')
 
     f = h5py.File(fname, 'w')
@@ -113,13 +121,10 @@ def read_hdf5(fname: str) -> (np.array, dict):
         image: np.ndarray, header: dict
             a tuple of the image as numpy array and dictionary with all the tem parameters and image attributes
     """
+    import h5py
+
     if not os.path.exists(fname):
         raise FileNotFoundError(f"No such file: '{fname}'")
 
     f = h5py.File(fname, 'r')
     return np.array(f['data']), dict(f['data'].attrs)
-
-
-def read_cbf(fname: str):
-    """CBF reader not implemented."""
-    raise NotImplementedError('CBF reader not implemented.')
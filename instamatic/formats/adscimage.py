@@ -19,16 +19,15 @@ def swap_needed(header: dict) -> bool:
         return True
 
 
-def write_adsc(fname: str, data: np.array, header: dict = {}):
-    """Write adsc format."""
+def make_adsc_header(data_shape: tuple, header: dict = {}) -> bytes:
+    """Encode the adsc header, padded to a multiple of 512 bytes."""
     if 'SIZE1' not in header and 'SIZE2' not in header:
-        dim2, dim1 = data.shape
+        dim2, dim1 = data_shape
         header['SIZE1'] = dim1
         header['SIZE2'] = dim2
 
-    out = b'{\n'
-    for key in header:
-        out += f'{key}={header[key]};\n'.encode()
+    out = ''.join([f'{key}={value};\n' for key, value in header.items()])
+    out = b'{\n' + out.encode()
     if 'HEADER_BYTES' in header:
         pad = int(header['HEADER_BYTES']) - len(out) - 2
     else:
@@ -39,17 +38,41 @@ def write_adsc(fname: str, data: np.array, header: dict = {}):
     out += b'}' + (pad + 1) * b'\x00'
     assert len(out) % 512 == 0, 'Header is not multiple of 512'
 
+    return out
+
+
+def write_adsc(fname: str, data: np.array, header: dict = {}):
+    """Write adsc format."""
+    out = make_adsc_header(data.shape, header)
+
     # NOTE: XDS can handle only "SMV" images of TYPE=unsigned_short.
     dtype = np.uint16
-    data = np.round(data, 0).astype(dtype, copy=False)  # copy=False ensures that no copy is made if dtype is already satisfied
+    if data.dtype != dtype:
+        data = np.round(data, 0).astype(dtype)
     if swap_needed(header):
-        data.byteswap(True)
+        data = data.byteswap()
 
     with open(fname, 'wb') as outf:
         outf.write(out)
         outf.write(data.tobytes())
 
 
+def update_adsc_header(fname: str, header: dict):
+    """Overwrite the header of an existing adsc file in place, the image data
+    are left untouched.
+
+    The new header must have the same size as the old one (i.e. use a
+    fixed `HEADER_BYTES`).
+    """
+    with open(fname, 'r+b') as f:
+        old = readheader(f)
+        out = make_adsc_header((int(old['SIZE2']), int(old['SIZE1'])), header)
+        if len(out) != int(old['HEADER_BYTES']):
+            raise ValueError(f'Header size does not match: {len(out)} != {old["HEADER_BYTES"]}')
+        f.seek(0)
+        f.write(out)
+
+
 def readheader(infile):
     """read an adsc header."""
     header = {}
@@ -1,7 +1,6 @@
 import io
 from collections import OrderedDict
 
-import pandas as pd
 import yaml
 
 
@@ -24,6 +23,8 @@ def write_csv(f, results):
 
 def read_csv(f):
     """Read a csv file into a pandas DataFrame."""
+    import pandas as pd
+
     if isinstance(f, (list, tuple)):
         return pd.concat(read_csv(csv) for csv in f)
     else:
@@ -44,6 +45,8 @@ def read_ycsv(f):
     if isinstance(f, str):
         f = open(f, 'r')
 
+    import pandas as pd
+
     first_line = f.tell()
 
     in_yaml_block = False
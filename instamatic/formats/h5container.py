@@ -0,0 +1,126 @@
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+
+class HDF5Container:
+    """Collect a series of images with their headers in a single HDF5 file.
+
+    Every series is stored in its own group (e.g. `images`, `data`) with
+    the following datasets, which are extended as images are appended:
+
+    - `data`: image data with shape `(n, ny, nx)`, chunked by frame and
+      optionally compressed
+    - `headers`: headers as yaml strings (same as in the TIFF files)
+    - `index`: table with the integer/float index fields given to `append`
+      (e.g. image/crystal number), used for random access with `find`
+
+    Usage:
+        with HDF5Container('serialed.h5') as f:
+            f.append('data', img, header=h, image=i, crystal=k)
+
+        with HDF5Container('serialed.h5', mode='r') as f:
+            img, h = f.read('data', f.find('data', image=i, crystal=k)[0])
+
+    fname: str
+        Path to the HDF5 file, opened in append mode by default
+    mode: str
+        Mode to open the file with, `a` (read/write/create) or `r`
+    compression: str
+        Compression filter for the image data: None, `lzf`, or `gzip`
+    """
+
+    def __init__(self, fname: str, mode: str = 'a', compression: str = None):
+        super().__init__()
+        import h5py
+
+        self.fname = Path(fname).with_suffix('.h5')
+        self.compression = compression
+        self.file = h5py.File(self.fname, mode)
+        self._string_dtype = h5py.special_dtype(vlen=str)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        self.close()
+
+    def __contains__(self, group: str) -> bool:
+        return group in self.file
+
+    def _create_group(self, group: str, img: np.ndarray, index: dict):
+        grp = self.file.create_group(group)
+        grp.create_dataset('data',
+                           shape=(0, *img.shape),
+                           maxshape=(None, *img.shape),
+                           dtype=img.dtype,
+                           chunks=(1, *img.shape),
+                           compression=self.compression)
+        grp.create_dataset('headers', shape=(0,), maxshape=(None,), dtype=self._string_dtype, chunks=(256,))
+
+        fields = [(key, np.int64 if isinstance(value, (int, np.integer)) else np.float64)
+                  for key, value in index.items()]
+        if fields:
+            grp.create_dataset('index', shape=(0,), maxshape=(None,), dtype=np.dtype(fields), chunks=(256,))
+
+        return grp
+
+    def append(self, group: str, img: np.ndarray, header: dict = None, **index) -> int:
+        """Append `img` and `header` to the series in `group`. The keyword
+        arguments are stored in the index table, and must be the same for
+        every call.
+
+        Returns the position of the image in the series.
+        """
+        if group in self.file:
+            grp = self.file[group]
+        else:
+            grp = self._create_group(group, img, index)
+
+        n = grp['data'].shape[0]
+
+        for name in ('data', 'headers', 'index'):
+            if name in grp:
+                grp[name].resize(n + 1, axis=0)
+
+        grp['data'][n] = img
+        grp['headers'][n] = yaml.dump(header or {})
+        if 'index' in grp:
+            dset = grp['index']
+            dset[n] = tuple(index[key] for key in dset.dtype.names)
+
+        return n
+
+    def count(self, group: str) -> int:
+        """Return the number of images in `group`."""
+        return self.file[group]['data'].shape[0] if group in self.file else 0
+
+    def read(self, group: str, i: int) -> (np.ndarray, dict):
+        """Return the image and header at position `i` in `group`."""
+        grp = self.file[group]
+        img = grp['data'][i]
+        h = grp['headers'][i]
+        if isinstance(h, bytes):
+            h = h.decode()
+        header = yaml.load(h, Loader=yaml.Loader)
+        return img, header
+
+    def index(self, group: str) -> np.ndarray:
+        """Return the index table of `group` as a structured array."""
+        return self.file[group]['index'][:]
+
+    def find(self, group: str, **index) -> list:
+        """Return the positions in `group` that match all given index
+        values, e.g. `find('data', image=3, crystal=1)`."""
+        table = self.index(group)
+        sel = np.ones(len(table), dtype=bool)
+        for key, value in index.items():
+            sel &= table[key] == value
+        return np.flatnonzero(sel).tolist()
+
+    def flush(self) -> None:
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
@@ -637,7 +637,7 @@ def write_image(filename, img, index=None, header=None, inplace=False):
     if header is None and hasattr(img, 'header'):
         header = img.header
     try:
-        img = img.astype(mrc2numpy[numpy2mrc[img.dtype.type]])
+        img = numpy.ascontiguousarray(img, dtype=mrc2numpy[numpy2mrc[img.dtype.type]])
     except BaseException:
         raise TypeError('Unsupported type for MRC writing: %s' % str(img.dtype))
 
@@ -703,6 +703,151 @@ def write_image(filename, img, index=None, header=None, inplace=False):
         util.close(filename, f)
 
 
+class MRCStack:
+    """Image stack in MRC format that is accessed through a memory map.
+
+    The header is parsed once, and the frames are only read from disk when
+    they are accessed, so that large stacks can be browsed with constant
+    memory. Frames are accessed by indexing or slicing the stack, which
+    returns views on the memory map (`stack.data`):
+
+        stack = MRCStack('stack.mrc')
+        img = stack[10]
+        sub = stack[::10]
+
+    To write a stack, open it with `mode='r+'` and use `append`. New frames
+    are written to the end of the file, and the header is updated in place.
+    Use `MRCStack.create` to start a new stack from the first frame.
+
+    filename : str
+        Name of the MRC file
+    mode : str
+        `r` for read-only access, `r+` to allow writing and appending
+    no_strict_mrc : bool
+        Perform strict MRC header checking (recommended)
+    """
+
+    def __init__(self, filename, mode='r', no_strict_mrc=False):
+        super().__init__()
+
+        if mode not in ('r', 'r+'):
+            raise ValueError(f'Invalid mode: `{mode}`, must be one of `r`, `r+`')
+
+        self.filename = filename
+        self.mode = mode
+
+        self._h = read_mrc_header(filename, no_strict_mrc=no_strict_mrc)
+        h = self._h
+
+        dtype = numpy.dtype(mrc2numpy[int(h['mode'][0])])
+        if header_image_dtype.newbyteorder()[0] == h.dtype[0]:
+            dtype = dtype.newbyteorder()
+        self.dtype = dtype
+
+        self.offset = 1024 + int(h['nsymbt'][0])
+        self.frame_shape = (int(h['ny'][0]), int(h['nx'][0]))
+        self.frame_nbytes = self.frame_shape[0] * self.frame_shape[1] * dtype.itemsize
+
+        with open(filename, 'rb') as f:
+            size = file_size(f)
+        expected = self.offset + len(self) * self.frame_nbytes
+        if size < expected:
+            raise util.InvalidHeaderException(f'file size < header: {size} < {expected}')
+
+        self._data = None
+
+    @classmethod
+    def create(cls, filename, img, header=None):
+        """Create a new stack with `img` as the first frame, and return it
+        opened in `r+` mode."""
+        write_image(filename, img, header=header)
+        return cls(filename, mode='r+')
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.filename!r}, shape={self.shape}, dtype={self.dtype})'
+
+    def __len__(self):
+        return int(self._h['nz'][0])
+
+    def __getitem__(self, index):
+        return self.data[index]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.data[i]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        self.close()
+
+    @property
+    def shape(self) -> tuple:
+        return (len(self), *self.frame_shape)
+
+    @property
+    def header(self) -> dict:
+        """Header as a dictionary (see `read_header`)."""
+        return read_header(self._h)
+
+    @property
+    def data(self) -> numpy.memmap:
+        """Memory map of the stack with shape `(n, ny, nx)`."""
+        if self._data is None:
+            if len(self) == 0:
+                return numpy.empty((0, *self.frame_shape), dtype=self.dtype)
+            self._data = numpy.memmap(self.filename, dtype=self.dtype, mode=self.mode,
+                                      offset=self.offset, shape=self.shape)
+        return self._data
+
+    def append(self, img) -> None:
+        """Append a frame `(ny, nx)` or a stack of frames `(n, ny, nx)` to
+        the end of the file, and update the header in place."""
+        if self.mode != 'r+':
+            raise OSError('Stack is opened read-only')
+
+        img = numpy.asarray(img)
+        if img.ndim == 2:
+            img = img[numpy.newaxis]
+        if img.shape[1:] != self.frame_shape:
+            raise ValueError(f'Frame shape does not match stack: {img.shape[1:]} != {self.frame_shape}')
+
+        img = numpy.ascontiguousarray(img, dtype=self.dtype)
+
+        count = len(self)
+        n = len(img)
+        h = self._h
+
+        old_mean = float(h['amean'][0])
+        h['amin'] = min(float(h['amin'][0]), img.min()) if count else img.min()
+        h['amax'] = max(float(h['amax'][0]), img.max()) if count else img.max()
+        h['amean'] = (old_mean * count + img.mean(dtype=numpy.float64) * n) / (count + n)
+
+        apix = float(h['zlen'][0]) / count if count else 1.0
+        h['nz'] = count + n
+        h['mz'] = count + n
+        h['zlen'] = (count + n) * apix
+
+        self.flush()
+        self._data = None
+
+        with open(self.filename, 'rb+') as f:
+            f.seek(self.offset + count * self.frame_nbytes)
+            img.tofile(f)
+            f.seek(0)
+            h.tofile(f)
+
+    def flush(self) -> None:
+        """Write changes made through the memory map to disk."""
+        if self._data is not None and self.mode == 'r+':
+            self._data.flush()
+
+    def close(self) -> None:
+        self.flush()
+        self._data = None
+
+
 if __name__ == '__main__':
     import numpy as np
 
@@ -9,7 +9,6 @@ import os
 
 import numpy
 import numpy as np
-from scipy import ndimage
 
 
 _logger = logging.getLogger(__name__)
@@ -138,6 +137,8 @@ def read_image(f, header, dtype, dlen, shape, swap, order='C'):
           Array of image data
     """
 
+    from scipy import ndimage
+
     out = np.fromfile(f, dtype=dtype, count=dlen)
     out.shape = shape
     out = out.squeeze()
@@ -17,53 +17,131 @@ DATA_TYPES = {'signed 8-bit integer': 'int8',
 STARTER = b'\x0c\x1a\x04\xd5'
 
 
+# Escapes used by the byte offset algorithm to announce a wider integer
+ESCAPE_INT16 = b'\x80'
+ESCAPE_INT32 = b'\x80\x00\x80'
+ESCAPE_INT64 = b'\x80\x00\x80\x00\x00\x00\x80'
+
+
 def compByteOffset(data):
     """Compress a dataset into a string using the byte_offet algorithm.
 
+    Every delta between consecutive pixels is stored as an int8 if it fits,
+    otherwise it is escaped and stored as int16/int32/int64. The output
+    stream is built in one go: the offset of every delta in the stream is
+    calculated from the widths, and the escapes and values are scattered
+    into a preallocated buffer.
+
     :param data: ndarray
     :return: string/bytes with compressed data
 
     test = np.array([0,1,2,127,0,1,2,128,0,1,2,32767,0,1,2,32768,0,1,2,2147483647,0,1,2,2147483648,0,1,2,128,129,130,32767,32768,128,129,130,32768,2147483647,2147483648])
     """
     flat = np.ascontiguousarray(data.ravel(), np.int64)
-    delta = np.zeros_like(flat)
-    delta[0] = flat[0]
-    delta[1:] = flat[1:] - flat[:-1]
-    mask = abs(delta) > 127
-    exceptions = np.nonzero(mask)[0]
-    if np.little_endian:
-        byteswap = False
-    else:
-        byteswap = True
-    start = 0
-    binary_blob = b''
-    for stop in exceptions:
-        if stop - start > 0:
-            binary_blob += delta[start:stop].astype(np.int8).tobytes()
-        exc = delta[stop]
-        absexc = abs(exc)
-        if absexc > 2147483647:  # 2**31-1
-            binary_blob += b'\x80\x00\x80\x00\x00\x00\x80'
-            if byteswap:
-                binary_blob += delta[stop:stop + 1].byteswap().tobytes()
-            else:
-                binary_blob += delta[stop:stop + 1].tobytes()
-        elif absexc > 32767:  # 2**15-1
-            binary_blob += b'\x80\x00\x80'
-            if byteswap:
-                binary_blob += delta[stop:stop + 1].astype(np.int32).byteswap().tobytes()
-            else:
-                binary_blob += delta[stop:stop + 1].astype(np.int32).tobytes()
-        else:  # >127
-            binary_blob += b'\x80'
-            if byteswap:
-                binary_blob += delta[stop:stop + 1].astype(np.int16).byteswap().tobytes()
-            else:
-                binary_blob += delta[stop:stop + 1].astype(np.int16).tobytes()
-        start = stop + 1
-    if start < delta.size:
-        binary_blob += delta[start:].astype(np.int8).tobytes()
-    return binary_blob
+    delta = np.empty_like(flat)
+    delta[:1] = flat[:1]
+    np.subtract(flat[1:], flat[:-1], out=delta[1:])
+
+    absdelta = np.abs(delta)
+    kind = (absdelta > 127).astype(np.int8)
+    kind += absdelta > 32767  # 2**15-1
+    kind += absdelta > 2147483647  # 2**31-1
+
+    escapes = (b'', ESCAPE_INT16, ESCAPE_INT32, ESCAPE_INT64)
+    dtypes = ('<i1', '<i2', '<i4', '<i8')
+    widths = np.array([len(escape) + np.dtype(dtype).itemsize for escape, dtype in zip(escapes, dtypes)])
+
+    sizes = widths[kind]
+    offsets = np.zeros_like(sizes)
+    np.cumsum(sizes[:-1], out=offsets[1:])
+
+    out = np.empty(sizes.sum(), dtype=np.uint8)
+
+    for k, (escape, dtype) in enumerate(zip(escapes, dtypes)):
+        sel = kind == k
+        if not sel.any():
+            continue
+        start = offsets[sel]
+        values = delta[sel].astype(dtype).view(np.uint8).reshape(-1, np.dtype(dtype).itemsize)
+        if escape:
+            markers = np.frombuffer(escape, dtype=np.uint8)
+            out[start[:, None] + np.arange(len(markers))] = markers
+        out[start[:, None] + len(escape) + np.arange(values.shape[1])] = values
+
+    return out.tobytes()
+
+
+def decByteOffset(stream, size: int = None, dtype='int64'):
+    """Decompress a stream that was compressed with the byte_offset
+    algorithm (see `compByteOffset`).
+
+    The escapes are located with array operations, the int8 deltas in
+    between and the escaped values are decoded all at once.
+
+    :param stream: bytes with the compressed data
+    :param size: number of elements to return (default: all)
+    :param dtype: data type of the output array
+    :return: 1D ndarray
+    """
+    raw = np.frombuffer(stream, dtype=np.uint8)
+    n = len(raw)
+
+    # Every 0x80 byte may start an escape, unless it is part of the value
+    # following an earlier escape. Determine the width of each candidate
+    # as if it were an escape, then follow the chain from the start.
+    candidates = np.flatnonzero(raw == 0x80)
+    padded = np.concatenate([raw, np.zeros(7, dtype=np.uint8)])
+    is_int32 = (padded[candidates + 1] == 0x00) & (padded[candidates + 2] == 0x80)
+    is_int64 = is_int32 & (padded[candidates + 3] == 0x00) & (padded[candidates + 4] == 0x00)
+    is_int64 &= (padded[candidates + 5] == 0x00) & (padded[candidates + 6] == 0x80)
+    kinds = 1 + is_int32.astype(np.int8) + is_int64
+    widths = np.array([0, 3, 7, 15])[kinds]
+    ends = candidates + widths
+
+    # Runs of candidates that do not overlap are all escapes, so the loop
+    # only has to step over the candidates that are inside a value
+    overlaps = np.flatnonzero(candidates[1:] < ends[:-1]) + 1
+    overlaps = np.append(overlaps, len(candidates))
+    next_overlap = overlaps[np.searchsorted(overlaps, np.arange(len(candidates)), side='right')]
+    following = np.searchsorted(candidates, ends)
+
+    starts = []
+    stops = []
+    i = 0
+    while i < len(candidates):
+        stop = next_overlap[i]
+        starts.append(i)
+        stops.append(stop)
+        i = following[stop - 1]
+
+    in_chain = np.zeros(len(candidates) + 1, dtype=np.int64)
+    in_chain[starts] = 1
+    in_chain[stops] = -1
+    chain = np.flatnonzero(np.cumsum(in_chain[:-1]))
+
+    if len(chain) and candidates[chain[-1]] + widths[chain[-1]] > n:
+        raise ValueError('Unexpected end of byte offset stream')
+
+    escapes = {kind: candidates[chain][kinds[chain] == kind] for kind in (1, 2, 3)}
+
+    values = raw.view(np.int8).astype(np.int64)
+    skip = np.zeros(n + 1, dtype=np.int64)
+
+    for kind, (escape, itemsize) in zip((1, 2, 3), ((ESCAPE_INT16, 2), (ESCAPE_INT32, 4), (ESCAPE_INT64, 8))):
+        start = escapes[kind]
+        if not len(start):
+            continue
+        first = start + len(escape)
+        index = first[:, None] + np.arange(itemsize)
+        values[start] = raw[index].view(f'<i{itemsize}').ravel()
+        skip[start + 1] += 1
+        skip[first + itemsize] -= 1
+
+    delta = values[np.cumsum(skip[:-1]) == 0]
+    if size is not None:
+        delta = delta[:size]
+
+    return np.cumsum(delta).astype(dtype)
 
 
 def write(fname, data, header={}):
@@ -113,6 +191,46 @@ def write(fname, data, header={}):
         out_file.write(cbf)
 
 
+def read(fname):
+    """read the file in CBF format, only byte offset compression is
+    supported.
+
+    :param str fname: name of the file
+    :return: image as ndarray, header as dict with the `X-Binary-*` fields
+    """
+    with open(fname, 'rb') as in_file:
+        cbf = in_file.read()
+
+    start = cbf.find(STARTER)
+    if start < 0:
+        raise OSError(f'No binary section found in CBF file: {fname}')
+
+    header = {}
+    for line in cbf[:start].splitlines():
+        line = line.decode(errors='replace').strip()
+        if line.startswith(('X-Binary-', 'Content-', 'conversions=')):
+            key, sep, value = line.partition(':') if ':' in line else line.partition('=')
+            value = value.strip().strip(';').strip('"')
+            try:
+                value = int(value)
+            except ValueError:
+                pass
+            header[key.strip()] = value
+
+    if 'x-CBF_BYTE_OFFSET' not in header.get('conversions', 'x-CBF_BYTE_OFFSET'):
+        raise NotImplementedError(f'CBF compression not supported: {header["conversions"]}')
+
+    size = header['X-Binary-Size']
+    dim1 = header['X-Binary-Size-Fastest-Dimension']
+    dim2 = header['X-Binary-Size-Second-Dimension']
+    dtype = DATA_TYPES.get(header.get('X-Binary-Element-Type'), 'int32')
+
+    start += len(STARTER)
+    data = decByteOffset(cbf[start:start + size], size=dim1 * dim2, dtype=dtype)
+
+    return data.reshape(dim2, dim1), header
+
+
 if __name__ == '__main__':
     arr = np.arange(128 * 128).reshape(128, 128)
     write('a.cbf', arr)
@@ -1,6 +1,13 @@
+import threading
+import time
+from pathlib import Path
+
 import matplotlib.pyplot as plt
 import numpy as np
+from pyserialem.montage import define_directions
+from pyserialem.montage import define_pairs
 from pyserialem.montage import make_grid
+from pyserialem.montage import make_slices
 from pyserialem.montage import sorted_grid_indices
 
 from .montage import *
@@ -101,34 +108,142 @@ class GridMontage:
         print(f'  Spot size: {self.spotsize}')
         print(f'  Binning: {self.binning}')
 
-    def start(self):
-        """Start the experiment."""
+    def start(self, drc: str = None, settle_delay: float = 0.0):
+        """Start the experiment.
+
+        Each image is written to `drc` and the overlaps with its
+        neighbours are cross correlated in the background, while the
+        stage moves to the next position.
+
+        drc : str
+            Path of the output directory. If `None`, it defaults to the instamatic data directory defined in the config.
+        settle_delay : float
+            Time (s) to wait after the stage has moved before acquiring.
+        """
+        from instamatic.acquire_at_items import AcquireAtItems
+        from instamatic.io import get_new_work_subdirectory
+
         ctrl = self.ctrl
 
-        buffer = []
+        if not drc:
+            drc = get_new_work_subdirectory('montage')
+
+        self.drc = drc = Path(drc)
+        drc.mkdir(exist_ok=True, parents=True)
+        self.buffer = []
+        self.filenames = []
+        self._written = set()
+        self._init_pairs()
 
         def eliminate_backlash(ctrl):
             print('Attempting to eliminate backlash...')
             ctrl.stage.eliminate_backlash_xy()
 
         def acquire_image(ctrl):
-            img, h = ctrl.get_image()
-            buffer.append((img, h))
+            exposure = ctrl.cam.default_exposure
+            t0 = time.perf_counter()
+            img, h = ctrl.get_image(exposure=exposure)
+            dt = time.perf_counter() - t0
+
+            timing = aai.timings[-1]
+            timing['expose'] = exposure
+            timing['readout'] = max(dt - exposure, 0.0)
+
+            i = len(self.buffer)
+            self.buffer.append((img, h))
+
+            aai.submit(self._write_image, drc, i, img, h)
+            aai.submit(self._correlate_pairs, i, phase='correlate')
+
+        aai = AcquireAtItems(ctrl,
+                             self.stagecoords,
+                             acquire=acquire_image,
+                             pre_acquire=eliminate_backlash,
+                             settle_delay=settle_delay)
+        aai.start()
 
-        def post_acquire(ctrl):
-            pass
+        self.timings = aai.timings
 
-        ctrl.acquire_at_items(self.stagecoords,
-                              acquire=acquire_image,
-                              pre_acquire=eliminate_backlash,
-                              post_acquire=None)
+        self.save(drc)
 
-        self.buffer = buffer
+    def _write_image(self, drc, i: int, img, h) -> str:
+        """Write image `i` of the montage to `drc`."""
+        from instamatic.formats import write_tiff
 
-        self.save()
+        name = f'mont_{i:04d}.tiff'
+        write_tiff(drc / name, img, header=h)
+        self._written.add((drc, i))
+
+        return name
+
+    def _init_pairs(self):
+        """Define the neighbouring pairs of images for the cross correlation
+        of the overlaps, using the grid of `GridMontage.to_montage`."""
+        gridspec = self.gridspec
+        gridspec['flip'] = not self.flip  # BUG: Work-around for gridspec madness, see `to_montage`
+        self._grid = make_grid(**gridspec)
+
+        self._slices = None  # made from the first image, see `_correlate_pairs`
+
+        self._pairs = define_directions(define_pairs(self._grid))
+        self.raw_difference_vectors = {}
+
+        # like `Montage.calculate_difference_vectors`, only the first pair
+        # in each direction is correlated, the reverse is copied
+        seen = set()
+        self._correlated_pairs = []
+        for pair in self._pairs:
+            key = frozenset((pair['seq0'], pair['seq1']))
+            if key not in seen:
+                seen.add(key)
+                self._correlated_pairs.append(pair)
+
+        self._lock = threading.Lock()
+
+    def _correlate_pairs(self, i: int) -> None:
+        """Cross correlate the overlaps of image `i` with the neighbours
+        that have already been collected. Gives the same results as
+        `Montage.calculate_difference_vectors` with the default arguments."""
+        from skimage.registration import phase_cross_correlation
+
+        images = self.buffer
+
+        with self._lock:
+            if self._slices is None:
+                # like `Montage`, use the shape of the images (rows, cols)
+                res_x, res_y = images[0][0].shape
+                self._slices = make_slices(int(res_x * self.overlap), int(res_y * self.overlap))
+
+        for pair in self._correlated_pairs:
+            seq0, seq1 = pair['seq0'], pair['seq1']
+            if max(seq0, seq1) != i:
+                continue
+
+            strip0 = images[seq0][0][self._slices[pair['side0']]]
+            strip1 = images[seq1][0][self._slices[pair['side1']]]
+
+            shift, error, phasediff = phase_cross_correlation(strip0, strip1)
+            score = np.nan_to_num(1 - error**0.5, nan=0.0)
+
+            with self._lock:
+                for a, b, sign in ((seq0, seq1, 1), (seq1, seq0, -1)):
+                    self.raw_difference_vectors[a, b] = {
+                        'shift': sign * np.array(shift),
+                        'idx0': pair['idx0'] if sign > 0 else pair['idx1'],
+                        'idx1': pair['idx1'] if sign > 0 else pair['idx0'],
+                        'overlap_k': 1.0,
+                        'fft_score': score,
+                    }
 
     def to_montage(self):
-        """Convert the experimental data to a `Montage` object."""
+        """Convert the experimental data to a `Montage` object.
+
+        The difference vectors calculated during the acquisition are
+        stored in the `Montage`, so that the coordinates can be optimized
+        directly:
+            m = gm.to_montage()
+            m.optimize_montage_coords()
+        """
         images = [im for im, h in self.buffer]
         m = Montage(images=images,
                     gridspec=self.gridspec,
@@ -140,24 +255,34 @@ class GridMontage:
         m.update_gridspec(flip=not self.flip)  # BUG: Work-around for gridspec madness
         # Possibly related is that images are rotated 90 deg. in SerialEM mrc files
 
+        n_pairs = sum(max(pair['seq0'], pair['seq1']) < len(images) for pair in getattr(self, '_pairs', ()))
+        if n_pairs and len(getattr(self, 'raw_difference_vectors', ())) == n_pairs:
+            m.pairs = self._pairs
+            m.slices = self._slices
+            m.raw_difference_vectors = dict(sorted(self.raw_difference_vectors.items()))
+            m.difference_vectors = m.filter_difference_vectors(verbose=False)
+            m.weights = {k: v['fft_score'] for k, v in m.raw_difference_vectors.items()}
+
         return m
 
     def save(self, drc: str = None):
-        """Save the data to the given directory.
+        """Save the data to the given directory. Images that were already
+        written during the acquisition are not written again.
 
         drc : str
             Path of the output directory. If `None`, it defaults to the instamatic data directory defined in the config.
         """
-        from instamatic.formats import write_tiff
         from instamatic.io import get_new_work_subdirectory
 
         if not drc:
             drc = get_new_work_subdirectory('montage')
+        drc = Path(drc)
 
         fns = []
         for i, (img, h) in enumerate(self.buffer):
             name = f'mont_{i:04d}.tiff'
-            write_tiff(drc / name, img, header=h)
+            if (drc, i) not in getattr(self, '_written', ()):
+                self._write_image(drc, i, img, h)
             fns.append(name)
 
         n_images = i + 1
@@ -6,10 +6,10 @@ from tkinter.ttk import *
 
 import numpy as np
 from PIL import Image
-from PIL import ImageEnhance
 from PIL import ImageTk
 
 from .base_module import BaseModule
+from instamatic import config
 from instamatic.formats import read_tiff
 from instamatic.formats import write_tiff
 from instamatic.processing.flatfield import apply_flatfield_correction
@@ -18,7 +18,14 @@ from instamatic.utils.spinbox import Spinbox
 
 class VideoStreamFrame(LabelFrame):
     """GUI panel to continuously display the last frame streamed from the
-    camera."""
+    camera.
+
+    The frames are converted to 8-bit images (contrast, brightness,
+    downsampling) on a separate thread, so that the GUI thread only has
+    to display them. A new frame is only rendered after the previous one
+    has been displayed, frames that arrive in the meantime are skipped
+    (counted in `self.dropped`).
+    """
 
     def __init__(self, parent, stream, app=None):
         LabelFrame.__init__(self, parent, text='Stream')
@@ -40,6 +47,13 @@ class VideoStreamFrame(LabelFrame):
         self.auto_contrast = True
 
         self.resize_image = False
+        self.max_display_size = config.settings.videostream_max_display_size
+
+        self.rendered = None
+        self.dropped = 0
+        self._displayed = threading.Event()
+        self._displayed.set()
+        self._stop_render = threading.Event()
 
         self.last = time.perf_counter()
         self.nframes = 1
@@ -187,7 +201,7 @@ class VideoStreamFrame(LabelFrame):
 
     def saveImage(self):
         """Dump the current frame to a file."""
-        self.q.put(('save_image', {'frame': self.frame}))
+        self.q.put(('save_image', {'frame': self.stream.frame}))
         self.triggerEvent.set()
 
     def set_trigger(self, trigger=None, q=None):
@@ -195,6 +209,7 @@ class VideoStreamFrame(LabelFrame):
         self.q = q
 
     def close(self):
+        self._stop_render.set()
         self.stream.close()
         self.parent.quit()
         # for func in self._atexit_funcs:
@@ -202,32 +217,55 @@ class VideoStreamFrame(LabelFrame):
 
     def start_stream(self):
         self.stream.update_frametime(self.frametime)
+        threading.Thread(target=self.render_loop, daemon=True).start()
         self.after(500, self.on_frame)
 
+    def render(self, frame: np.ndarray) -> Image.Image:
+        """Convert `frame` to an 8-bit image for display."""
+        step = -(-max(frame.shape) // self.max_display_size)
+        if step > 1:
+            frame = frame[::step, ::step]
+
+        # the display range in ImageTk is from 0 to 256
+        if self.auto_contrast:
+            scale = 256.0 / (1 + np.percentile(frame[::4, ::4], 99.5))  # use 128x128 array for faster calculation
+        else:
+            scale = 256.0 / self.display_range
+
+        image = np.multiply(frame, scale * self.brightness, dtype=np.float32)
+        np.clip(image, 0, 255, out=image)
+        image = Image.fromarray(image.astype(np.uint8))
+
+        if self.resize_image:
+            image = image.resize((950, 950))
+
+        return image
+
+    def render_loop(self):
+        """Render the latest frame from the stream whenever the previous one
+        has been displayed."""
+        seq = 0
+        while not self._stop_render.is_set():
+            if not self._displayed.wait(timeout=0.5):
+                continue
+
+            new_seq, frame = self.stream.buffer.wait(seq, timeout=0.5)
+            if frame is None:
+                continue
+
+            if seq:
+                self.dropped += new_seq - seq - 1
+            seq = new_seq
+
+            image = self.render(frame)
+            self._displayed.clear()
+            self.rendered = image
+
     def on_frame(self, event=None):
-        self.stream.lock.acquire(True)
-        self.frame = frame = self.stream.frame
-        self.stream.lock.release()
-
-        if frame is not None:
-            # the display range in ImageTk is from 0 to 256
-            if self.auto_contrast:
-                frame = frame * (256.0 / (1 + np.percentile(frame[::4, ::4], 99.5)))  # use 128x128 array for faster calculation
-
-                image = Image.fromarray(frame)
-            elif self.display_range != self.display_range_default:
-                image = np.clip(frame, 0, self.display_range)
-                image = (256.0 / self.display_range) * image
-                image = Image.fromarray(image)
-            else:
-                image = Image.fromarray(frame)
-
-            if self.brightness != 1:
-                image = ImageEnhance.Brightness(image.convert('L')).enhance(self.brightness)
-                # Can also use ImageEnhance.Sharpness or ImageEnhance.Contrast if needed
-
-            if self.resize_image:
-                image = image.resize((950, 950))
+        image = self.rendered
+
+        if image is not None:
+            self.rendered = None
 
             image = ImageTk.PhotoImage(image=image)
 
@@ -235,8 +273,8 @@ class VideoStreamFrame(LabelFrame):
             # keep a reference to avoid premature garbage collection
             self.panel.image = image
 
-        self.update_frametimes()
-        # self.parent.update_idletasks()
+            self._displayed.set()
+            self.update_frametimes()
 
         self.after(self.frame_delay, self.on_frame)
 
@@ -284,7 +322,6 @@ def ipy_embed(*args, **kwargs):
 
 
 if __name__ == '__main__':
-    from instamatic import config
     from instamatic.camera import VideoStream
 
     stream = VideoStream(cam=config.camera.name)
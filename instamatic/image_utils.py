@@ -1,6 +1,4 @@
 import numpy as np
-from scipy import ndimage
-from skimage import exposure
 
 from instamatic import config
 
@@ -8,6 +6,8 @@ from instamatic import config
 def autoscale(img: np.ndarray, maxdim: int = 512) -> (np.ndarray, float):
     """Scale the image to fit the maximum dimension given by `maxdim` Returns
     the scaled image, and the image scale."""
+    from scipy import ndimage
+
     if maxdim:
         scale = float(maxdim) / max(img.shape)
 
@@ -16,6 +16,8 @@ def autoscale(img: np.ndarray, maxdim: int = 512) -> (np.ndarray, float):
 
 def imgscale(img: np.ndarray, scale: float) -> np.ndarray:
     """Scale the image by the given scale."""
+    from scipy import ndimage
+
     if scale == 1:
         return img
     return ndimage.zoom(img, scale, order=1)
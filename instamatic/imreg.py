@@ -3,30 +3,22 @@ from numpy.fft import fft2
 from numpy.fft import ifft2
 
 
-def translation(im0,
-                im1,
-                limit_shift: bool = False,
-                return_fft: bool = False,
-                ):
-    """Return translation vector to register images.
+def find_peak(ir, limit_shift: bool = False) -> list:
+    """Return the position of the maximum of the cross correlation array
+    `ir` as a shift vector.
 
     Parameters
     ----------
-    im0, im1 : np.array
-        The two images to compare
+    ir : np.array
+        The (real) cross correlation array
     limit_shift : bool
         Limit the maximum shift to the minimum array length or width.
-    return_fft : bool
-        Whether to additionally return the cross correlation array between the 2 images
 
     Returns
     -------
     shift: list
         Return the 2 coordinates defining the determined image shift
     """
-    f0 = fft2(im0)
-    f1 = fft2(im1)
-    ir = abs(ifft2((f0 * f1.conjugate()) / (abs(f0) * abs(f1))))
     shape = ir.shape
 
     if limit_shift:
@@ -44,7 +36,192 @@ def translation(im0,
         if t1 > shape[1] // 2:
             t1 -= shape[1]
 
+    return [t0, t1]
+
+
+def translation(im0,
+                im1,
+                limit_shift: bool = False,
+                return_fft: bool = False,
+                ):
+    """Return translation vector to register images.
+
+    To register many images against the same reference, use `Registration`.
+
+    Parameters
+    ----------
+    im0, im1 : np.array
+        The two images to compare
+    limit_shift : bool
+        Limit the maximum shift to the minimum array length or width.
+    return_fft : bool
+        Whether to additionally return the cross correlation array between the 2 images
+
+    Returns
+    -------
+    shift: list
+        Return the 2 coordinates defining the determined image shift
+    """
+    f0 = fft2(im0)
+    f1 = fft2(im1)
+    ir = abs(ifft2((f0 * f1.conjugate()) / (abs(f0) * abs(f1))))
+
+    t0, t1 = find_peak(ir, limit_shift=limit_shift)
+
     if return_fft:
         return [t0, t1], ir
     else:
         return [t0, t1]
+
+
+class Registration:
+    """Register many images against the same reference image.
+
+    The spectrum of the reference image, its magnitude and the window are
+    computed once, and the buffers for the cross power spectrum are
+    reused between calls. With the defaults, the shifts are identical to
+    those of `translation`.
+    An instance is not thread-safe, use one instance per thread.
+
+    Parameters
+    ----------
+    reference : np.array
+        The reference image (2D)
+    window : str
+        Apply a window to all images before the FFT, `hann` or None
+    dtype : np.dtype
+        Use float32 to compute the FFTs in single precision (complex64),
+        which is faster and uses half the memory.
+    workers : int
+        Number of threads for the FFTs. If it is given, or if dtype is
+        float32, `scipy.fft` is used instead of `numpy.fft`.
+
+    Usage:
+        reg = Registration(img0)
+        for img in images:
+            shift = reg.translation(img)
+    """
+
+    def __init__(self, reference, window: str = None, dtype=np.float64, workers: int = None):
+        self.dtype = np.dtype(dtype)
+        self.workers = workers
+        self.shape = reference.shape
+
+        if self.dtype == np.float64 and workers is None:
+            import numpy.fft as fft
+            self._fft_kwargs = {}
+        else:
+            import scipy.fft as fft
+            self._fft_kwargs = {'workers': workers}
+        self._fft = fft
+
+        if window is None:
+            self.window = None
+        elif window == 'hann':
+            self.window = np.outer(np.hanning(self.shape[0]), np.hanning(self.shape[1])).astype(self.dtype)
+        else:
+            raise ValueError(f'Unknown window: {window!r}')
+
+        self.reference = reference
+        self.reference_fft = self.fft(reference)
+        self.reference_abs = np.abs(self.reference_fft)
+
+        self._buffers = {}
+
+    def fft(self, img) -> np.array:
+        """Return the FFT of `img` (or a stack of images) over the last 2
+        axes, after applying the window."""
+        if img.shape[-2:] != self.shape:
+            raise ValueError(f'Image shape {img.shape[-2:]} does not match the reference {self.shape}')
+
+        img = np.asarray(img, dtype=self.dtype)
+        if self.window is not None:
+            img = img * self.window
+
+        return self._fft.fft2(img, axes=(-2, -1), **self._fft_kwargs)
+
+    def _get_buffers(self, shape: tuple) -> tuple:
+        """Return the scratch buffers for the cross power spectrum."""
+        try:
+            return self._buffers[shape]
+        except KeyError:
+            pass
+
+        complex_dtype = np.result_type(self.reference_fft, np.complex64)
+        buffers = (np.empty(shape, dtype=complex_dtype),
+                   np.empty(shape, dtype=self.reference_abs.dtype))
+        self._buffers[shape] = buffers
+        return buffers
+
+    def correlate(self, img) -> np.array:
+        """Return the (real) phase correlation array of `img` (or a stack of
+        images) with the reference."""
+        f1 = self.fft(img)
+        spectrum, magnitude = self._get_buffers(f1.shape)
+
+        # same operations as `translation`, into the scratch buffers
+        np.conjugate(f1, out=spectrum)
+        np.multiply(self.reference_fft, spectrum, out=spectrum)
+        np.abs(f1, out=magnitude)
+        np.multiply(self.reference_abs, magnitude, out=magnitude)
+        np.divide(spectrum, magnitude, out=spectrum)
+
+        return np.abs(self._fft.ifft2(spectrum, axes=(-2, -1), **self._fft_kwargs))
+
+    def translation(self, img, limit_shift: bool = False, return_fft: bool = False):
+        """Return translation vector to register `img` with the reference.
+
+        See `translation` for the parameters.
+        """
+        ir = self.correlate(img)
+        shift = find_peak(ir, limit_shift=limit_shift)
+
+        if return_fft:
+            return shift, ir
+        else:
+            return shift
+
+    def translations(self, imgs, limit_shift: bool = False, batch_size: int = 16) -> np.array:
+        """Return the translation vectors to register each of `imgs` with
+        the reference.
+
+        The images are transformed together in batches of `batch_size`
+        images, which limits the memory that is used.
+
+        Parameters
+        ----------
+        imgs : np.array or list
+            Stack of images (N, *reference.shape)
+        limit_shift : bool
+            Limit the maximum shift to the minimum array length or width.
+        batch_size : int
+            Number of images to transform at once
+
+        Returns
+        -------
+        shifts : np.array
+            Array (N, 2) with the shifts
+        """
+        shifts = []
+        for i in range(0, len(imgs), batch_size):
+            batch = np.asarray(imgs[i:i + batch_size])
+            for ir in self.correlate(batch):
+                shifts.append(find_peak(ir, limit_shift=limit_shift))
+
+        return np.array(shifts, dtype=int).reshape(-1, 2)
+
+    def phase_cross_correlation(self, img, upsample_factor: int = 1) -> tuple:
+        """Register `img` with the reference using
+        `skimage.registration.phase_cross_correlation` with subpixel
+        precision, reusing the spectrum of the reference.
+
+        Returns
+        -------
+        shift, error, phasediff
+            See `skimage.registration.phase_cross_correlation`
+        """
+        from skimage.registration import phase_cross_correlation
+
+        return phase_cross_correlation(self.reference_fft, self.fft(img),
+                                       upsample_factor=upsample_factor,
+                                       space='fourier')
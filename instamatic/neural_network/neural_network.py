@@ -1,10 +1,31 @@
 import pickle
+from functools import lru_cache
 from pathlib import Path
 
 import numpy as np
+from numpy.lib.stride_tricks import as_strided
 
-with open(Path(__file__).parent / 'weights-py3.p', 'rb') as p_file:
-    weights = pickle.load(p_file)
+WEIGHTS = Path(__file__).parent / 'weights-py3.p'
+
+
+@lru_cache(maxsize=None)
+def get_weights(dtype=None) -> tuple:
+    """Return the weights of the network, cast to `dtype` if given.
+
+    The weights are loaded from disk on first use and cached.
+    """
+    if dtype is None:
+        with open(WEIGHTS, 'rb') as p_file:
+            return tuple(pickle.load(p_file))
+    else:
+        return tuple(np.asarray(w, dtype=dtype) for w in get_weights())
+
+
+def __getattr__(name):
+    # `weights` used to be loaded on import
+    if name == 'weights':
+        return get_weights()
+    raise AttributeError(f'module `{__name__}` has no attribute `{name}`')
 
 
 def conv_layer(in_layer, weight, offset):
@@ -34,22 +55,69 @@ def max_pooling(convoluted):
     return pooled
 
 
+def conv_layer_batch(in_layer, weight, offset):
+    """Valid 3x3 convolution of a batch of images with shape `(n, y, x,
+    channels)`.
+
+    The patches are taken as a strided view of the input (im2col), so
+    that the whole batch is convolved in a single matrix product.
+    """
+    n, h, w, c = in_layer.shape
+    kh, kw = weight.shape[:2]
+    s0, s1, s2, s3 = in_layer.strides
+    patches = as_strided(in_layer,
+                         shape=(n, h - kh + 1, w - kw + 1, kh, kw, c),
+                         strides=(s0, s1, s2, s1, s2, s3),
+                         writeable=False)
+    convoluted = np.tensordot(patches, weight, axes=((3, 4, 5), (0, 1, 2)))
+    convoluted += offset
+    return convoluted
+
+
+def max_pooling_batch(convoluted):
+    """2x2 max pooling of a batch of images with shape `(n, y, x,
+    channels)`, odd rows/columns are dropped."""
+    n, h, w, c = convoluted.shape
+    h2, w2 = h // 2, w // 2
+    blocks = convoluted[:, :h2 * 2, :w2 * 2].reshape(n, h2, 2, w2, 2, c)
+    return blocks.max(axis=(2, 4))
+
+
 def logistic(x):
     return 1 / (1 + np.exp(-x))
 
 
-def predict(image, weights=weights):
-    convoluted1 = relu(conv_layer(image, weights[0], weights[1]))
-    pooled1 = max_pooling(convoluted1)
-    convoluted2 = relu(conv_layer(pooled1, weights[2], weights[3]))
-    pooled2 = max_pooling(convoluted2)
-    convoluted3 = relu(conv_layer(pooled2, weights[4], weights[5]))
-    pooled3 = max_pooling(convoluted3)
-    convoluted4 = relu(conv_layer(pooled3, weights[6], weights[7]))
-    pooled4 = max_pooling(convoluted4)
-    convoluted5 = relu(conv_layer(pooled4, weights[8], weights[9]))
-    flattened = convoluted5.reshape((1, 1600))
-    dense1 = relu(np.tensordot(flattened, weights[10], axes=(1, 0)) + weights[11])
-    dense2 = relu(np.tensordot(dense1, weights[12], axes=(1, 0)) + weights[13])
-    dense3 = np.tensordot(dense2, weights[14], axes=(1, 0)) + weights[15]
-    return logistic(dense3)[0][0]
+def predict_batch(images, weights=None, dtype=np.float64):
+    """Score a batch of preprocessed images (see `preprocess`) at once.
+
+    images: array or list of arrays
+        Images with shape `(150, 150, 1)`, or a stacked array with shape
+        `(n, 150, 150, 1)`
+    dtype:
+        Data type for the computation, `np.float32` is roughly twice as
+        fast with a negligible difference in the scores
+
+    Returns an array with `n` scores.
+    """
+    x = np.asarray(images, dtype=dtype)
+    if x.ndim == 3:
+        x = x[np.newaxis]
+
+    if weights is None:
+        weights = get_weights(np.dtype(dtype).name)
+    else:
+        weights = [np.asarray(w, dtype=dtype) for w in weights]
+
+    for i in range(0, 8, 2):
+        x = max_pooling_batch(relu(conv_layer_batch(x, weights[i], weights[i + 1])))
+    x = relu(conv_layer_batch(x, weights[8], weights[9]))
+
+    flattened = x.reshape((len(x), -1))
+    dense1 = relu(np.dot(flattened, weights[10]) + weights[11])
+    dense2 = relu(np.dot(dense1, weights[12]) + weights[13])
+    dense3 = np.dot(dense2, weights[14]) + weights[15]
+    return logistic(dense3)[:, 0]
+
+
+def predict(image, weights=None):
+    return predict_batch(image, weights=weights)[0]
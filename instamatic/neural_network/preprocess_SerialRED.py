@@ -1,10 +1,11 @@
 import numpy as np
-from skimage.transform import resize
-
-from instamatic.tools import find_defocused_image_center
 
 
 def img_preproc(img, size=(80, 80)):
+    from skimage.transform import resize
+
+    from instamatic.tools import find_defocused_image_center
+
     crystal_pos, r = find_defocused_image_center(img)
     crystal_pos = crystal_pos[::-1]
 
@@ -1,5 +1,6 @@
 import collections
 import logging
+import threading
 import time
 from datetime import datetime
 from math import cos
@@ -11,10 +12,11 @@ from instamatic.formats import read_tiff
 from instamatic.formats import write_adsc
 from instamatic.formats import write_mrc
 from instamatic.formats import write_tiff
-from instamatic.processing.flatfield import apply_flatfield_correction
+from instamatic.formats.adscimage import update_adsc_header
+from instamatic.processing.flatfield import FlatfieldCorrector
 from instamatic.processing.stretch_correction import affine_transform_ellipse_to_circle
-from instamatic.tools import find_beam_center
-from instamatic.tools import find_beam_center_with_beamstop
+from instamatic.telemetry import metrics
+from instamatic.tools import find_beam_centers
 from instamatic.tools import find_subranges
 from instamatic.tools import to_xds_untrusted_area
 
@@ -87,6 +89,60 @@ def export_dials_variables(path, *, sequence=(), missing=(), rotation_xyz=None):
         print('::     dials.integrate %exclude_images% refined.pickle refined.json', file=f)
 
 
+_buffers = threading.local()
+
+
+def to_uint16(img: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+    """Round `img` and convert it to 16 bit unsigned integers, which is what
+    PETS/RED/XDS read. The result is written to `out` if it is given,
+    otherwise to a buffer that is reused by the calling thread. Images that
+    are already uint16 are returned as they are."""
+    if img.dtype == np.uint16:
+        return img
+
+    if out is None:
+        out = getattr(_buffers, 'uint16', None)
+        if out is None or out.shape != img.shape:
+            out = _buffers.uint16 = np.empty(img.shape, dtype=np.uint16)
+
+    if np.issubdtype(img.dtype, np.integer):
+        np.copyto(out, img, casting='unsafe')
+    else:
+        np.rint(img, out=out, casting='unsafe')
+
+    return out
+
+
+def write_frame(i: int,
+                img: np.ndarray,
+                tiff_path: str = None,
+                smv_path: str = None,
+                mrc_path: str = None,
+                header: dict = None,
+                smv_header: dict = None,
+                ) -> None:
+    """Convert image `img` with sequence number `i` to uint16 once, and
+    write it to each of the given paths (TIFF/SMV/MRC).
+
+    This is a module level function so that it can be run in a process
+    pool (see `ImgConversion.threadpoolwriter`). The write times are
+    added to `write_seconds` in `instamatic.telemetry.metrics` of the
+    process that runs it.
+    """
+    arr = to_uint16(img)
+
+    if tiff_path:
+        with metrics.timer('write_seconds', format='tiff'):
+            write_tiff(tiff_path / f'{i:05d}.tiff', arr, header=header)
+    if mrc_path:
+        # flip up/down because RED reads images from the bottom left corner
+        with metrics.timer('write_seconds', format='mrc'):
+            write_mrc(mrc_path / f'{i:05d}.mrc', np.flipud(arr))
+    if smv_path:
+        with metrics.timer('write_seconds', format='smv'):
+            write_adsc(smv_path / f'{i:05d}.img', arr, header=smv_header)
+
+
 def get_calibrated_rotation_speed(val):
     """Correct for the overestimation of the oscillation angle if the rotation
     was stopped before interrupting the data collection.
@@ -124,28 +180,12 @@ class ImgConversion:
             flatfield, h = read_tiff(flatfield)
         self.flatfield = flatfield
 
-        self.headers = {}
-        self.data = {}
-
         self.smv_subdrc = 'data'
 
-        while len(buffer) != 0:
-            i, img, h = buffer.pop(0)
-
-            self.headers[i] = h
-
-            if self.flatfield is not None:
-                self.data[i] = apply_flatfield_correction(img, self.flatfield)
-            else:
-                self.data[i] = img
+        self.load_buffer(buffer)
 
         self.untrusted_areas = []
 
-        self.observed_range = set(self.data.keys())
-        self.complete_range = set(range(min(self.observed_range), max(self.observed_range) + 1))
-        self.missing_range = self.observed_range ^ self.complete_range
-
-        self.data_shape = img.shape
         try:
             self.pixelsize = config.calibration['diff']['pixelsize'][camera_length]  # px / Angstrom
         except KeyError:
@@ -179,6 +219,50 @@ class ImgConversion:
         self.mean_beam_center, self.beam_center_std = self.get_beam_centers()
         logger.debug(f'Primary beam at: {self.mean_beam_center}')
 
+    def load_buffer(self, buffer) -> None:
+        """Read the frames from the image buffer into `self.data` and
+        `self.headers`, applying the flatfield correction if available.
+
+        The buffer can also be a `StreamWriter`, in which case the
+        frames have already been corrected and written to disk during
+        data collection. Only the headers are kept (`self.data` stays
+        empty), and the beam centers are taken from the headers.
+
+        If the buffer is a `FrameBuffer` (see `ProcessingCache`), the beam
+        centers it carries are used instead of searching for them again.
+        """
+        from .stream_writer import StreamWriter
+
+        self.headers = {}
+        self.data = {}
+
+        if self.flatfield is None:
+            self.known_beam_centers = dict(getattr(buffer, 'beam_centers', {}))
+        else:
+            self.known_beam_centers = {}
+
+        if isinstance(buffer, StreamWriter):
+            self.headers = dict(sorted(buffer.headers.items()))
+            self.data_shape = buffer.data_shape
+        else:
+            corrector = FlatfieldCorrector(self.flatfield) if self.flatfield is not None else None
+
+            while len(buffer) != 0:
+                i, img, h = buffer.pop(0)
+
+                self.headers[i] = h
+
+                if corrector is not None:
+                    self.data[i] = corrector(img)
+                else:
+                    self.data[i] = img
+
+            self.data_shape = img.shape
+
+        self.observed_range = set(self.headers.keys())
+        self.complete_range = set(range(min(self.observed_range), max(self.observed_range) + 1))
+        self.missing_range = self.observed_range ^ self.complete_range
+
     def check_settings(self) -> None:
         """Check for the presence of all required attributes.
 
@@ -232,20 +316,25 @@ class ImgConversion:
         """Obtain beam centers from the diffraction data Returns a tuple with
         the median beam center and its standard deviation."""
         shape_x, shape_y = self.data_shape
-        centers = []
-        for i, h in self.headers.items():
-            if self.use_beamstop:
-                cx, cy = find_beam_center_with_beamstop(self.data[i], z=99)
-            else:
-                cx, cy = find_beam_center(self.data[i], sigma=10)
 
+        # frames streamed to disk already have their beam center in the header
+        known = getattr(self, 'known_beam_centers', {})
+        for i in self.headers:
+            if i in known:
+                self.headers[i]['beam_center'] = known[i]
+
+        todo = [i for i in self.headers if i in self.data and i not in known]
+        found = find_beam_centers((self.data[i] for i in todo), sigma=10, use_beamstop=self.use_beamstop)
+
+        for i, (cx, cy) in zip(todo, found):
             if invert_x:
                 cx = shape_x - cx
             if invert_y:
                 cy = shape_y - cy
 
-            h['beam_center'] = (cx, cy)
-            centers.append((cx, cy))
+            self.headers[i]['beam_center'] = (cx, cy)
+
+        centers = [h['beam_center'] for h in self.headers.values()]
 
         self._beam_centers = beam_centers = np.array(centers)
 
@@ -329,44 +418,101 @@ class ImgConversion:
 
         logger.debug(f'MRC files created in folder: {path}')
 
-    def threadpoolwriter(self, tiff_path: str = None, smv_path: str = None, mrc_path: str = None, workers: int = 8) -> None:
+    def threadpoolwriter(self,
+                         tiff_path: str = None,
+                         smv_path: str = None,
+                         mrc_path: str = None,
+                         workers: int = 8,
+                         processes: bool = False,
+                         cache=None,
+                         ) -> None:
         """Efficiently write all data to the specified formats using a
         threadpool.
 
         If a path is given, write data in the corresponding format, i.e.
         if `tiff_path` is specified TIFF files are written to that path.
+        Each frame is converted to uint16 only once for all formats (see
+        `write_frame`). Set `processes=True` to use a process pool instead,
+        which avoids contention on the GIL at the cost of copying the frames
+        to the worker processes.
+
+        If a `ProcessingCache` is given as `cache`, files that were written
+        before from the same image and header, and have not been modified
+        since, are not written again.
         """
-        write_tiff = tiff_path is not None
-        write_smv = smv_path is not None
-        write_mrc = mrc_path is not None
+        import concurrent.futures
 
-        if write_smv:
+        if smv_path is not None:
             smv_path = smv_path / self.smv_subdrc
             smv_path.mkdir(exist_ok=True, parents=True)
             logger.debug(f'SMV files saved in folder: {smv_path}')
 
-        if write_tiff:
+        if tiff_path is not None:
             tiff_path.mkdir(exist_ok=True, parents=True)
             logger.debug(f'Tiff files saved in folder: {tiff_path}')
 
-        if write_mrc:
+        if mrc_path is not None:
             mrc_path.mkdir(exist_ok=True, parents=True)
             logger.debug(f'MRC files saved in folder: {mrc_path}')
 
-        import concurrent.futures
-        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
-            futures = []
-            for i in self.observed_range:
+        if processes:
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+        else:
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
 
-                if write_tiff:
-                    futures.append(executor.submit(self.write_tiff, tiff_path, i))
-                if write_mrc:
-                    futures.append(executor.submit(self.write_mrc, mrc_path, i))
-                if write_smv:
-                    futures.append(executor.submit(self.write_smv, smv_path, i))
+        # future -> list of (filename, key) to record in the cache
+        written = {}
+        skipped = 0
 
-            for future in futures:
-                ret = future.result()
+        def finish(future):
+            future.result()
+            for fn, key in written.pop(future, ()):
+                cache.record(fn, key)
+
+        with executor:
+            # limit the number of frames waiting in the pool
+            pending = set()
+            for i in self.observed_range:
+                if len(pending) >= 2 * workers:
+                    done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        finish(future)
+
+                img = self.data[i]
+                header = self.headers[i]
+                smv_header = self.get_smv_header(i, img.shape) if smv_path is not None else None
+                paths = {'tiff_path': tiff_path, 'smv_path': smv_path, 'mrc_path': mrc_path}
+
+                todo = []
+                if cache is not None:
+                    outputs = (
+                        ('tiff_path', 'tiff', header),
+                        ('smv_path', 'img', smv_header),
+                        ('mrc_path', 'mrc', None),
+                    )
+                    for name, ext, inputs in outputs:
+                        if paths[name] is None:
+                            continue
+                        fn = paths[name] / f'{i:05d}.{ext}'
+                        key = cache.output_key(img, ext, inputs)
+                        if cache.is_current(fn, key):
+                            paths[name] = None
+                            skipped += 1
+                        else:
+                            todo.append((fn, key))
+
+                    if not todo:
+                        continue
+
+                future = executor.submit(write_frame, i, img, header=header, smv_header=smv_header, **paths)
+                written[future] = todo
+                pending.add(future)
+
+            for future in pending:
+                finish(future)
+
+        if skipped:
+            logger.info(f'Skipped {skipped} files that are up to date')
 
     def to_dials(self, smv_path: str) -> None:
         """Convert the buffer to output compatible with DIALS.
@@ -384,7 +530,7 @@ class ImgConversion:
         path = smv_path / self.smv_subdrc
 
         i = min(observed_range)
-        empty = np.zeros_like(self.data[i])
+        empty = np.zeros(self.data_shape, dtype=np.uint16)
         # copy header from first frame
         h = self.headers[i].copy()
         h['ImageGetTime'] = time.time()
@@ -412,34 +558,27 @@ class ImgConversion:
         h = self.headers[i]
 
         # PETS reads only 16bit unsignt integer TIFF
-        img = np.round(img, 0).astype(np.uint16)
+        img = to_uint16(img)
 
         fn = path / f'{i:05d}.tiff'
         write_tiff(fn, img, header=h)
         return fn
 
-    def write_smv(self, path: str, i: int) -> str:
-        """Write the image+header with sequence number `i` to the directory
-        `path` in SMV format.
-
-        Returns the path to the written image.
-        """
-        img = self.data[i]
-        h = self.headers[i]
-
-        img = np.ushort(img)
-        shape_x, shape_y = img.shape
-
-        phi = self.start_angle + self.osc_angle * (i - 1)
-
+    def get_smv_header_template(self, shape: tuple) -> dict:
+        """Return the part of the SMV header that is the same for every
+        frame. It is formatted once and reused as long as the parameters
+        of the conversion (beam center, distance, etc.) do not change."""
         # TODO: Dials reads the beam_center from the first image and uses that for the whole range
         # For now, use the average beam center and consider it stationary, remove this line later
         mean_beam_center = self.mean_beam_center
 
-        try:
-            date = str(datetime.fromtimestamp(h['ImageGetTime']))
-        except BaseException:
-            date = '0'
+        key = (tuple(shape), self.physical_pixelsize, self.name, self.distance,
+               self.osc_angle, self.wavelength, tuple(mean_beam_center))
+        cached = getattr(self, '_smv_header_template', None)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        shape_x, shape_y = shape
 
         header = collections.OrderedDict()
         header['HEADER_BYTES'] = 512
@@ -455,12 +594,12 @@ class ImgConversion:
         header['CREV'] = 1
         header['BEAMLINE'] = self.name      # special ID for DIALS
         header['DETECTOR_SN'] = 901         # special ID for DIALS
-        header['DATE'] = date
-        header['TIME'] = str(h['ImageExposureTime'])
+        header['DATE'] = None               # per frame
+        header['TIME'] = None               # per frame
         header['DISTANCE'] = f'{self.distance:.4f}'
         header['TWOTHETA'] = 0.00
-        header['PHI'] = '{phi:.4f}'
-        header['OSC_START'] = f'{phi:.4f}'
+        header['PHI'] = None                # per frame
+        header['OSC_START'] = None          # per frame
         header['OSC_RANGE'] = f'{self.osc_angle:.4f}'
         header['WAVELENGTH'] = f'{self.wavelength:.4f}'
         # reverse XY coordinates for XDS
@@ -468,10 +607,55 @@ class ImgConversion:
         header['BEAM_CENTER_Y'] = f'{mean_beam_center[0]:.4f}'
         header['DENZO_X_BEAM'] = f'{mean_beam_center[0]*self.physical_pixelsize:.4f}'
         header['DENZO_Y_BEAM'] = f'{mean_beam_center[1]*self.physical_pixelsize:.4f}'
+
+        self._smv_header_template = key, header
+        return header
+
+    def get_smv_header(self, i: int, shape: tuple) -> dict:
+        """Return the SMV header for the image with sequence number `i`,
+        the template from `get_smv_header_template` with the per-frame
+        fields filled in."""
+        h = self.headers[i]
+
+        phi = self.start_angle + self.osc_angle * (i - 1)
+
+        try:
+            date = str(datetime.fromtimestamp(h['ImageGetTime']))
+        except BaseException:
+            date = '0'
+
+        header = self.get_smv_header_template(shape).copy()
+        header['DATE'] = date
+        header['TIME'] = str(h['ImageExposureTime'])
+        header['PHI'] = header['OSC_START'] = f'{phi:.4f}'
+
+        return header
+
+    def write_smv(self, path: str, i: int) -> str:
+        """Write the image+header with sequence number `i` to the directory
+        `path` in SMV format.
+
+        Returns the path to the written image.
+        """
+        img = self.data[i]
+
+        img = to_uint16(img)
+        header = self.get_smv_header(i, img.shape)
+
         fn = path / f'{i:05d}.img'
         write_adsc(fn, img, header=header)
         return fn
 
+    def write_smv_headers(self, path: str) -> None:
+        """Update the headers of SMV files that were written during data
+        collection (see `StreamWriter`), now that the oscillation angle and
+        mean beam center are known. The image data are not rewritten."""
+        path = path / self.smv_subdrc
+
+        for i in self.observed_range:
+            header = self.get_smv_header(i, self.data_shape)
+            update_adsc_header(path / f'{i:05d}.img', header)
+
     def write_mrc(self, path: str, i: int) -> str:
         """Write the image+header with sequence number `i` to the directory
         `path` in TIFF format.
@@ -490,7 +674,7 @@ class ImgConversion:
             maxval = np.iinfo(dtype).max
             img = (img / dynamic_range) * maxval
 
-        img = np.round(img, 0).astype(dtype)
+        img = to_uint16(img)
 
         # flip up/down because RED reads images from the bottom left corner
         img = np.flipud(img)
@@ -26,26 +26,9 @@ class ImgConversionDM(ImgConversion):
             flatfield, h = read_tiff(flatfield)
         self.flatfield = flatfield
 
-        self.headers = {}
-        self.data = {}
-
         self.smv_subdrc = 'data'
 
-        while len(buffer) != 0:
-            i, img, h = buffer.pop(0)
-
-            self.headers[i] = h
-
-            if self.flatfield is not None:
-                self.data[i] = apply_flatfield_correction(img, self.flatfield)
-            else:
-                self.data[i] = img
-
-        self.observed_range = set(self.data.keys())
-        self.complete_range = set(range(min(self.observed_range), max(self.observed_range) + 1))
-        self.missing_range = self.observed_range ^ self.complete_range
-
-        self.data_shape = img.shape
+        self.load_buffer(buffer)
 
         self.pixelsize = pixelsize
         self.physical_pixelsize = physical_pixelsize
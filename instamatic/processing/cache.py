@@ -0,0 +1,242 @@
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+
+
+def file_digest(fn: str, chunksize: int = 2**20) -> str:
+    """Return the sha1 hex digest of the contents of file `fn`"""
+    h = hashlib.sha1()
+    with open(fn, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunksize), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def digest(*items) -> str:
+    """Return the sha1 hex digest of `items`. Arrays are hashed by their
+    dtype, shape and data, everything else by its `repr`."""
+    h = hashlib.sha1()
+    for item in items:
+        if isinstance(item, np.ndarray):
+            h.update(f'{item.dtype.str}{item.shape}'.encode())
+            h.update(np.ascontiguousarray(item).data)
+        else:
+            h.update(repr(item).encode())
+    return h.hexdigest()
+
+
+def _to_json(obj):
+    """Convert the numpy types in image headers for `json.dump`, anything
+    else that json does not handle (e.g. datetime) is stored as a
+    string."""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    elif isinstance(obj, np.generic):
+        return obj.item()
+    else:
+        return str(obj)
+
+
+def normalize_header(h: dict) -> dict:
+    """Return header `h` as it is read back from the cache index, so that
+    a header from the cache compares equal to a freshly read one."""
+    return json.loads(json.dumps(h, default=_to_json))
+
+
+class FrameBuffer(list):
+    """Image buffer for `ImgConversion` (list of (index, image, header)),
+    which also carries the beam centers that are already known for some
+    of the frames, so that they are not searched for again."""
+
+    def __init__(self, items=(), beam_centers: dict = None):
+        super().__init__(items)
+        self.beam_centers = beam_centers if beam_centers is not None else {}
+
+
+class ProcessingCache:
+    """Content-addressed cache to reprocess a dataset directory
+    incrementally.
+
+    The cache lives in a subdirectory `name` of the dataset directory, and
+    holds:
+
+    - the frames as they are handed to `ImgConversion` (`.npy`), keyed by
+      the checksum of the source file and a `tag` identifying how the
+      frame was read and corrected;
+    - the beam center of each frame, keyed by the frame and whether the
+      beamstop-aware method was used (`'<key>:<use_beamstop>'`);
+    - for every file written by `ImgConversion.threadpoolwriter`, the key
+      of its inputs (image data + header) and the checksum of its
+      contents.
+
+    On a re-run, frames are loaded from the cache if their source file is
+    unchanged, beam centers are only searched for new frames, and output
+    files are only rewritten if their inputs changed or the file on disk
+    was modified. Checksums of source and output files are trusted as long
+    as the size and modification time of the file are unchanged, set
+    `verify=True` to always recompute them.
+
+    The index is stored as json (`index.json`), so the headers of the
+    frames are passed through `normalize_header` (e.g. tuples become
+    lists).
+
+    Usage:
+        cache = ProcessingCache(drc)
+        buffer = cache.load_frames(image_fns, reader=read_tiff)
+        img_conv = ImgConversion(buffer, ...)
+        cache.update_beam_centers(img_conv)
+        img_conv.threadpoolwriter(smv_path=smv_path, cache=cache)
+        cache.save()
+    """
+
+    def __init__(self, drc: str, name: str = '.instamatic_cache', verify: bool = False):
+        self.drc = Path(drc)
+        self.path = self.drc / name
+        self.objects = self.path / 'objects'
+        self.index_fn = self.path / 'index.json'
+        self.verify = verify
+
+        self.index = self._load_index()
+
+        # frame index -> key of the frame in the cache
+        self.frame_keys = {}
+
+    def _load_index(self) -> dict:
+        index = {'version': CACHE_VERSION, 'checksums': {}, 'frames': {}, 'beam_centers': {}, 'outputs': {}}
+
+        try:
+            with open(self.index_fn) as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            return index
+        except Exception as e:
+            logger.warning(f'Could not read cache index {self.index_fn}, starting a new one ({e})')
+            return index
+
+        if stored.get('version') != CACHE_VERSION:
+            logger.info(f'Ignoring cache index {self.index_fn} (version {stored.get("version")})')
+            return index
+
+        index.update(stored)
+        return index
+
+    def save(self) -> None:
+        """Write the cache index to disk."""
+        self.path.mkdir(exist_ok=True, parents=True)
+
+        tmp = self.index_fn.with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(self.index, f, default=_to_json)
+        os.replace(tmp, self.index_fn)
+
+    def checksum(self, fn: str) -> str:
+        """Return the checksum of file `fn`, using the stored checksum if
+        the size and modification time of the file did not change."""
+        fn = Path(fn)
+        st = fn.stat()
+        stamp = [st.st_size, st.st_mtime_ns]
+
+        key = str(fn.resolve())
+        stored = self.index['checksums'].get(key)
+        if stored and stored[0] == stamp and not self.verify:
+            return stored[1]
+
+        checksum = file_digest(fn)
+        self.index['checksums'][key] = [stamp, checksum]
+        return checksum
+
+    def load_frames(self, fns: list, reader, index=None, tag: str = '', use_beamstop: bool = False) -> FrameBuffer:
+        """Read the frames from files `fns` into a buffer for
+        `ImgConversion`.
+
+        fns:
+            List of image files
+        reader:
+            Function that takes a filename and returns `(img, header)`.
+            It is only called for files that are not in the cache.
+        index:
+            Function that returns the frame number for a filename, defaults
+            to the position of the file in `fns` (starting at 1)
+        tag:
+            Identifies how the frames are read, change it to invalidate the
+            cached frames when the reader changes
+        use_beamstop:
+            Whether the beam centers are found with the beamstop-aware
+            method, only matching beam centers are reused
+
+        Returns a `FrameBuffer` with the known beam centers.
+        """
+        self.objects.mkdir(exist_ok=True, parents=True)
+
+        buffer = FrameBuffer()
+        n_cached = 0
+
+        for n, fn in enumerate(fns):
+            i = index(fn) if index else n + 1
+            key = digest(tag, self.checksum(fn))
+
+            entry = self.index['frames'].get(key)
+            obj = self.objects / f'{key}.npy'
+
+            if entry is not None and obj.exists():
+                img = np.load(obj, mmap_mode='r')
+                h = dict(entry['header'])
+                n_cached += 1
+            else:
+                img, h = reader(fn)
+                img = np.asarray(img)
+                h = normalize_header(h)
+                np.save(obj, img)
+                self.index['frames'][key] = {'header': dict(h)}
+
+            self.frame_keys[i] = key
+            buffer.append((i, img, h))
+
+            center = self.index['beam_centers'].get(f'{key}:{use_beamstop}')
+            if center is not None:
+                buffer.beam_centers[i] = tuple(center)
+
+        logger.info(f'Loaded {len(buffer)} frames from {self.drc}, {n_cached} from the cache')
+
+        return buffer
+
+    def update_beam_centers(self, img_conv) -> None:
+        """Store the beam centers found by `img_conv` for the frames loaded
+        with `load_frames`. They are not stored if a flatfield correction
+        was applied, because it is not part of the key of the frames."""
+        if img_conv.flatfield is not None:
+            return
+
+        for i, h in img_conv.headers.items():
+            key = self.frame_keys.get(i)
+            if key is not None and 'beam_center' in h:
+                self.index['beam_centers'][f'{key}:{img_conv.use_beamstop}'] = list(h['beam_center'])
+
+    def output_key(self, img, *inputs) -> str:
+        """Return the key of an output file written from `img` and any
+        other `inputs` (e.g. the header)."""
+        return digest(img, *inputs)
+
+    def is_current(self, fn: str, key: str) -> bool:
+        """Check whether file `fn` exists and was written from inputs with
+        `key`, and has not been modified since."""
+        stored = self.index['outputs'].get(str(Path(fn).resolve()))
+        if stored is None or stored[0] != key:
+            return False
+
+        try:
+            return self.checksum(fn) == stored[1]
+        except FileNotFoundError:
+            return False
+
+    def record(self, fn: str, key: str) -> None:
+        """Record that file `fn` was written from inputs with `key`."""
+        self.index['outputs'][str(Path(fn).resolve())] = [key, self.checksum(fn)]
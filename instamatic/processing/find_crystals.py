@@ -1,16 +1,11 @@
 import sys
+import time
 from collections import namedtuple
+from functools import lru_cache
 
-import matplotlib.pyplot as plt
 import numpy as np
-from scipy import ndimage
-from scipy._lib._util import _asarray_validated
-from scipy.cluster.vq import kmeans2
-from skimage import filters
-from skimage import measure
-from skimage import morphology
-from skimage import segmentation
 
+from instamatic import config
 from instamatic.config import calibration
 from instamatic.image_utils import autoscale
 
@@ -40,6 +35,8 @@ def isedge(prop):
 def whiten(obs, check_finite=False):
     """Adapted from c:/python27/lib/site-
     packages/skimage/filters/thresholding.py to return array and std_dev."""
+    from scipy._lib._util import _asarray_validated
+
     obs = _asarray_validated(obs, check_finite=check_finite)
     std_dev = np.std(obs, axis=0)
     zero_std_mask = std_dev == 0
@@ -49,7 +46,16 @@ def whiten(obs, check_finite=False):
     return obs / std_dev, std_dev
 
 
-def segment_crystals(img, r=101, offset=5, footprint=5, remove_carbon_lacing=True):
+@lru_cache(maxsize=None)
+def disk(radius: int) -> np.ndarray:
+    """Return the (cached) disk shaped structuring element with `radius`."""
+    from skimage import morphology
+    footprint = morphology.disk(radius).astype(bool)
+    footprint.setflags(write=False)
+    return footprint
+
+
+def segment_crystals(img, r=101, offset=5, footprint=5, remove_carbon_lacing=True, method=None, timings=None):
     """
     r: `int`
        blocksize to calculate local threshold value
@@ -58,7 +64,23 @@ def segment_crystals(img, r=101, offset=5, footprint=5, remove_carbon_lacing=Tru
     offset: `int`
     Constant subtracted from weighted mean of neighborhood to calculate
         the local threshold value
+    method: `str`
+        Segmentation of the pixels between the features and the background,
+        `random_walker` or `watershed` (faster). The default is taken from
+        `crystal_segmentation` in settings.yaml.
+    timings: `dict`
+        If given, the time (s) taken by each step is stored in this dict
     """
+    from scipy import ndimage
+    from skimage import filters
+    from skimage import morphology
+    from skimage import segmentation
+
+    if method is None:
+        method = config.settings.crystal_segmentation
+
+    t0 = time.perf_counter()
+
     # workaround, because segmentation.random_walker no longer accepts floats from 0-255.0
     offset = offset / 255.0
 
@@ -67,45 +89,70 @@ def segment_crystals(img, r=101, offset=5, footprint=5, remove_carbon_lacing=Tru
 
     # adaptive thresholding, because contrast is not equal over image
     arr = img > filters.threshold_local(img, r, method='mean', offset=offset)
-    arr = np.invert(arr)
+    arr = np.invert(arr, out=arr)
     # arr = morphology.binary_opening(arr, morphology.disk(3))
 
     arr = morphology.remove_small_objects(arr, min_size=4 * 4, connectivity=0)  # remove noise
 
-    # magic
-    arr = morphology.binary_closing(arr, morphology.disk(footprint))  # dilation + erosion
-    arr = morphology.binary_erosion(arr, morphology.disk(footprint))  # erosion
+    t1 = time.perf_counter()
+
+    # magic, the buffer `tmp` is reused for the intermediate results
+    # (same border handling as `skimage.morphology.binary_*`)
+    tmp = np.empty_like(arr)
+    ndimage.binary_dilation(arr, disk(footprint), output=tmp)  # dilation + erosion
+    ndimage.binary_erosion(tmp, disk(footprint), output=arr, border_value=1)
+    ndimage.binary_erosion(arr, disk(footprint), output=tmp, border_value=1)  # erosion
+    arr, tmp = tmp, arr
 
     # remove carbon lines
     if remove_carbon_lacing:
         arr = morphology.remove_small_objects(arr, min_size=8 * 8, connectivity=0)
-        arr = morphology.remove_small_holes(arr, min_size=32 * 32, connectivity=0)
-    arr = morphology.binary_dilation(arr, morphology.disk(footprint))  # dilation
+        arr = morphology.remove_small_holes(arr, area_threshold=32 * 32, connectivity=0)
+    ndimage.binary_dilation(arr, disk(footprint), output=tmp)  # dilation
+    arr, tmp = tmp, arr
 
     # get background pixels
-    bkg = np.invert(morphology.binary_dilation(arr, morphology.disk(footprint * 2)) | arr)
+    bkg = tmp
+    ndimage.binary_dilation(arr, disk(footprint * 2), output=bkg)
+    bkg |= arr
+    np.invert(bkg, out=bkg)
 
     # 2: features
     # 1: background
     # 0: unlabeled
     markers = arr * 2 + bkg
 
-    # segment using random_walker
-    segmented = segmentation.random_walker(img, markers, beta=50, spacing=(5, 5), mode='bf')
+    t2 = time.perf_counter()
+
+    if method == 'random_walker':
+        # segment using random_walker
+        segmented = segmentation.random_walker(img, markers, beta=50, spacing=(5, 5), mode='bf')
+    elif method == 'watershed':
+        # flood the unlabeled pixels from the markers along the gradient
+        segmented = segmentation.watershed(filters.sobel(img), markers)
+    else:
+        raise ValueError(f'Unknown segmentation method: {method!r}')
     segmented = segmented.astype(int) - 1
 
+    t3 = time.perf_counter()
+
+    if timings is not None:
+        timings['threshold'] = t1 - t0
+        timings['morphology'] = t2 - t1
+        timings['segmentation'] = t3 - t2
+
     return arr, segmented
 
 
 def find_crystals_timepix(img, magnification, spread=0.6, plot=False, **kwargs):
     """Specialized function with better defaults for timepix camera."""
-    r = kwargs.get('r', 75)
+    r = kwargs.pop('r', 75)
 
     # 'offset' determines sensitivity of thresholding
     #   higher = less sensitive to noise
     #   lower = more sensitive to noise
-    offset = kwargs.get('offset', 15)
-    footprint = kwargs.get('footprint', 3)
+    offset = kwargs.pop('offset', 15)
+    footprint = kwargs.pop('footprint', 3)
 
     return find_crystals(img=img,
                          magnification=magnification,
@@ -114,10 +161,11 @@ def find_crystals_timepix(img, magnification, spread=0.6, plot=False, **kwargs):
                          footprint=footprint,
                          offset=offset,
                          r=r,
-                         remove_carbon_lacing=False)
+                         remove_carbon_lacing=False,
+                         **kwargs)
 
 
-def find_crystals(img, magnification, spread=2.0, plot=False, **kwargs):
+def find_crystals(img, magnification, spread=2.0, plot=False, timings=None, **kwargs):
     """Function for finding crystals in a low contrast images. Used adaptive
     thresholds to find local features. Edges are detected, and rejected, on the
     basis of a histogram. Kmeans clustering is used to spread points over the
@@ -131,13 +179,24 @@ def find_crystals(img, magnification, spread=2.0, plot=False, **kwargs):
         Value in micrometer to roughly indicate the desired spread of centroids over individual regions
     plot: bool
         Whether to plot the results or not
+    timings: dict
+        If given, the time (s) taken by each step is stored in this dict
     **kwargs:
-    keywords to pass to segment_crystals
+    keywords to pass to segment_crystals, i.e. `method` to select the
+    segmentation engine
     """
+    from scipy import ndimage
+    from scipy.cluster.vq import kmeans2
+    from skimage import measure
+
+    t0 = time.perf_counter()
+
     img, scale = autoscale(img, maxdim=256)  # scale down for faster
 
     # segment the image, and find objects
-    arr, seg = segment_crystals(img, **kwargs)
+    arr, seg = segment_crystals(img, timings=timings, **kwargs)
+
+    t1 = time.perf_counter()
 
     labels, numlabels = ndimage.label(seg)
     props = measure.regionprops(labels, img)
@@ -179,7 +238,12 @@ def find_crystals(img, magnification, spread=2.0, plot=False, **kwargs):
             x, y = prop.centroid
             crystals.append(CrystalPosition(x / scale, y / scale, True, nclust, area, prop.area))
 
+    if timings is not None:
+        timings['clustering'] = time.perf_counter() - t1
+        timings['total'] = time.perf_counter() - t0
+
     if plot:
+        import matplotlib.pyplot as plt
         plt.imshow(img)
         plt.contour(seg, [0.5], linewidths=1.2, colors='yellow')
         if len(crystals) > 0:
@@ -2,12 +2,6 @@ import sys
 
 import matplotlib.pyplot as plt
 import numpy as np
-from scipy import ndimage
-from skimage import color
-from skimage import filters
-from skimage import measure
-from skimage import morphology
-from skimage import segmentation
 
 from instamatic.config import calibration
 from instamatic.image_utils import autoscale
@@ -17,6 +11,9 @@ plt.rcParams['image.cmap'] = 'gray'
 
 def plot_features(img, segmented):
     """Take image and plot segments on top of them."""
+    from scipy import ndimage
+    from skimage import color
+
     labels, numlabels = ndimage.label(segmented)
     image_label_overlay = color.label2rgb(labels, image=img, bg_label=0)
 
@@ -142,6 +139,12 @@ def find_holes(img, area=0, plot=True, fname=None, verbose=True, max_eccentricit
         props: list,
             list of props of the objects found
     """
+    from scipy import ndimage
+    from skimage import filters
+    from skimage import measure
+    from skimage import morphology
+    from skimage import segmentation
+
     otsu = filters.threshold_otsu(img)
     n = 0.25
     lower = otsu - (otsu - np.min(img)) * n
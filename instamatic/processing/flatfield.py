@@ -21,13 +21,41 @@ def apply_corrections(img, deadpixels=None):
     return img
 
 
+def deadpixel_kernel(deadpixels, shape: tuple, d: int = 1) -> (np.ndarray, np.ndarray):
+    """Precompute the neighbours used to replace the dead pixels in an image
+    with the given `shape`.
+
+    Returns the flat indices of the `(2d+1)**2` pixels around every dead
+    pixel (shape `(n, (2d+1)**2)`), and the weights to average them. Other
+    dead pixels and positions outside the image get a weight of 0.
+    """
+    deadpixels = np.asarray(deadpixels, dtype=int).reshape(-1, 2)
+    ny, nx = shape
+
+    offset = np.arange(-d, d + 1)
+    di, dj = np.meshgrid(offset, offset, indexing='ij')
+    i = deadpixels[:, 0, None] + di.ravel()
+    j = deadpixels[:, 1, None] + dj.ravel()
+
+    inside = (i >= 0) & (i < ny) & (j >= 0) & (j < nx)
+    index = np.clip(i, 0, ny - 1) * nx + np.clip(j, 0, nx - 1)
+
+    dead = np.zeros(ny * nx, dtype=bool)
+    dead[deadpixels[:, 0] * nx + deadpixels[:, 1]] = True
+
+    weights = (inside & ~dead[index]).astype(float)
+    count = weights.sum(axis=1, keepdims=True)
+    np.divide(weights, count, out=weights, where=count > 0)
+
+    return index, weights
+
+
 def remove_deadpixels(img, deadpixels, d=1):
     """Remove dead pixels from the images by replacing them with the average of
-    neighbouring pixels."""
-    d = 1
-    for (i, j) in deadpixels:
-        neighbours = img[i - d:i + d + 1, j - d:j + d + 1].flatten()
-        img[i, j] = np.mean(neighbours)
+    neighbouring pixels (excluding other dead pixels)."""
+    deadpixels = np.asarray(deadpixels, dtype=int).reshape(-1, 2)
+    index, weights = deadpixel_kernel(deadpixels, img.shape, d=d)
+    img[deadpixels[:, 0], deadpixels[:, 1]] = np.sum(np.take(img, index) * weights, axis=1)
     return img
 
 
@@ -56,7 +84,8 @@ def get_center_pixel_correction(img):
 
 
 def apply_flatfield_correction(img, flatfield, darkfield=None):
-    """Apply flatfield correction to image.
+    """Apply flatfield correction to image. To correct a series of images,
+    use `FlatfieldCorrector`, which precomputes the gain map.
 
     https://en.wikipedia.org/wiki/Flat-field_correction
     """
@@ -76,6 +105,86 @@ def apply_flatfield_correction(img, flatfield, darkfield=None):
     return ret
 
 
+class FlatfieldCorrector:
+    """Apply the flatfield/darkfield correction and remove dead pixels.
+
+    The gain map (`mean(flatfield - darkfield) / (flatfield - darkfield)`)
+    and the neighbours of the dead pixels are computed once, so that the
+    correction of a frame only takes a copy, a subtraction and a
+    multiplication, and can be done in place or into a preallocated
+    buffer.
+
+    flatfield: np.ndarray
+        Flatfield image (or path to a TIFF file)
+    darkfield: np.ndarray
+        Darkfield image (or path to a TIFF file), optional
+    deadpixels: np.ndarray
+        Coordinates of the dead pixels as `(n, 2)` array. If set to `None`,
+        they are read from the header of the flatfield (if available).
+    dtype:
+        Data type of the corrected images
+    """
+
+    def __init__(self, flatfield, darkfield=None, deadpixels=None, dtype=np.float32):
+        super().__init__()
+
+        if isinstance(flatfield, (str, Path)):
+            flatfield, h = read_tiff(flatfield)
+            if deadpixels is None:
+                deadpixels = h.get('deadpixels')
+        if isinstance(darkfield, (str, Path)):
+            darkfield, _ = read_tiff(darkfield)
+
+        self.dtype = np.dtype(dtype)
+        self.shape = flatfield.shape
+
+        response = np.asarray(flatfield, dtype=np.float64)
+        if darkfield is None:
+            self.darkfield = None
+        else:
+            self.darkfield = np.asarray(darkfield, dtype=self.dtype)
+            response = response - darkfield
+
+        # leave pixels without response in the flatfield uncorrected
+        gain = np.ones(self.shape)
+        np.divide(np.mean(response), response, out=gain, where=response != 0)
+        self.gain = gain.astype(self.dtype)
+
+        if deadpixels is not None and len(deadpixels) > 0:
+            self.deadpixels = np.asarray(deadpixels, dtype=int).reshape(-1, 2)
+            self._deadpixel_index, self._deadpixel_weights = deadpixel_kernel(self.deadpixels, self.shape)
+        else:
+            self.deadpixels = None
+
+    def __call__(self, img: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        """Return the corrected image.
+
+        If `out` is given, the result is written to it (use `out=img` to
+        correct a float image in place), otherwise a new array is
+        allocated. Images that do not match the shape of the flatfield are
+        returned unchanged.
+        """
+        if img.shape != self.shape:
+            msg = f'Flatfield not applied: image {img.shape} and flatfield {self.shape} do not match shapes.'
+            warnings.warn(msg)
+            return img
+
+        if out is None:
+            out = np.empty(self.shape, dtype=self.dtype)
+        if out is not img:
+            np.copyto(out, img, casting='unsafe')
+
+        if self.deadpixels is not None:
+            i, j = self.deadpixels.T
+            out[i, j] = np.sum(np.take(out, self._deadpixel_index) * self._deadpixel_weights, axis=1)
+
+        if self.darkfield is not None:
+            np.subtract(out, self.darkfield, out=out, casting='unsafe')
+        np.multiply(out, self.gain, out=out, casting='unsafe')
+
+        return out
+
+
 def collect_flatfield(ctrl=None, frames=100, save_images=False, collect_darkfield=True, drc='.', **kwargs):
     """Routine to collect flatfield correction files.
 
@@ -222,11 +331,13 @@ This will apply the flatfield correction (`-f`) and optionally the darkfield cor
     drc = Path(options.drc)
     drc.mkdir(exist_ok=True, parents=True)
 
+    corrector = FlatfieldCorrector(flatfield, darkfield=darkfield)
+
     for f in args:
         img, h = read_tiff(f)
 
         img = apply_corrections(img, deadpixels=deadpixels)
-        img = apply_flatfield_correction(img, flatfield, darkfield=darkfield)
+        img = corrector(img)
 
         name = Path(f).name
         fout = drc / name
@@ -0,0 +1,167 @@
+import logging
+import queue
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from instamatic.formats import read_tiff
+from instamatic.processing.flatfield import FlatfieldCorrector
+from instamatic.processing.ImgConversion import write_frame
+from instamatic.telemetry import DEPTH_BUCKETS
+from instamatic.telemetry import metrics
+from instamatic.tools import find_beam_center
+from instamatic.tools import find_beam_center_with_beamstop
+
+logger = logging.getLogger(__name__)
+
+
+class StreamWriter:
+    """Write diffraction frames to disk while they are being collected.
+
+    Frames are passed to `put` and placed on a bounded queue. A pool of
+    worker threads applies the flatfield correction, determines the beam
+    center, and writes the frame as TIFF/SMV/MRC. Only the headers are
+    kept in memory, so memory use does not grow with the length of the
+    rotation. If the workers cannot keep up, `put` blocks until there is
+    room on the queue. The queue depth, the time `put` blocked and the
+    time to process a frame are recorded in `instamatic.telemetry.metrics`.
+
+    The SMV files are written with a provisional header, because the
+    oscillation angle and mean beam center are only known at the end of
+    the data collection. Pass the writer as the buffer to `ImgConversion`
+    and use `ImgConversion.write_smv_headers` to finalize them.
+
+    tiff_path, smv_path, mrc_path:
+        If a path is given, write data in the corresponding format
+    flatfield:
+        Path to flatfield correction image (or the image as numpy array)
+    use_beamstop:
+        Use the beamstop-aware beam center finder
+    smv_subdrc:
+        Subdirectory of `smv_path` where the SMV files are written
+    workers:
+        Number of writer threads
+    maxsize:
+        Maximum number of frames waiting in the queue
+    """
+
+    def __init__(self,
+                 tiff_path: str = None,
+                 smv_path: str = None,
+                 mrc_path: str = None,
+                 flatfield: str = None,
+                 use_beamstop: bool = False,
+                 smv_subdrc: str = 'data',
+                 workers: int = 2,
+                 maxsize: int = 16,
+                 ):
+        super().__init__()
+
+        if isinstance(flatfield, (str, Path)):
+            flatfield, _ = read_tiff(flatfield)
+        self.flatfield = flatfield
+        self.corrector = FlatfieldCorrector(flatfield) if flatfield is not None else None
+        self.use_beamstop = use_beamstop
+
+        self.tiff_path = Path(tiff_path) if tiff_path else None
+        self.mrc_path = Path(mrc_path) if mrc_path else None
+        self.smv_path = Path(smv_path) / smv_subdrc if smv_path else None
+
+        for path in (self.tiff_path, self.mrc_path, self.smv_path):
+            if path:
+                path.mkdir(exist_ok=True, parents=True)
+
+        self.headers = {}
+        self.data_shape = None
+
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._exception = None
+        self._threads = [threading.Thread(target=self._worker, name=f'StreamWriter-{n}', daemon=True)
+                         for n in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def __len__(self):
+        return len(self.headers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        self.close()
+
+    def put(self, i: int, img: np.ndarray, h: dict) -> None:
+        """Queue image `img` with sequence number `i` and header `h` for
+        writing, blocks if the queue is full."""
+        if self._exception:
+            raise self._exception
+
+        depth = self._queue.qsize()
+        metrics.set('stream_writer_queue_depth', depth)
+        metrics.observe('stream_writer_queue_depth_distribution', depth, buckets=DEPTH_BUCKETS)
+
+        with metrics.timer('stream_writer_put_seconds'):
+            self._queue.put((i, img, h))
+
+    def qsize(self) -> int:
+        """Return the number of frames waiting to be written."""
+        return self._queue.qsize()
+
+    def close(self) -> None:
+        """Wait for all queued frames to be written and stop the workers."""
+        for thread in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+        if self._exception:
+            raise self._exception
+
+        logger.debug(f'StreamWriter: {len(self.headers)} frames written')
+
+    def _worker(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            t0 = time.perf_counter()
+            try:
+                self.process(*item)
+            except Exception as e:
+                logger.exception(e)
+                self._exception = e
+            metrics.observe('stream_writer_process_seconds', time.perf_counter() - t0)
+
+    def process(self, i: int, img: np.ndarray, h: dict) -> None:
+        """Correct the image with sequence number `i` and write it to all
+        formats."""
+        if self.corrector is not None:
+            img = self.corrector(img)
+
+        if self.use_beamstop:
+            cx, cy = find_beam_center_with_beamstop(img, z=99)
+        else:
+            cx, cy = find_beam_center(img, sigma=10)
+        h['beam_center'] = (cx, cy)
+
+        # PETS/RED/XDS all read 16 bit unsigned integers
+        write_frame(i, img,
+                    tiff_path=self.tiff_path,
+                    smv_path=self.smv_path,
+                    mrc_path=self.mrc_path,
+                    header=h,
+                    smv_header={'HEADER_BYTES': 512,
+                                'DIM': 2,
+                                'BYTE_ORDER': 'little_endian',
+                                'TYPE': 'unsigned_short',
+                                'SIZE1': img.shape[0],
+                                'SIZE2': img.shape[1]})
+
+        with self._lock:
+            self.headers[i] = h
+            self.data_shape = img.shape
@@ -1,14 +1,7 @@
 import math
 import sys
 
-import matplotlib.pyplot as plt
 import numpy as np
-from matplotlib.widgets import Slider
-from scipy.ndimage import interpolation
-from scipy.ndimage import morphology
-from skimage.feature import canny
-from skimage.measure import label
-from skimage.measure import regionprops
 
 from instamatic.formats import read_tiff
 from instamatic.image_utils import autoscale
@@ -19,6 +12,8 @@ def apply_transform_to_image(img, transform, center=None):
     http://docs.sunpy.org/en/stable/_modules/sunpy/image/transform.html
     http://stackoverflow.com/q/20161175."""
 
+    from scipy.ndimage import interpolation
+
     if center is None:
         center = (np.array(img.shape)[::-1] - 1) / 2.0
     # shift = (center - center.dot(transform)).dot(np.linalg.inv(transform))
@@ -102,6 +97,10 @@ def make_title(prop):
 def get_sigma_interactive(img, sigma=20):
     """Interactive function to get the sigma threshold value for the edge
     detection."""
+    import matplotlib.pyplot as plt
+    from matplotlib.widgets import Slider
+    from skimage.feature import canny
+
     edges = canny(img, sigma=sigma, low_threshold=None, high_threshold=None)
 
     fig, ax = plt.subplots()
@@ -147,6 +146,8 @@ def get_sigma_interactive(img, sigma=20):
 
 def plot_props(edges, props):
     """Plot the ring structures."""
+    import matplotlib.pyplot as plt
+
     plt.imshow(edges)
     for prop in props:
         print('centroid = ({:.2f}, {:.2f})'.format(*prop.centroid))
@@ -176,6 +177,10 @@ def plot_props(edges, props):
 
 def get_ring_props(edges):
     """Get the rings with low eccentricity from the edge structures."""
+    from scipy.ndimage import morphology
+    from skimage.measure import label
+    from skimage.measure import regionprops
+
     # label edges
     labeled = label(edges)
 
@@ -214,6 +219,8 @@ Program to determine the stretch correction from a series of powder diffraction
     options = parser.parse_args()
     args = options.args
 
+    from skimage.feature import canny
+
     fname = args[0]
     img, h = read_tiff(fname)
 
@@ -8,6 +8,10 @@ import traceback
 
 import numpy as np
 
+from .framing import array_header
+from .framing import recv_frame
+from .framing import send_array
+from .framing import send_frame
 from .serializer import dumper
 from .serializer import loader
 from instamatic import config
@@ -92,6 +96,7 @@ class CamServer(threading.Thread):
                 attr_name = cmd['attr_name']
                 args = cmd.get('args', ())
                 kwargs = cmd.get('kwargs', {})
+                use_shared_memory = self.use_shared_memory and cmd.get('shared_memory', True)
 
                 try:
                     ret = self.evaluate(attr_name, args, kwargs)
@@ -103,7 +108,7 @@ class CamServer(threading.Thread):
                     ret = (e.__class__.__name__, e.args)
                     status = 500
                 else:
-                    if self.use_shared_memory:
+                    if use_shared_memory:
                         if attr_name == 'getImage':
                             self.copy_data_to_shared_buffer(ret)
                             ret = {
@@ -143,10 +148,15 @@ class CamServer(threading.Thread):
 
 def handle(conn, q):
     """Handle incoming connection, put command on the Queue `q`, which is then
-    handled by TEMServer."""
+    handled by CamServer.
+
+    Image data (numpy arrays) are not serialized, but sent as a small
+    header (status, dtype/shape) followed by the raw data in a separate
+    frame (see `instamatic.server.framing`).
+    """
     with conn:
         while True:
-            data = conn.recv(BUFSIZE)
+            data = recv_frame(conn)
             if not data:
                 break
 
@@ -162,7 +172,13 @@ def handle(conn, q):
                 q.put(data)
                 condition.wait()
                 response = box.pop()
-                conn.sendall(dumper(response))
+
+            status, ret = response
+            if isinstance(ret, np.ndarray):
+                send_frame(conn, dumper((status, array_header(ret))))
+                send_array(conn, ret)
+            else:
+                send_frame(conn, dumper(response))
 
 
 def main():
@@ -180,8 +196,9 @@ The data sent over the socket is a pickled dictionary with the following element
 - `attr_name`: Name of the function to call or attribute to return (str)
 - `args`: (Optional) List of arguments for the function (list)
 - `kwargs`: (Optiona) Dictionary of keyword arguments for the function (dict)
+- `shared_memory`: (Optional) Whether the client can read images from shared memory (bool)
 
-The response is returned as a pickle object.
+The response is returned as a pickle object. Every message is prefixed with its length (8 bytes, big-endian). Images are returned as a header with the dtype and shape, followed by the raw image data as a separate message.
 """
 
     parser = argparse.ArgumentParser(
@@ -0,0 +1,96 @@
+"""Length-prefixed message framing for the server sockets.
+
+Every message is sent as a frame, an 8-byte big-endian length followed by
+the payload. This makes sure that the receiving side always reads complete
+messages, regardless of how the data are split up by the socket.
+
+Image data are sent as raw bytes in a separate frame following a small
+header with the dtype and shape (see `send_array`/`recv_array`), so that
+they do not have to be pickled, and can be received directly into a
+(preallocated) numpy array using `recv_into`.
+"""
+import socket
+import struct
+
+import numpy as np
+
+
+PREFIX = struct.Struct('!Q')
+ARRAY_KEY = '__ndarray__'
+
+
+def recv_exactly_into(sock: socket.socket, view: memoryview) -> None:
+    """Fill `view` with data from `sock`, blocks until all bytes are
+    received."""
+    nbytes = len(view)
+    received = 0
+    while received < nbytes:
+        n = sock.recv_into(view[received:], nbytes - received)
+        if n == 0:
+            raise ConnectionError('Connection closed while receiving data')
+        received += n
+
+
+def send_frame(sock: socket.socket, payload: bytes) -> None:
+    """Send `payload` as a single frame."""
+    sock.sendall(PREFIX.pack(len(payload)) + payload)
+
+
+def recv_frame(sock: socket.socket) -> bytes:
+    """Receive a single frame, returns an empty `bytes` object if the
+    connection was closed."""
+    prefix = bytearray(PREFIX.size)
+    try:
+        recv_exactly_into(sock, memoryview(prefix))
+    except ConnectionError:
+        return b''
+
+    size, = PREFIX.unpack(prefix)
+    payload = bytearray(size)
+    recv_exactly_into(sock, memoryview(payload))
+
+    return bytes(payload)
+
+
+def array_header(arr: np.ndarray) -> dict:
+    """Return the header needed to reconstruct `arr` on the receiving
+    side."""
+    return {ARRAY_KEY: True, 'shape': arr.shape, 'dtype': arr.dtype.str}
+
+
+def is_array_header(data) -> bool:
+    """Check if `data` announces a raw array frame (see `array_header`)."""
+    return isinstance(data, dict) and data.get(ARRAY_KEY, False)
+
+
+def send_array(sock: socket.socket, arr: np.ndarray) -> None:
+    """Send the data of `arr` as a raw frame without copying (unless the
+    array is not contiguous)."""
+    arr = np.ascontiguousarray(arr)
+    sock.sendall(PREFIX.pack(arr.nbytes))
+    sock.sendall(memoryview(arr).cast('B'))
+
+
+def recv_array(sock: socket.socket, shape: tuple, dtype: str, out: np.ndarray = None, **kwargs) -> np.ndarray:
+    """Receive a raw array frame with the given `shape`/`dtype` (see
+    `array_header`).
+
+    If `out` is given (and matches shape and dtype), the data are
+    received directly into it, otherwise a new array is allocated.
+    """
+    dtype = np.dtype(dtype)
+    shape = tuple(shape)
+
+    if out is None or out.shape != shape or out.dtype != dtype:
+        out = np.empty(shape, dtype=dtype)
+
+    prefix = bytearray(PREFIX.size)
+    recv_exactly_into(sock, memoryview(prefix))
+    size, = PREFIX.unpack(prefix)
+
+    if size != out.nbytes:
+        raise ConnectionError(f'Unexpected array size: {size} bytes, expected {out.nbytes} bytes')
+
+    recv_exactly_into(sock, memoryview(out).cast('B'))
+
+    return out
@@ -7,17 +7,43 @@ import socket
 import threading
 import traceback
 
+from .framing import recv_frame
+from .framing import send_frame
 from .serializer import dumper
 from .serializer import loader
 from instamatic import config
 from instamatic.TEMController import Microscope
 
-condition = threading.Condition()
-box = []
-
 HOST = config.settings.tem_server_host
 PORT = config.settings.tem_server_port
-BUFSIZE = 1024
+
+
+def init_com() -> None:
+    """Join the multithreaded COM apartment in which the JEOL/FEI
+    interfaces are created (see `JeolMicroscope.__init__`), so that they
+    can be called from a worker thread."""
+    try:
+        import comtypes
+    except ImportError:
+        return  # not on Windows, or a simulated microscope
+
+    try:
+        comtypes.CoInitializeEx(comtypes.COINIT_MULTITHREADED)
+    except OSError:
+        pass
+
+
+def subsystem(func_name: str) -> str:
+    """Return the subsystem that function `func_name` talks to.
+
+    Calls to the same subsystem are executed in the order they were
+    received, calls to different subsystems may run concurrently. This
+    way, a blocking stage movement does not hold up reading the lenses.
+    """
+    if 'Stage' in func_name or 'Rotation' in func_name:
+        return 'stage'
+    else:
+        return 'default'
 
 
 class TemServer(threading.Thread):
@@ -28,6 +54,11 @@ class TemServer(threading.Thread):
     microscope. Start the server using `TemServer.run` which will wait
     for items to appear on `q` and execute them on the specified
     microscope instance.
+
+    Items on `q` are tuples of the command and a callback `reply`, which
+    is called with `(status, ret)` when the command has been evaluated.
+    The commands are passed on to one worker thread per subsystem (see
+    `subsystem`).
     """
 
     def __init__(self, log=None, q=None, name=None):
@@ -46,30 +77,45 @@ class TemServer(threading.Thread):
         self.tem = Microscope(name=self._name, use_server=False)
         print(f'Initialized connection to microscope: {self.tem.name}')
 
+        workers = {}
+
         while True:
+            cmd, reply = self.q.get()
+
+            key = subsystem(cmd['func_name'])
+            if key not in workers:
+                workers[key] = queue.Queue()
+                threading.Thread(target=self.worker, args=(workers[key],), name=f'TemServer-{key}', daemon=True).start()
+
+            workers[key].put((cmd, reply))
+
+    def worker(self, q):
+        """Evaluate the commands on `q` in order."""
+        init_com()
+
+        while True:
+            cmd, reply = q.get()
+
             now = datetime.datetime.now().strftime('%H:%M:%S.%f')
 
-            cmd = self.q.get()
+            func_name = cmd['func_name']
+            args = cmd.get('args', ())
+            kwargs = cmd.get('kwargs', {})
 
-            with condition:
-                func_name = cmd['func_name']
-                args = cmd.get('args', ())
-                kwargs = cmd.get('kwargs', {})
+            try:
+                ret = self.evaluate(func_name, args, kwargs)
+                status = 200
+            except Exception as e:
+                traceback.print_exc()
+                if self.log:
+                    self.log.exception(e)
+                ret = (e.__class__.__name__, e.args)
+                status = 500
 
-                try:
-                    ret = self.evaluate(func_name, args, kwargs)
-                    status = 200
-                except Exception as e:
-                    traceback.print_exc()
-                    if self.log:
-                        self.log.exception(e)
-                    ret = (e.__class__.__name__, e.args)
-                    status = 500
-
-                box.append((status, ret))
-                condition.notify()
-                if self.verbose:
-                    print(f'{now} | {status} {func_name}: {ret}')
+            reply((status, ret))
+
+            if self.verbose:
+                print(f'{now} | {status} {func_name}: {ret}')
 
     def evaluate(self, func_name: str, args: list, kwargs: dict):
         """Evaluate the function `func_name` on `self.tem` and call it with
@@ -82,10 +128,28 @@ class TemServer(threading.Thread):
 
 def handle(conn, q):
     """Handle incoming connection, put command on the Queue `q`, which is then
-    handled by TEMServer."""
+    handled by TEMServer.
+
+    Every command carries a request `id`, which is sent back with the
+    response. The client does not have to wait for a response before
+    sending the next command, so several calls can be in flight at the
+    same time. Responses may arrive out of order if the commands were for
+    different subsystems.
+    """
+    lock = threading.Lock()
+
+    def make_reply(request_id):
+        def reply(response):
+            with lock:
+                try:
+                    send_frame(conn, dumper((request_id, *response)))
+                except OSError:
+                    pass  # client disconnected
+        return reply
+
     with conn:
         while True:
-            data = conn.recv(BUFSIZE)
+            data = recv_frame(conn)
             if not data:
                 break
 
@@ -97,11 +161,7 @@ def handle(conn, q):
             if data == 'kill':
                 break
 
-            with condition:
-                q.put(data)
-                condition.wait()
-                response = box.pop()
-                conn.send(dumper(response))
+            q.put((data, make_reply(data.get('id'))))
 
 
 def main():
@@ -122,11 +182,12 @@ The host and port are defined in `config/settings.yaml`.
 
 The data sent over the socket is a serialized dictionary with the following elements:
 
+- `id`: Request id that is returned with the response (int)
 - `func_name`: Name of the function to call (str)
 - `args`: (Optional) List of arguments for the function (list)
 - `kwargs`: (Optiona) Dictionary of keyword arguments for the function (dict)
 
-The response is returned as a serialized object.
+Every message is sent as a frame prefixed with its length (8 bytes, big-endian). The response is returned as a serialized tuple `(id, status, data)`. Several requests may be in flight at the same time; calls to the same subsystem (e.g. the stage) are executed in order.
 """
 
     parser = argparse.ArgumentParser(
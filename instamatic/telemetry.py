@@ -0,0 +1,330 @@
+"""Timing metrics for the data collection pipeline.
+
+Latencies of the camera, the TEM/camera server calls and the data writers
+are recorded in `metrics`, a process-wide registry of counters, gauges and
+histograms. They can be served in the Prometheus text format over HTTP
+(`metrics.serve`, or set `metrics_port` in `settings.yaml`), and the
+experiments write per-frame timings and a summary to a JSON-lines file in
+the experiment directory with `ExperimentTelemetry`.
+
+Usage:
+    from instamatic.telemetry import metrics
+
+    with metrics.timer('camera_get_image_seconds', camera='simulate'):
+        img = cam.getImage()
+
+    metrics.inc('skipped_frames_total', experiment='cred')
+    print(metrics.to_prometheus())
+"""
+import bisect
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+# seconds, from 0.5 ms (TEM server call) to 10 s (long exposure)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, math.inf)
+# number of items waiting in a queue
+DEPTH_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, math.inf)
+
+
+class Histogram:
+    """Counts observations in buckets with the given upper bounds, like a
+    Prometheus histogram."""
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        super().__init__()
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else math.nan
+
+    def quantile(self, q: float) -> float:
+        """Estimate quantile `q` (0-1) by linear interpolation within the
+        bucket, as `histogram_quantile` in Prometheus does."""
+        if not self.count:
+            return math.nan
+
+        rank = q * self.count
+        cumulative = 0
+        for i, n in enumerate(self.counts):
+            if cumulative + n >= rank and n > 0:
+                upper = min(self.buckets[i], self.max)
+                lower = max(self.buckets[i - 1] if i > 0 else 0.0, self.min)
+                return lower + (upper - lower) * (rank - cumulative) / n
+            cumulative += n
+        return self.max
+
+    def as_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+            'mean': self.mean if self.count else None,
+            'p50': self.quantile(0.5) if self.count else None,
+            'p99': self.quantile(0.99) if self.count else None,
+        }
+
+
+def _key(name: str, labels: dict) -> tuple:
+    return name, tuple(sorted(labels.items()))
+
+
+def _format_labels(labels: tuple, **extra) -> str:
+    items = [f'{k}="{v}"' for k, v in labels] + [f'{k}="{v}"' for k, v in extra.items()]
+    return '{' + ','.join(items) + '}' if items else ''
+
+
+class Metrics:
+    """Registry of counters, gauges and histograms, identified by a name
+    and labels. All methods are thread-safe.
+
+    Registries that are attached with `attach` receive a copy of every
+    update, e.g. to collect the metrics of a single experiment.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self._children = ()
+        self._server = None
+
+    def attach(self, registry: 'Metrics') -> None:
+        """Forward all updates from now on to `registry` as well."""
+        with self._lock:
+            self._children += (registry,)
+
+    def detach(self, registry: 'Metrics') -> None:
+        """Stop forwarding updates to `registry`."""
+        with self._lock:
+            self._children = tuple(child for child in self._children if child is not registry)
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """Increase counter `name` by `value`."""
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+        for child in self._children:
+            child.inc(name, value, **labels)
+
+    def set(self, name: str, value: float, **labels) -> None:
+        """Set gauge `name` to `value`."""
+        with self._lock:
+            self.gauges[_key(name, labels)] = value
+        for child in self._children:
+            child.set(name, value, **labels)
+
+    def observe(self, name: str, value: float, buckets: tuple = LATENCY_BUCKETS, **labels) -> None:
+        """Add `value` to histogram `name`."""
+        key = _key(name, labels)
+        with self._lock:
+            try:
+                hist = self.histograms[key]
+            except KeyError:
+                hist = self.histograms[key] = Histogram(buckets)
+            hist.observe(value)
+        for child in self._children:
+            child.observe(name, value, buckets=buckets, **labels)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Context manager that adds the time spent in the block to
+        histogram `name`."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0, **labels)
+
+    def reset(self) -> None:
+        """Remove all metrics."""
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+
+    def snapshot(self) -> dict:
+        """Return the current values as a dict that can be serialized to
+        JSON, metrics with labels are named `name{label="value"}`."""
+        with self._lock:
+            return {
+                'counters': {name + _format_labels(labels): v for (name, labels), v in self.counters.items()},
+                'gauges': {name + _format_labels(labels): v for (name, labels), v in self.gauges.items()},
+                'histograms': {name + _format_labels(labels): h.as_dict() for (name, labels), h in self.histograms.items()},
+            }
+
+    def to_prometheus(self) -> str:
+        """Return the metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+            for (name, labels), value in sorted(self.gauges.items()):
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+            for (name, labels), hist in sorted(self.histograms.items(), key=lambda item: item[0]):
+                cumulative = 0
+                for bound, n in zip(hist.buckets, hist.counts):
+                    cumulative += n
+                    le = '+Inf' if bound == math.inf else repr(bound)
+                    lines.append(f'{name}_bucket{_format_labels(labels, le=le)} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {hist.sum}')
+                lines.append(f'{name}_count{_format_labels(labels)} {hist.count}')
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port: int, host: str = 'localhost') -> None:
+        """Serve the metrics at `http://host:port/metrics` from a
+        background thread."""
+        if self._server is not None:
+            return
+
+        from http.server import BaseHTTPRequestHandler
+        from http.server import ThreadingHTTPServer
+
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = registry.to_prometheus().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        thread = threading.Thread(target=self._server.serve_forever, name='metrics', daemon=True)
+        thread.start()
+
+    def shutdown(self) -> None:
+        """Stop serving the metrics."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+metrics = Metrics()
+
+
+class ExperimentTelemetry:
+    """Record the timing of every frame of an experiment to the JSON-lines
+    file `fn`.
+
+    Each call to `frame` writes a line with the frame number, the time
+    since the start and since the previous frame, and adds the interval to
+    the `frame_interval_seconds` histogram. If the frames are timed by the
+    camera, pass their time stamps as `t` instead. `skipped` counts frames that
+    were not collected. `close` writes a summary with the frame rate, the
+    jitter (standard deviation of the intervals) and the metrics recorded
+    between the start and the end of the experiment (in `self.metrics`,
+    which is attached to the global `metrics`), so that the camera, TEM
+    server and writer latencies can be compared between experiments.
+
+    Usage:
+        with ExperimentTelemetry(path / 'metrics.jsonl', experiment='cred') as telemetry:
+            for i in frames:
+                img, h = ctrl.get_image()
+                telemetry.frame(i)
+    """
+
+    def __init__(self, fn: str, experiment: str):
+        super().__init__()
+        self.fn = Path(fn)
+        self.experiment = experiment
+        self.fn.parent.mkdir(parents=True, exist_ok=True)
+        self._f = open(self.fn, 'w')
+
+        self.nframes = 0
+        self.nskipped = 0
+        self._intervals = Histogram()
+        self._sum_sq = 0.0
+
+        self.metrics = Metrics()
+        metrics.attach(self.metrics)
+
+        self.t0 = time.perf_counter()
+        self.t_last = None
+        self._write({'event': 'start', 'experiment': experiment, 'time': time.time()})
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        self.close()
+
+    def _write(self, dct: dict) -> None:
+        self._f.write(json.dumps(dct) + '\n')
+
+    def frame(self, i: int, kind: str = 'diff', t: float = None, **fields) -> None:
+        """Record that frame `i` was collected at time `t` (s, on the
+        `time.perf_counter` clock, default: now). `kind` distinguishes
+        diffraction frames from (defocused) images, additional `fields`
+        are written to the line as they are."""
+        if t is None:
+            t = time.perf_counter()
+        dt = t - self.t_last if self.t_last is not None else None
+        self.t_last = t
+
+        self.nframes += 1
+        if dt is not None:
+            self._intervals.observe(dt)
+            self._sum_sq += dt * dt
+            metrics.observe('frame_interval_seconds', dt, experiment=self.experiment, kind=kind)
+
+        self._write({'event': 'frame', 'i': i, 'kind': kind, 't': t - self.t0, 'dt': dt, **fields})
+
+    def skipped(self, i: int, n: int = 1, reason: str = '') -> None:
+        """Record that `n` frames were skipped after frame `i`."""
+        self.nskipped += n
+        metrics.inc('skipped_frames_total', n, experiment=self.experiment)
+        self._write({'event': 'skipped', 'i': i, 'n': n, 'reason': reason, 't': time.perf_counter() - self.t0})
+
+    def summary(self) -> dict:
+        """Return the frame rate and jitter of the frames so far."""
+        hist = self._intervals
+        if hist.count:
+            fps = 1 / hist.mean if hist.sum else None
+            jitter = math.sqrt(max(self._sum_sq / hist.count - hist.mean ** 2, 0))
+        else:
+            fps = jitter = None
+        return {
+            'frames': self.nframes,
+            'skipped': self.nskipped,
+            'elapsed': self.t_last - self.t0 if self.t_last is not None else 0.0,
+            'fps': fps,
+            'interval': hist.as_dict(),
+            'jitter': jitter,
+        }
+
+    def close(self) -> None:
+        """Write the summary and close the file."""
+        if self._f.closed:
+            return
+        metrics.detach(self.metrics)
+        self._write({'event': 'summary', 'experiment': self.experiment, **self.summary(), 'metrics': self.metrics.snapshot()})
+        self._f.close()
@@ -4,10 +4,6 @@ import sys
 from pathlib import Path
 
 import numpy as np
-from scipy import interpolate
-from scipy import ndimage
-from skimage import exposure
-from skimage.measure import regionprops
 
 
 def prepare_grid_coordinates(nx: int, ny: int, stepsize: float = 1.0) -> 'np.array':
@@ -91,6 +87,9 @@ def find_peak_max(arr: np.ndarray, sigma: int, m: int = 50, w: int = 10, kind: i
     interpolate the pattern to get the peak maximum position with
     subpixel precision.
     """
+    from scipy import interpolate
+    from scipy import ndimage
+
     y1 = ndimage.filters.gaussian_filter1d(arr, sigma)
     c1 = np.argmax(y1)  # initial guess for beam center
 
@@ -108,6 +107,39 @@ def find_peak_max(arr: np.ndarray, sigma: int, m: int = 50, w: int = 10, kind: i
     return c2 + c1 - w
 
 
+def find_peak_max_stack(arr: np.ndarray, sigma: int, m: int = 50, w: int = 10, kind: int = 3) -> np.ndarray:
+    """Vectorised version of `find_peak_max` for a stack of 1D patterns
+    `arr` with shape `(n, length)`, returns an array with `n` peak
+    positions.
+
+    The interpolation on the window around the initial guess is a linear
+    operation on the window, so it is precomputed once as a matrix and
+    applied to all patterns with a single matrix product.
+    """
+    from scipy import interpolate
+    from scipy import ndimage
+
+    arr = np.asarray(arr)
+    y1 = ndimage.gaussian_filter1d(arr, sigma, axis=-1)
+    c1 = np.argmax(y1, axis=-1)  # initial guesses for beam center
+
+    win_len = 2 * w + 1
+    length = y1.shape[-1]
+
+    r1 = np.linspace(0, 2 * w, win_len)
+    r2 = np.linspace(0, 2 * w, win_len * m)
+    interp = interpolate.make_interp_spline(r1, np.eye(win_len), k=kind, axis=0)(r2)
+
+    window = c1[:, None] + np.arange(-w, w + 1)
+    window = np.clip(window, 0, length - 1)
+    y2 = np.take_along_axis(y1, window, axis=-1).astype(float) @ interp.T
+    c2 = np.argmax(y2, axis=-1) / m  # find beam center with `m` precision
+
+    # if c1 is too close to the edges, return initial guess
+    edge = (c1 - w < 0) | (c1 + w + 1 > length)
+    return np.where(edge, c1, c2 + c1 - w)
+
+
 def find_beam_center(img: np.ndarray, sigma: int = 30, m: int = 100, kind: int = 3) -> (float, float):
     """Find the center of the primary beam in the image `img` The position is
     determined by summing along X/Y directions and finding the position along
@@ -141,6 +173,8 @@ def find_beam_center_with_beamstop(img, z: int = None, method='thresh', plot=Fal
     z = thresh: percentile to segment the image at (99)
         gauss: standard deviation for the gaussian blurring (50)
     """
+    from scipy import ndimage
+    from skimage.measure import regionprops
 
     if method == 'gauss':
         if not z:
@@ -185,6 +219,53 @@ def find_beam_center_with_beamstop(img, z: int = None, method='thresh', plot=Fal
     return np.array((dx, dy))
 
 
+def find_beam_centers(imgs, sigma: int = 30, m: int = 100, kind: int = 3,
+                      use_beamstop: bool = False, processes: int = None) -> np.ndarray:
+    """Find the beam centers for a series of images, returns an array with
+    shape `(n, 2)`. The centers are the same as returned by
+    `find_beam_center` (or `find_beam_center_with_beamstop` with `z=99` if
+    `use_beamstop` is set) for each of the images.
+
+    imgs:
+        Stack of images with shape `(n, ny, nx)`, or an iterable of images
+    sigma, m, kind:
+        Passed to `find_beam_center`
+    use_beamstop: bool
+        Use the beamstop-aware beam center finder. Each image is processed
+        separately, so the images are distributed over a process pool.
+    processes: int
+        Number of processes to use with `use_beamstop`, defaults to the
+        number of CPUs. Set to 1 to process the images sequentially.
+    """
+    if use_beamstop:
+        from concurrent.futures import ProcessPoolExecutor
+        from functools import partial
+
+        func = partial(find_beam_center_with_beamstop, z=99)
+
+        if processes == 1:
+            centers = list(map(func, imgs))
+        else:
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                centers = list(executor.map(func, imgs, chunksize=8))
+
+        return np.array(centers, dtype=float).reshape(-1, 2)
+
+    if isinstance(imgs, np.ndarray) and imgs.ndim == 3:
+        xx = np.sum(imgs, axis=2)
+        yy = np.sum(imgs, axis=1)
+    else:
+        projections = [(np.sum(img, axis=1), np.sum(img, axis=0)) for img in imgs]
+        if not projections:
+            return np.empty((0, 2))
+        xx, yy = (np.stack(arr) for arr in zip(*projections))
+
+    cx = find_peak_max_stack(xx, sigma, m=m, kind=kind)
+    cy = find_peak_max_stack(yy, sigma, m=m, kind=kind)
+
+    return np.stack([cx, cy], axis=1)
+
+
 def printer(data) -> None:
     """Print things to stdout on one line dynamically."""
     sys.stdout.write('\r\x1b[K' + data.__str__())
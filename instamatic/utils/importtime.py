@@ -0,0 +1,97 @@
+import subprocess as sp
+import sys
+from collections import defaultdict
+from collections import namedtuple
+
+
+ImportTime = namedtuple('ImportTime', ['name', 'level', 'self_us', 'cumulative_us'])
+
+
+def parse_importtime(lines) -> list:
+    """Parse the output of `python -X importtime`.
+
+    Returns a list of `ImportTime` tuples in the order they were
+    reported, where `level` is the nesting depth of the import.
+    """
+    entries = []
+    for line in lines:
+        if not line.startswith('import time:'):
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        try:
+            self_us = int(self_us)
+            cumulative_us = int(cumulative_us)
+        except ValueError:
+            continue  # header line
+        name = name.rstrip()
+        stripped = name.lstrip()
+        level = (len(name) - len(stripped) - 1) // 2
+        entries.append(ImportTime(stripped, level, self_us, cumulative_us))
+    return entries
+
+
+def profile_import(module: str) -> list:
+    """Import `module` in a fresh interpreter and return the import times
+    (see `parse_importtime`)."""
+    p = sp.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+               stdout=sp.DEVNULL, stderr=sp.PIPE, universal_newlines=True)
+    if p.returncode != 0:
+        raise RuntimeError(f'Could not import `{module}`:\n{p.stderr}')
+    return parse_importtime(p.stderr.splitlines())
+
+
+def summarize(entries: list) -> dict:
+    """Sum the self time of all modules per top-level package."""
+    totals = defaultdict(int)
+    for entry in entries:
+        totals[entry.name.split('.')[0]] += entry.self_us
+    return dict(totals)
+
+
+def main():
+    import argparse
+
+    description = """
+Report the import time of instamatic modules, to find out what slows down the startup of the GUI and the servers.
+
+Every module is imported in a fresh interpreter using `python -X importtime`. For each of them, the total import time is given, together with the most expensive instamatic modules (cumulative, including everything they import) and the time spent per top-level package (self time only)."""
+
+    parser = argparse.ArgumentParser(
+        description=description,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+
+    parser.add_argument('modules',
+                        type=str, nargs='*', metavar='module',
+                        help='Modules to profile (default: instamatic.gui, instamatic.camera, instamatic.TEMController)')
+
+    parser.add_argument('-n', '--top',
+                        action='store', type=int, dest='top',
+                        help='Number of entries to show per table (default: %(default)s)')
+
+    parser.set_defaults(top=10)
+    options = parser.parse_args()
+
+    modules = options.modules or ('instamatic.gui', 'instamatic.camera', 'instamatic.TEMController')
+
+    for module in modules:
+        entries = profile_import(module)
+        total = sum(entry.self_us for entry in entries)
+
+        print(f'\n{module}: {total / 1000:.0f} ms')
+
+        own = [entry for entry in entries if entry.name.startswith('instamatic')]
+        own = sorted(own, key=lambda entry: entry.cumulative_us, reverse=True)
+
+        print(f'\n  {"cumulative (ms)":>16s}  instamatic module')
+        for entry in own[:options.top]:
+            print(f'  {entry.cumulative_us / 1000:16.1f}  {entry.name}')
+
+        totals = sorted(summarize(entries).items(), key=lambda item: item[1], reverse=True)
+
+        print(f'\n  {"self (ms)":>16s}  package')
+        for name, self_us in totals[:options.top]:
+            print(f'  {self_us / 1000:16.1f}  {name}')
+
+
+if __name__ == '__main__':
+    main()
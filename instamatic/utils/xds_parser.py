@@ -179,6 +179,42 @@ class xds_parser:
         d['spgr'] = self.space_group
         return d
 
+    def summary_as_dict(self):
+        """Cell parameters (see `cell_as_dict`) and the integration
+        statistics over all data."""
+        d = self.cell_as_dict()
+        total = self.d['total']
+        d['dmin'] = self.d['res_range'][1]
+        d['completeness'] = total['completeness']
+        d['ios'] = total['ios']
+        d['rmeas'] = total['rmeas']
+        d['cchalf'] = total['cchalf']
+        d['ISa'] = self.d['ISa']
+        return d
+
+
+def _parse(fn):
+    """Parse `fn`, returns None if the file cannot be parsed."""
+    try:
+        p = xds_parser(fn)
+    except (UnboundLocalError, OSError):
+        return None
+    return p if p.d else None
+
+
+def parse_xds_files(fns, max_workers: int = None) -> list:
+    """Parse the XDS output files `fns` concurrently in a process pool, and
+    return the `xds_parser` instances of the files that could be parsed, in
+    the same order. Set `max_workers=1` to parse them one by one."""
+    if max_workers == 1:
+        ps = [_parse(fn) for fn in fns]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            ps = list(executor.map(_parse, fns, chunksize=8))
+
+    return [p for p in ps if p is not None]
+
 
 def cells_to_excel(ps, out='cells.xlsx'):
     """Takes a list of `xds_parser` instances and writes the cell parameters to
@@ -261,15 +297,7 @@ def main():
     fns = parse_fns(fns)
     print(f'Found {len(fns)} files matching CORRECT.LP\n')
 
-    xdsall = []
-    for fn in fns:
-        try:
-            p = xds_parser(fn)
-        except UnboundLocalError:
-            continue
-        else:
-            if p.d:
-                xdsall.append(p)
+    xdsall = parse_xds_files(fns)
 
     for i, p in enumerate(xdsall):
         print(p.cell_info(sequence=i))
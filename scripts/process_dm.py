@@ -4,6 +4,7 @@ from pathlib import Path
 import numpy as np
 from PIL import Image
 
+from instamatic.processing.cache import ProcessingCache
 from instamatic.processing.ImgConversionDM import ImgConversionDM as ImgConversion
 
 # Script to process cRED data collecting using the DigitalMicrograph script `insteaDMatic`
@@ -19,6 +20,10 @@ from instamatic.processing.ImgConversionDM import ImgConversionDM as ImgConversi
 #
 # If the first argument is given as `all`, the script will look for
 # all `cred_log.txt` files in the subdirectories, and iterate over those.
+#
+# The frames, beam centers and written files are kept in a cache in the
+# subdirectory `.instamatic_cache`, so that a re-run only recomputes and
+# rewrites what changed (see `instamatic.processing.cache`).
 
 
 def relativistic_wavelength(voltage: float = 200):
@@ -36,7 +41,7 @@ def relativistic_wavelength(voltage: float = 200):
     return round(wl * 1e10, 6)  # m -> Angstrom
 
 
-def img_convert(credlog, tiff_path='tiff2', mrc_path='RED', smv_path='SMV'):
+def img_convert(credlog, tiff_path='tiff2', mrc_path='RED', smv_path='SMV', use_cache=True):
     credlog = Path(credlog)
     drc = credlog.parent
 
@@ -117,16 +122,27 @@ def img_convert(credlog, tiff_path='tiff2', mrc_path='RED', smv_path='SMV'):
         p = Path(s)
         return int(p.stem.split('_')[-1])
 
-    for i, fn in enumerate(image_fns):
-        j = extract_image_number(fn)
+    def read_image(fn):
         img = np.array(Image.open(fn))
 
         if img.dtype != np.uint16:
             # cast to 16 bit uint16
             img = (2**16 - 1) * (img - img.min()) / (img.max() - img.min())
 
-        h = {'ImageGetTime': timestamp, 'ImageExposureTime': exposure_time}
-        buffer.append((j, img, h))
+        return img, {}
+
+    if use_cache:
+        cache = ProcessingCache(drc)
+        buffer = cache.load_frames(image_fns, reader=read_image, index=extract_image_number, tag='dm')
+    else:
+        cache = None
+        for i, fn in enumerate(image_fns):
+            j = extract_image_number(fn)
+            img, h = read_image(fn)
+            buffer.append((j, img, h))
+
+    for j, img, h in buffer:
+        h.update({'ImageGetTime': timestamp, 'ImageExposureTime': exposure_time})
 
     img_conv = ImgConversion(buffer=buffer,
                              osc_angle=osc_angle,
@@ -150,7 +166,12 @@ def img_convert(credlog, tiff_path='tiff2', mrc_path='RED', smv_path='SMV'):
     img_conv.threadpoolwriter(tiff_path=tiff_path,
                               mrc_path=mrc_path,
                               smv_path=smv_path,
-                              workers=8)
+                              workers=8,
+                              cache=cache)
+
+    if cache:
+        cache.update_beam_centers(img_conv)
+        cache.save()
 
     if mrc_path:
         img_conv.write_ed3d(mrc_path)
@@ -11,6 +11,10 @@ Defaults to `cred_log.txt` in the current directory if left blank.
 
 If the first argument is given as `all`, the script will look for
 all `cred_log.txt` files in the subdirectories, and iterate over those.
+
+The frames, beam centers and written files are kept in a cache in the
+subdirectory `.instamatic_cache`, so that a re-run only recomputes and
+rewrites what changed (see `instamatic.processing.cache`).
 """
 import sys
 from pathlib import Path
@@ -19,6 +23,7 @@ import matplotlib.pyplot as plt
 import numpy as np
 
 from instamatic.formats import read_tiff
+from instamatic.processing.cache import ProcessingCache
 from instamatic.processing.ImgConversionTPX import ImgConversionTPX as ImgConversion
 
 
@@ -70,7 +75,7 @@ def center_images(img_conv, plot=True):
         plt.show()
 
 
-def reprocess(credlog, tiff_path=None, mrc_path=None, smv_path='SMV_reprocessed'):
+def reprocess(credlog, tiff_path=None, mrc_path=None, smv_path='SMV_reprocessed', use_cache=True):
     credlog = Path(credlog)
     drc = credlog.parent
     image_fns = list(drc.glob('tiff/*.tiff'))
@@ -130,10 +135,15 @@ def reprocess(credlog, tiff_path=None, mrc_path=None, smv_path='SMV_reprocessed'
         p = Path(s)
         return int(p.stem.split('_')[-1])
 
-    for i, fn in enumerate(image_fns):
-        j = extract_image_number(fn)
-        img, h = read_tiff(fn)
-        buffer.append((j, img, h))
+    if use_cache:
+        cache = ProcessingCache(drc)
+        buffer = cache.load_frames(image_fns, reader=read_tiff, index=extract_image_number, tag='tpx')
+    else:
+        cache = None
+        for i, fn in enumerate(image_fns):
+            j = extract_image_number(fn)
+            img, h = read_tiff(fn)
+            buffer.append((j, img, h))
 
     img_conv = ImgConversion(buffer=buffer,
                              osc_angle=osc_angle,
@@ -168,7 +178,12 @@ def reprocess(credlog, tiff_path=None, mrc_path=None, smv_path='SMV_reprocessed'
     img_conv.threadpoolwriter(tiff_path=tiff_path,
                               mrc_path=mrc_path,
                               smv_path=smv_path,
-                              workers=8)
+                              workers=8,
+                              cache=cache)
+
+    if cache:
+        cache.update_beam_centers(img_conv)
+        cache.save()
 
     if mrc_path:
         img_conv.write_ed3d(mrc_path)
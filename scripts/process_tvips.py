@@ -11,6 +11,10 @@ Defaults to `cred_log.txt` in the current directory if left blank.
 
 If the first argument is given as `all`, the script will look for
 all `cred_log.txt` files in the subdirectories, and iterate over those.
+
+The frames, beam centers and written files are kept in a cache in the
+subdirectory `.instamatic_cache`, so that a re-run only recomputes and
+rewrites what changed (see `instamatic.processing.cache`).
 """
 import sys
 from pathlib import Path
@@ -18,6 +22,7 @@ from pathlib import Path
 import numpy as np
 import tifffile
 
+from instamatic.processing.cache import ProcessingCache
 from instamatic.processing.ImgConversionTVIPS import ImgConversionTVIPS as ImgConversion
 from instamatic.tools import get_acquisition_time
 from instamatic.tools import relativistic_wavelength
@@ -28,7 +33,7 @@ def extract_image_number(s):
     return int(p.stem.split('_')[-1])
 
 
-def img_convert(credlog, tiff_path=None, pets_path='PETS', mrc_path='RED', smv_path='SMV'):
+def img_convert(credlog, tiff_path=None, pets_path='PETS', mrc_path='RED', smv_path='SMV', use_cache=True):
     credlog = Path(credlog)
     drc = credlog.parent
 
@@ -148,25 +153,32 @@ def img_convert(credlog, tiff_path=None, pets_path='PETS', mrc_path='RED', smv_p
 
     buffer = []
 
-    print()
-    print('Reading data')
-    for i, fn in enumerate(image_fns):
-        j = i + 1  # j must be 1-indexed
-
-        im = ims[i]
-        h = hs[i]
-
-        img = im.asarray()
+    def read_image(fn):
+        img = tifffile.imread(fn)
 
         if img.dtype.type is np.int16:
             if img.min() >= 0 and img.max() < 2**16:
                 img = img.astype(np.uint16)
 
-        assert img.dtype.type is np.uint16, f'Image (#{i}:{fn.stem}) dtype is {img.dtype} (must be np.uint16)'
+        assert img.dtype.type is np.uint16, f'Image ({fn.stem}) dtype is {img.dtype} (must be np.uint16)'
 
-        h = {'ImageGetTime': timestamp, 'ImageExposureTime': exposure_time}
+        return img, {}
 
-        buffer.append((j, img, h))
+    print()
+    print('Reading data')
+    if use_cache:
+        cache = ProcessingCache(drc)
+        # j must be 1-indexed, which is the default
+        buffer = cache.load_frames(image_fns, reader=read_image, tag='tvips', use_beamstop=True)
+    else:
+        cache = None
+        for i, fn in enumerate(image_fns):
+            j = i + 1  # j must be 1-indexed
+            img, h = read_image(fn)
+            buffer.append((j, img, h))
+
+    for j, img, h in buffer:
+        h.update({'ImageGetTime': timestamp, 'ImageExposureTime': exposure_time})
 
     print('Setting up image conversion')
     img_conv = ImgConversion(buffer=buffer,
@@ -202,7 +214,12 @@ def img_convert(credlog, tiff_path=None, pets_path='PETS', mrc_path='RED', smv_p
     img_conv.threadpoolwriter(tiff_path=tiff_path,
                               mrc_path=mrc_path,
                               smv_path=smv_path,
-                              workers=8)
+                              workers=8,
+                              cache=cache)
+
+    if cache:
+        cache.update_beam_centers(img_conv)
+        cache.save()
 
     print('Writing input files')
     if mrc_path:
@@ -0,0 +1,232 @@
+"""Script to re-process all cRED datasets under a directory in parallel.
+
+To use:
+    Run `python reprocess.py [root] --kind tpx --workers 8`
+
+All directories under `root` (default: current directory) that contain a
+`cRED_log.txt` are converted with `process_tpx.py`, `process_dm.py` or
+`process_tvips.py` (`--kind`) in a process pool. Each worker process
+converts one dataset at a time, and is replaced after `--tasks-per-worker`
+datasets (Python 3.11+), so that the memory it used is returned to the
+system.
+
+The state of each dataset is kept in `reprocess_state.json` in the root
+directory. When the script is interrupted and run again, datasets that
+were converted successfully are skipped (use `--force` to convert them
+again). Together with the cache of the conversion scripts, re-running a
+campaign only redoes the work for datasets that changed.
+
+Afterwards, all `CORRECT.LP` files under the root directory are parsed
+concurrently, and the cell parameters and integration statistics are
+written to one table, `reprocess_summary.csv`.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import as_completed
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from instamatic.utils.xds_parser import parse_xds_files
+
+STATE_FILE = 'reprocess_state.json'
+SUMMARY_FILE = 'reprocess_summary.csv'
+
+CONVERTERS = {
+    'tpx': ('scripts.process_tpx', 'reprocess'),
+    'dm': ('scripts.process_dm', 'img_convert'),
+    'tvips': ('scripts.process_tvips', 'img_convert'),
+}
+
+SUMMARY_COLUMNS = 'dataset spgr a b c al be ga volume dmin completeness ios rmeas cchalf ISa'.split()
+
+
+def find_datasets(root: str, pattern: str = '**/cRED_log.txt') -> list:
+    """Return the `cRED_log.txt` files under `root`, sorted by path."""
+    return sorted(Path(root).glob(pattern))
+
+
+def _init_worker():
+    # figures are only saved, never shown
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def _convert(converter: tuple, credlog: str) -> float:
+    """Convert the dataset with `credlog` in a worker process, returns the
+    time it took. `converter` is a tuple (module, function), see
+    `CONVERTERS`."""
+    import importlib
+
+    module, func = converter
+    func = getattr(importlib.import_module(module), func)
+
+    t0 = time.perf_counter()
+    with open(Path(credlog).parent / 'reprocess.log', 'w') as log:
+        # keep the output of the datasets apart
+        stdout = sys.stdout
+        sys.stdout = log
+        try:
+            func(credlog)
+        except BaseException:
+            traceback.print_exc(file=log)
+            raise
+        finally:
+            sys.stdout = stdout
+
+    return time.perf_counter() - t0
+
+
+class ReprocessState:
+    """Keeps track of the datasets that were converted in the JSON file
+    `fn`, so that an interrupted run can be resumed."""
+
+    def __init__(self, fn: str):
+        self.fn = Path(fn)
+        try:
+            with open(self.fn) as f:
+                self.datasets = json.load(f)
+        except FileNotFoundError:
+            self.datasets = {}
+
+    def is_done(self, credlog) -> bool:
+        return self.datasets.get(str(credlog), {}).get('status') == 'done'
+
+    def update(self, credlog, **kwargs) -> None:
+        self.datasets[str(credlog)] = kwargs
+
+        tmp = self.fn.with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(self.datasets, f, indent=2)
+        os.replace(tmp, self.fn)
+
+
+def reprocess_datasets(credlogs: list,
+                       kind: str = 'tpx',
+                       state: ReprocessState = None,
+                       workers: int = None,
+                       tasks_per_worker: int = 1,
+                       force: bool = False,
+                       ) -> dict:
+    """Convert the datasets given by `credlogs` in a process pool.
+
+    Returns a dict with the number of datasets that were converted,
+    skipped or failed.
+    """
+    todo = [fn for fn in credlogs if force or state is None or not state.is_done(fn)]
+    counts = {'done': 0, 'skipped': len(credlogs) - len(todo), 'failed': 0}
+
+    if counts['skipped']:
+        print(f'Skipping {counts["skipped"]} datasets that were already converted')
+
+    if not todo:
+        return counts
+
+    kwargs = {}
+    if sys.version_info >= (3, 11):
+        # older versions keep the workers until the pool is shut down
+        kwargs['max_tasks_per_child'] = tasks_per_worker
+
+    t0 = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, **kwargs) as executor:
+        futures = {executor.submit(_convert, CONVERTERS[kind], str(fn)): fn for fn in todo}
+
+        for n, future in enumerate(as_completed(futures), start=1):
+            fn = futures[future]
+            try:
+                duration = future.result()
+            except BaseException as e:
+                status, msg = 'failed', f'{e.__class__.__name__}: {e}'
+                duration = None
+            else:
+                status, msg = 'done', f'{duration:.1f} s'
+
+            counts[status] += 1
+            if state is not None:
+                state.update(fn, status=status, message=msg, time=time.time())
+
+            elapsed = time.perf_counter() - t0
+            remaining = elapsed / n * (len(todo) - n)
+            print(f'[{n}/{len(todo)}] {status:6s} {fn.parent} ({msg}) - {remaining:.0f} s remaining')
+
+    return counts
+
+
+def write_summary(ps: list, root: str, out: str) -> list:
+    """Write the cell parameters and integration statistics of the
+    `xds_parser` instances `ps` to the CSV file `out`.
+
+    Returns the rows of the table.
+    """
+    rows = []
+    for p in ps:
+        row = p.summary_as_dict()
+        row['dataset'] = str(p.filename.parent.relative_to(Path(root).resolve()))
+        rows.append(row)
+
+    with open(out, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+
+    return rows
+
+
+def main():
+    description = __doc__.split('\n')[0]
+
+    parser = argparse.ArgumentParser(description=description,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+
+    parser.add_argument('root', nargs='?', default='.',
+                        help='Directory to search for cRED_log.txt files')
+    parser.add_argument('-k', '--kind', choices=CONVERTERS.keys(), default='tpx',
+                        help='Which conversion script to use')
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help='Number of worker processes (default: number of CPUs)')
+    parser.add_argument('-t', '--tasks-per-worker', type=int, default=1,
+                        help='Number of datasets a worker converts before it is replaced')
+    parser.add_argument('-f', '--force', action='store_true',
+                        help='Also convert datasets that were converted before')
+    parser.add_argument('--no-convert', action='store_false', dest='convert',
+                        help='Only parse the XDS results')
+
+    options = parser.parse_args()
+    root = Path(options.root)
+
+    if options.convert:
+        credlogs = find_datasets(root)
+        print(f'Found {len(credlogs)} datasets in {root.resolve()}')
+
+        state = ReprocessState(root / STATE_FILE)
+        counts = reprocess_datasets(credlogs,
+                                    kind=options.kind,
+                                    state=state,
+                                    workers=options.workers,
+                                    tasks_per_worker=options.tasks_per_worker,
+                                    force=options.force)
+        print('Converted {done}, skipped {skipped}, failed {failed} datasets'.format(**counts))
+
+    fns = sorted(root.resolve().glob('**/CORRECT.LP'))
+    ps = parse_xds_files(fns, max_workers=options.workers)
+    print(f'Parsed {len(ps)}/{len(fns)} CORRECT.LP files')
+
+    if ps:
+        rows = write_summary(ps, root, out=root / SUMMARY_FILE)
+
+        print()
+        print('{:40s} {:>4s} {:>7s} {:>7s} {:>7s} {:>6s} {:>6s} {:>6s} {:>5s} {:>6s} {:>6s}'.format(
+            'dataset', 'spgr', 'a', 'b', 'c', 'al', 'be', 'ga', 'dmin', 'compl', 'CC1/2'))
+        for row in rows:
+            print('{dataset:40s} {spgr:4d} {a:7.2f} {b:7.2f} {c:7.2f} {al:6.1f} {be:6.1f} {ga:6.1f} '
+                  '{dmin:5.2f} {completeness:6.1f} {cchalf:6.1f}'.format(**row))
+        print(f'\nSummary written to {root / SUMMARY_FILE}')
+
+
+if __name__ == '__main__':
+    main()
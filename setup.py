@@ -64,7 +64,8 @@ setup(
             'instamatic.xdsserver = instamatic.server.xds_server:main',
             'instamatic.temserver_fei = instamatic.server.TEMServer_FEI:main',
             'instamatic.goniotoolserver = instamatic.server.goniotool_server:main',
-            'instamatic.autoconfig = instamatic.config.autoconfig:main']},
+            'instamatic.autoconfig = instamatic.config.autoconfig:main',
+            'instamatic.importtime = instamatic.utils.importtime:main']},
     packages=[
         'instamatic',
         'instamatic.TEMController',
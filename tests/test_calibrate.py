@@ -0,0 +1,26 @@
+import numpy as np
+from skimage.registration import phase_cross_correlation
+
+from instamatic.calibrate.calibrate_stagematrix import cross_correlate_image_pairs
+from instamatic.calibrate.correlate import CrossCorrelator
+
+
+def test_cross_correlator():
+    rng = np.random.RandomState(0)
+    reference = rng.random_sample((128, 128))
+    shifts = [(3, -5), (0, 7), (-12, 4)]
+    imgs = [np.roll(reference, shift, axis=(0, 1)) + 0.1 * rng.random_sample((128, 128)) for shift in shifts]
+
+    with CrossCorrelator() as cc:
+        registration = cc.reference(reference)
+        futures = [cc.submit(registration, img) for img in imgs]
+
+    for img, shift, future in zip(imgs, shifts, futures):
+        ret = future.result()
+        np.testing.assert_allclose(ret[0], -np.array(shift))
+        np.testing.assert_allclose(ret[0], phase_cross_correlation(reference, img, upsample_factor=10)[0])
+
+    pairs = list(zip([reference] + imgs[:-1], imgs))
+    translations = cross_correlate_image_pairs(pairs)
+    np.testing.assert_allclose(translations[0], -np.array(shifts[0]))
+    np.testing.assert_allclose(translations[1], np.array(shifts[0]) - shifts[1], atol=0.1)
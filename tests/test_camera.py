@@ -22,3 +22,155 @@ def test_functions(ctrl):
     dims = ctrl.cam.getImageDimensions()
     assert isinstance(dims, tuple)
     assert len(dims) == 2
+
+
+def test_frame_buffer():
+    import threading
+    import numpy as np
+    from instamatic.camera.framebuffer import FrameBuffer
+
+    buffer = FrameBuffer(size=4)
+    assert buffer.get() is None
+    assert buffer.latest() == []
+    assert buffer.wait(0, timeout=0.01) == (0, None)
+
+    for i in range(6):
+        assert buffer.put(np.full((8, 8), i)) == i + 1
+
+    assert len(buffer) == 4
+    frames = buffer.latest(10)
+    assert [seq for seq, frame in frames] == [3, 4, 5, 6]
+    assert [frame[0, 0] for seq, frame in frames] == [2, 3, 4, 5]
+
+    frame = buffer.get()
+    buffer.put(np.zeros((8, 8), dtype=int))
+    assert frame[0, 0] == 5
+
+    # shape change reallocates the slots
+    buffer.put(np.ones((4, 4)))
+    assert [seq for seq, frame in buffer.latest(4)] == [8]
+
+    threading.Timer(0.05, buffer.put, args=(np.ones((4, 4)),)).start()
+    seq, frame = buffer.wait(8, timeout=5)
+    assert seq == 9
+    assert frame.shape == (4, 4)
+
+
+def test_simulated_diffraction():
+    import numpy as np
+    from instamatic.camera.camera_simu import CameraSimu
+
+    cam = CameraSimu(name='test')
+    cam.pattern = 'diffraction'
+    cam.dtype = 'uint16'
+
+    img = cam.getImage(exposure=0)
+    assert img.dtype == np.uint16
+    assert img.shape == tuple(cam.dimensions)
+
+    # primary beam near the center
+    cy, cx = np.unravel_index(np.argmax(img), img.shape)
+    assert abs(cy - img.shape[0] / 2) < 10
+    assert abs(cx - img.shape[1] / 2) < 10
+
+    assert not np.array_equal(img, cam.getImage(exposure=0))
+
+
+def test_serval_stream():
+    import time
+    import numpy as np
+    from instamatic.camera.serval_simu import ServalSimuServer
+    from instamatic.camera.serval_stream import read_pgm
+    from instamatic.camera.serval_stream import ServalStream
+
+    with ServalSimuServer(port=0, shape=(64, 32)) as server:
+        simu = server.simu
+        config = dict(simu.detector_config)
+
+        with ServalStream(server.url, exposure=0.005) as stream:
+            assert simu.detector_config['TriggerMode'] == 'CONTINUOUS'
+            frames = [stream.get(timeout=1.0) for i in range(10)]
+
+        assert [frame.index for frame in frames] == list(range(1, 11))
+        assert all(frame.image.shape == (64, 32) for frame in frames)
+        assert np.array_equal(frames[0].image, simu.frame(0))
+        assert all(a.t < b.t for a, b in zip(frames, frames[1:]))
+
+        # measurement is stopped and the configuration restored
+        assert simu.status == 'DA_STOPPED'
+        assert simu.detector_config == config
+
+        # frames are binned in software, and dropped when the queue is full
+        with ServalStream(server.url, exposure=0.005, binsize=2, maxsize=2) as stream:
+            time.sleep(0.2)
+            frames = [stream.get(timeout=1.0) for i in range(2)]
+
+        assert frames[0].image.shape == (32, 16)
+        assert frames[0].image.sum() == simu.frame(frames[0].index - 1).sum()
+        assert stream.ndropped > 0
+        assert frames[0].index > 1
+
+    arr = np.arange(12, dtype=np.uint16).reshape(3, 4) * 1000
+    data = b'P5\n# comment\n4 3\n65535\n' + arr.astype('>u2').tobytes()
+    assert np.array_equal(read_pgm(data), arr)
+
+
+def test_timepix_pixelmap():
+    import numpy as np
+    import pytest
+    from instamatic.camera.timepix_pixelmap import arrangeData
+    from instamatic.camera.timepix_pixelmap import correctCross
+    from instamatic.camera.timepix_pixelmap import PixelMap
+
+    factor = 2.15
+    pixelmap = PixelMap(factor=factor)
+
+    rng = np.random.default_rng(0)
+    raw = rng.integers(0, 11810, size=PixelMap.size).astype(np.int16)
+
+    ref = arrangeData(raw)
+    correctCross(ref, factor=factor)
+    ref = np.rot90(ref, k=3)
+
+    out = np.empty(PixelMap.shape, dtype=np.int16)
+    img = pixelmap(raw, out=out)
+    assert img.base is out
+
+    # pixels corrected twice (where the row and column corrections of the
+    # cross overlap) are rounded down once instead of twice
+    twice = np.rot90(np.isclose(pixelmap.gain, 1 / factor**2), k=3)
+    diff = img.astype(int) - ref
+    assert np.all(diff[~twice] == 0)
+    assert np.all((diff[twice] >= 0) & (diff[twice] <= 1))
+
+    img = pixelmap(raw)
+    assert img.shape == (516, 516)
+    assert img.dtype == np.int16
+
+    with pytest.raises(ValueError):
+        pixelmap(raw, out=out.T)
+
+
+def test_buffer_pool():
+    import numpy as np
+    from instamatic.camera.framebuffer import BufferPool
+
+    pool = BufferPool((4, 4), dtype=np.int16, size=2)
+
+    a = pool.get()
+    b = pool.get()
+    assert a is not b
+
+    # `a` and `b` are still in use, so a new array is allocated
+    c = pool.get()
+    assert c is not a and c is not b
+    assert pool.nallocated == 1
+
+    # released arrays are reused, views keep them in use
+    view = b[1:]
+    del a, b, c
+    d = pool.get()
+    e = pool.get()
+    assert not np.shares_memory(d, view)
+    assert not np.shares_memory(e, view)
+    assert pool.nallocated == 2
@@ -217,6 +217,62 @@ def test_screen(ctrl):
         screen.set('rawr')
 
 
+def test_to_dict(ctrl):
+    ctrl.mode.set('mag1')
+    dct = ctrl.to_dict()
+    assert 'StagePosition' in dct
+    assert 'DiffFocus' not in dct  # not available in mag1
+
+    dct = ctrl.to_dict('BeamShift', 'SpotSize')
+    assert tuple(dct.keys()) == ('BeamShift', 'SpotSize')
+
+    with pytest.raises(KeyError):
+        ctrl.to_dict('rawr')
+
+
+def test_header_cache(ctrl):
+    from instamatic.TEMController.snapshot import HeaderSnapshot
+
+    calls = []
+
+    def getter():
+        calls.append(1)
+        return len(calls)
+
+    header = HeaderSnapshot({'a': getter, 'b': getter}, max_workers=2, max_age={'a': 60})
+
+    assert header.get(['a']) == {'a': 1}
+    assert header.get(['a']) == {'a': 1}  # cached
+    assert header.get(['b']) == {'b': 2}
+    assert header.get(['b']) == {'b': 3}  # not cached
+
+    header.invalidate('a')
+    assert header.get(['a']) == {'a': 4}
+
+    setter = header.invalidating(lambda: None, 'a')
+    setter()
+    assert header.get(['a']) == {'a': 5}
+    header.close()
+
+    # setters on the controller invalidate the cache
+    ctrl._header.max_age['BeamShift'] = 60
+    ctrl.beamshift.xy = (1, 2)
+    assert ctrl.to_dict('BeamShift')['BeamShift'] == (1, 2)
+    ctrl.beamshift.xy = (3, 4)
+    assert ctrl.to_dict('BeamShift')['BeamShift'] == (3, 4)
+    ctrl._header.max_age.pop('BeamShift')
+
+    # `defocus` switches to diffraction mode through the mode setter
+    ctrl._header.max_age['FunctionMode'] = 60
+    ctrl.mode.set('mag1')
+    assert ctrl.to_dict('FunctionMode')['FunctionMode'] == 'mag1'
+    ctrl.difffocus.defocus(100)
+    assert ctrl.to_dict('FunctionMode')['FunctionMode'] == 'diff'
+    ctrl.difffocus.refocus()
+    ctrl.mode.set('mag1')
+    ctrl._header.max_age.pop('FunctionMode')
+
+
 def test_align_to(ctrl):
     reference = ctrl.get_raw_image()
     pos = ctrl.stage.xy
@@ -227,6 +283,22 @@ def test_align_to(ctrl):
     assert pos != ctrl.stage.xy
 
 
+def test_simulated_latency(monkeypatch):
+    import time
+    from instamatic import config
+    from instamatic.TEMController.simu_microscope import SimuMicroscope
+
+    # restored (or removed if it was not set) after the test
+    monkeypatch.setattr(config.microscope, 'rpc_latency', 0.05, raising=False)
+    tem = SimuMicroscope()
+
+    t0 = time.perf_counter()
+    tem.getStagePosition()
+    tem.setBeamShift(0, 0)
+    assert time.perf_counter() - t0 >= 0.1
+    assert tem.getBeamShift() == (0, 0)
+
+
 if __name__ == '__main__':
     test_ctrl()
 
@@ -1,5 +1,6 @@
 import tempfile
 import threading
+from pathlib import Path
 from unittest.mock import MagicMock
 
 
@@ -27,6 +28,84 @@ def test_cred(ctrl):
     tempdrc.cleanup()
 
 
+def test_cred_stream(ctrl):
+    """Frames are written by the `StreamWriter` during the data collection."""
+    from instamatic.experiments import cred
+    from instamatic.formats import read_adsc
+
+    stopEvent = threading.Event()
+    timer = threading.Timer(1.0, stopEvent.set)
+
+    tempdrc = tempfile.TemporaryDirectory()
+    expdir = Path(tempdrc.name)
+
+    logger = MagicMock()
+
+    cexp = cred.experiment.Experiment(
+        ctrl,
+        path=expdir,
+        stop_event=stopEvent,
+        log=logger,
+        mode='simulate',
+        exposure_time=0.01,
+    )
+    timer.start()
+    assert cexp.start_collection()
+
+    nframes = cexp.nframes_diff
+    assert len(list((expdir / 'tiff').glob('*.tiff'))) == nframes
+    assert len(list((expdir / 'RED').glob('*.mrc'))) == nframes
+    assert len(list((expdir / 'SMV' / 'data').glob('*.img'))) >= nframes
+    assert (expdir / 'SMV' / 'XDS.INP').exists()
+
+    img, h = read_adsc(expdir / 'SMV' / 'data' / '00001.img')
+    assert 'OSC_RANGE' in h
+    assert img.shape == cexp.ctrl.cam.getImage().shape
+
+    tempdrc.cleanup()
+
+
+def test_cred_serval_stream(ctrl, monkeypatch):
+    """Frames are collected from the continuous stream of the stand-in
+    Serval server instead of one by one."""
+    from instamatic.camera.serval_simu import ServalSimuServer
+    from instamatic.camera.serval_stream import ServalStream
+    from instamatic.experiments import cred
+
+    stopEvent = threading.Event()
+    timer = threading.Timer(1.0, stopEvent.set)
+
+    tempdrc = tempfile.TemporaryDirectory()
+    expdir = Path(tempdrc.name)
+
+    shape = ctrl.cam.getImage().shape
+
+    with ServalSimuServer(port=0, shape=shape) as server:
+        monkeypatch.setattr(ctrl.cam, 'getFrameStream',
+                            lambda exposure, **kwargs: ServalStream(server.url, exposure=exposure),
+                            raising=False)
+
+        cexp = cred.experiment.Experiment(
+            ctrl,
+            path=expdir,
+            stop_event=stopEvent,
+            log=MagicMock(),
+            mode='simulate',
+            exposure_time=0.01,
+            use_stream=True,
+        )
+        assert cexp.use_stream
+
+        timer.start()
+        assert cexp.start_collection()
+
+    nframes = cexp.nframes_diff
+    assert nframes > 10
+    assert len(list((expdir / 'tiff').glob('*.tiff'))) == nframes
+
+    tempdrc.cleanup()
+
+
 def test_cred_tvips(ctrl):
     from instamatic.experiments import cRED_tvips
 
@@ -88,3 +167,96 @@ def test_red(ctrl):
     red_exp.finalize()
 
     tempdrc.cleanup()
+
+
+def test_autocred_tracking():
+    import numpy as np
+
+    from instamatic.experiments.autocred.experiment import Experiment
+    from instamatic.experiments.autocred.tracking import TrackingWorker
+    from instamatic.tools import find_defocused_image_center
+
+    rng = np.random.default_rng(0)
+
+    # defocused image: bright disk with some texture
+    yy, xx = np.mgrid[0:516, 0:516]
+    img = np.where((yy - 240) ** 2 + (xx - 270) ** 2 < 80 ** 2, 1000.0, 10.0)
+    img[220:250, 260:290] = 300
+    img += rng.uniform(0, 50, size=img.shape)
+
+    exp = Experiment.__new__(Experiment)
+    exp.logger = MagicMock()
+
+    transforms = [np.eye(2) + rng.uniform(-0.3, 0.3, size=(2, 2)) for _ in range(6)]
+    (transform_imgshift, transform_imgshift2, transform_imgshift_foc,
+     transform_imgshift2_foc, transform_beamshift_d, transform_beamshift_d_defoc) = transforms
+
+    appos0 = np.array((250.0, 260.0))
+
+    tracker = TrackingWorker(exp, *transforms, calib_beamshift=None,
+                             reference_pos=appos0, reference_var=1e5, window_size=100)
+    tracker.start()
+    assert tracker.submit(1, img)
+    assert not tracker.submit(2, img)  # busy
+    result = tracker.poll(timeout=10)
+    tracker.stop()
+
+    assert not tracker.busy
+    assert result.i == 1
+
+    # the calculation as it was done inline in `auto_cred_collection`
+    transform_imgshift_ = np.linalg.inv(transform_imgshift)
+    transform_imgshift2_ = np.linalg.inv(transform_imgshift2)
+    transform_imgshift2_foc_ = np.linalg.inv(transform_imgshift2_foc)
+    transform_beamshift_d_ = np.linalg.inv(transform_beamshift_d)
+
+    shift = exp.tracking_by_particlerecog(img)
+    delta_beamshiftcoord = np.matmul(shift, transform_beamshift_d_defoc)
+    crystal_pos, r = find_defocused_image_center(img)
+    crystal_pos = crystal_pos[::-1]
+    apmv = -(crystal_pos - appos0)
+    dpmv = delta_beamshiftcoord @ transform_beamshift_d_
+    R = -transform_imgshift2_foc_ @ transform_imgshift_foc @ transform_imgshift_ + transform_imgshift2_
+    mv = apmv - dpmv @ transform_imgshift_foc @ transform_imgshift_
+    delta_imageshift2coord = np.matmul(mv, np.linalg.inv(R))
+    delta_imageshiftcoord = dpmv @ transform_imgshift_foc - delta_imageshift2coord @ transform_imgshift2_foc_ @ transform_imgshift_foc
+
+    np.testing.assert_allclose(result.delta_beamshift, delta_beamshiftcoord)
+    np.testing.assert_allclose(result.delta_imageshift, delta_imageshiftcoord)
+    np.testing.assert_allclose(result.delta_imageshift2, delta_imageshift2coord)
+
+
+def test_frame_harvester(tmp_path):
+    """Frames are written while EMMENU is recording, and are deleted from
+    the buffer with `clear_buffer`."""
+    import time
+
+    import pytest
+    from instamatic.camera.camera_simu import CameraSimu
+    from instamatic.experiments.cred_tvips.harvester import FrameHarvester
+
+    cam = CameraSimu(name='test')
+    cam.set_image_index(0)
+    cam.set_exposure(20)  # ms
+
+    cam.start_record()
+    harvester = FrameHarvester(cam, start_index=1, path=tmp_path, interval=0.05, clear_buffer=True)
+    harvester.start()
+
+    time.sleep(0.5)
+    assert harvester.nframes > 0  # frames are written during the rotation
+
+    cam.stop_record()
+    end_index = cam.get_image_index()
+    harvester.stop(end_index=end_index)
+
+    assert harvester.nframes == end_index
+    assert len(list(tmp_path.glob('*.tiff'))) == end_index
+    assert (tmp_path / '0000.tiff').exists()
+
+    timestamps = harvester.timestamps
+    assert len(timestamps) == end_index
+    assert timestamps[1] - timestamps[0] == pytest.approx(0.02)
+
+    with pytest.raises(IndexError):
+        cam.writeTiff(1, str(tmp_path / 'deleted.tiff'))
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from instamatic.processing.find_crystals import find_crystals
+from instamatic.processing.find_crystals import find_crystals_timepix
+from instamatic.processing.find_crystals import segment_crystals
+
+
+@pytest.fixture
+def img():
+    rng = np.random.RandomState(0)
+    size = 256
+    yy, xx = np.mgrid[:size, :size]
+
+    img = np.full((size, size), 200.0)
+    for cx, cy, r in ((60, 70, 12), (150, 80, 20), (190, 190, 9), (80, 180, 15)):
+        img[(xx - cx)**2 + (yy - cy)**2 < r**2] = 50.0
+
+    return img + rng.normal(0, 5, size=(size, size))
+
+
+def test_segment_crystals(img):
+    timings = {}
+    arr, seg_rw = segment_crystals(img, method='random_walker', timings=timings)
+    assert set(timings) == {'threshold', 'morphology', 'segmentation'}
+
+    arr, seg_ws = segment_crystals(img, method='watershed')
+
+    assert np.mean(seg_rw == seg_ws) > 0.95
+
+    with pytest.raises(ValueError):
+        segment_crystals(img, method='foo')
+
+
+@pytest.mark.parametrize('func', (find_crystals, find_crystals_timepix))
+def test_find_crystals(img, func):
+    timings = {}
+    crystals_rw = func(img, 2500, method='random_walker')
+    crystals_ws = func(img, 2500, method='watershed', timings=timings)
+
+    assert 'total' in timings
+    assert len(crystals_rw) == len(crystals_ws) > 0
+
+    xy_rw = sorted((round(c.x), round(c.y)) for c in crystals_rw if c.isolated)
+    xy_ws = sorted((round(c.x), round(c.y)) for c in crystals_ws if c.isolated)
+    np.testing.assert_allclose(xy_rw, xy_ws, atol=2)
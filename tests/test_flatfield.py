@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from instamatic.processing.flatfield import apply_flatfield_correction
+from instamatic.processing.flatfield import FlatfieldCorrector
+from instamatic.processing.flatfield import remove_deadpixels
+
+
+@pytest.fixture
+def flatfield():
+    np.random.seed(0)
+    return np.random.uniform(50, 150, size=(64, 64))
+
+
+@pytest.mark.parametrize('with_darkfield', (False, True))
+def test_flatfield_corrector(flatfield, with_darkfield):
+    darkfield = np.random.uniform(0, 10, size=flatfield.shape) if with_darkfield else None
+    img = np.random.randint(0, 1000, size=flatfield.shape).astype(np.uint16)
+
+    ref = apply_flatfield_correction(img, flatfield, darkfield=darkfield)
+
+    corrector = FlatfieldCorrector(flatfield, darkfield=darkfield)
+    ret = corrector(img)
+    assert ret.dtype == np.float32
+    np.testing.assert_allclose(ret, ref, rtol=1e-5)
+
+    out = np.empty(img.shape, dtype=np.float32)
+    assert corrector(img, out=out) is out
+    np.testing.assert_allclose(out, ref, rtol=1e-5)
+
+    out[:] = img
+    corrector(out, out=out)
+    np.testing.assert_allclose(out, ref, rtol=1e-5)
+
+    with pytest.warns(UserWarning):
+        small = img[:10]
+        assert corrector(small) is small
+
+
+def test_remove_deadpixels():
+    img = np.arange(25, dtype=float).reshape(5, 5)
+    deadpixels = np.array([[0, 0], [2, 2], [2, 3]])
+    img[tuple(deadpixels.T)] = 0
+
+    ret = remove_deadpixels(img.copy(), deadpixels)
+
+    assert ret[0, 0] == pytest.approx(np.mean([1, 5, 6]))
+    assert ret[2, 2] == pytest.approx(np.mean([6, 7, 8, 11, 16, 17, 18]))
+    assert ret[2, 3] == pytest.approx(np.mean([7, 8, 9, 14, 17, 18, 19]))
+
+    corrector = FlatfieldCorrector(np.ones((5, 5)), deadpixels=deadpixels)
+    np.testing.assert_allclose(corrector(img), ret)
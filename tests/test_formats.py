@@ -38,9 +38,32 @@ def test_cbf(data, header):
 
     assert os.path.exists(out)
 
-    # Reader Not implemented:
-    with pytest.raises(NotImplementedError):
-        img, h = formats.read_image(out)
+    img, h = formats.read_image(out)
+
+    assert np.array_equal(img, data)
+    assert img.dtype == data.dtype
+    assert h['X-Binary-Number-of-Elements'] == data.size
+
+
+@pytest.mark.parametrize('dtype', ('int32', 'int64'))
+def test_cbf_byte_offset(dtype):
+    from instamatic.formats.xdscbf import compByteOffset
+    from instamatic.formats.xdscbf import decByteOffset
+
+    # deltas around the int8/int16/int32 limits, and noise with 0x80 bytes inside escaped values
+    edges = np.array([0, 127, 0, 128, 0, -128, 0, 32767, 0, 32768, 0, -32768, 0, 2**31 - 1, 0, -2**31, 0, 1, 255, 0x8080, 0x80, 0])
+    if dtype == 'int64':
+        edges = np.append(edges, [2**40, -2**40, 2**40 + 0x80])
+    noise = np.random.default_rng(0).poisson(50000, size=10000)
+    arr = np.concatenate([edges, noise]).astype(dtype)
+
+    stream = compByteOffset(arr)
+    ret = decByteOffset(stream, dtype=dtype)
+
+    assert np.array_equal(ret, arr)
+    assert ret.dtype == arr.dtype
+
+    assert decByteOffset(compByteOffset(arr[:3])).tolist() == arr[:3].tolist()
 
 
 def test_mrc(data, header):
@@ -57,6 +80,56 @@ def test_mrc(data, header):
     assert isinstance(header, dict)
 
 
+def test_mrc_stack():
+    out = 'out.stack.mrc'
+
+    frames = np.random.randint(0, 1000, size=(5, 32, 24)).astype(np.uint16)
+
+    stack = formats.MRCStack.create(out, frames[0])
+    stack.append(frames[1])
+    stack.append(frames[2:])
+    stack.close()
+
+    stack = formats.MRCStack(out)
+
+    assert len(stack) == 5
+    assert stack.shape == frames.shape
+    assert isinstance(stack[0], np.memmap)
+    assert np.array_equal(stack[3], frames[3])
+    assert np.array_equal(stack[::2], frames[::2])
+    assert stack.header['mrc_amax'] == frames.max()
+
+    with pytest.raises(OSError):
+        stack.append(frames[0])
+
+    img, h = formats.read_mrc(out, index=4)
+    assert np.array_equal(img, frames[4])
+
+
+def test_hdf5_container(data, header):
+    out = 'out.container.h5'
+
+    with formats.HDF5Container(out, mode='w', compression='gzip') as f:
+        for i in range(3):
+            f.append('images', data + i, header=dict(header, i=i), image=i)
+            for k in range(2):
+                f.append('data', data * k, header={'coords': np.array([i, k]), 'angle': np.float32(0.5)}, image=i, crystal=k)
+
+    with formats.HDF5Container(out, mode='r') as f:
+        assert f.count('images') == 3
+        assert f.count('data') == 6
+
+        img, h = f.read('images', 2)
+        assert np.array_equal(img, data + 2)
+        assert h == dict(header, i=2)
+
+        i, = f.find('data', image=2, crystal=1)
+        img, h = f.read('data', i)
+        assert np.array_equal(img, data)
+        assert np.array_equal(h['coords'], [2, 1])
+        assert f.index('data')['crystal'].tolist() == [0, 1] * 3
+
+
 def test_smv(data, header):
     out = 'out.smv'
 
@@ -82,3 +155,85 @@ def test_hdf5(data, header):
 
     assert np.allclose(img, data)
     assert header == h
+
+
+def test_write_frame(tmp_path, header):
+    from instamatic.processing.ImgConversion import to_uint16
+    from instamatic.processing.ImgConversion import write_frame
+
+    rng = np.random.default_rng(0)
+    img = rng.uniform(0, 1000, size=(64, 32)).astype(np.float32)
+    expected = np.round(img, 0).astype(np.uint16)
+
+    out = to_uint16(img)
+    np.testing.assert_array_equal(out, expected)
+    assert to_uint16(img * 2) is out  # the buffer is reused
+    assert to_uint16(expected) is expected
+
+    write_frame(1, img, tiff_path=tmp_path, smv_path=tmp_path, mrc_path=tmp_path,
+                header=header, smv_header={'HEADER_BYTES': 512})
+
+    for ext in ('tiff', 'img'):
+        arr, h = formats.read_image(tmp_path / f'00001.{ext}')
+        np.testing.assert_array_equal(arr, expected)
+
+    arr, h = formats.read_image(tmp_path / '00001.mrc')
+    np.testing.assert_array_equal(arr, np.flipud(expected))
+
+
+def test_processing_cache(tmp_path):
+    from instamatic.processing.cache import ProcessingCache
+    from instamatic.processing.ImgConversionTPX import ImgConversionTPX
+
+    drc = tmp_path / 'tiff'
+    drc.mkdir()
+
+    rng = np.random.default_rng(1)
+    yy, xx = np.mgrid[0:64, 0:64]
+    fns = []
+    for i in range(1, 6):
+        img = 1000 * np.exp(-((xx - 30 - i) ** 2 + (yy - 33) ** 2) / 20) + rng.uniform(0, 10, size=(64, 64))
+        fn = drc / f'image_{i}.tiff'
+        formats.write_tiff(fn, img.astype(np.uint16), header={'ImageGetTime': 0, 'ImageExposureTime': 0.5})
+        fns.append(fn)
+
+    def run(reader, rotation_axis=0.0):
+        cache = ProcessingCache(tmp_path)
+        buffer = cache.load_frames(fns, reader=reader)
+        img_conv = ImgConversionTPX(buffer, osc_angle=0.5, start_angle=0, end_angle=2.5,
+                                    rotation_axis=rotation_axis, acquisition_time=0.5, flatfield=None,
+                                    pixelsize=0.01, physical_pixelsize=0.055, wavelength=0.025)
+        cache.update_beam_centers(img_conv)
+        img_conv.threadpoolwriter(smv_path=tmp_path / 'SMV', mrc_path=tmp_path / 'RED', workers=2, cache=cache)
+        cache.save()
+        return img_conv
+
+    img_conv = run(formats.read_tiff)
+    assert (tmp_path / '.instamatic_cache' / 'index.json').exists()
+
+    # the static part of the SMV header is formatted once
+    h1 = img_conv.get_smv_header(1, (64, 64))
+    h2 = img_conv.get_smv_header(2, (64, 64))
+    assert list(h1) == list(h2)
+    assert h1['OSC_START'] == '0.0000'
+    assert h2['PHI'] == h2['OSC_START'] == '0.5000'
+    assert img_conv.get_smv_header_template((64, 64)) is img_conv.get_smv_header_template((64, 64))
+    img_conv.mean_beam_center = (10.0, 20.0)
+    assert img_conv.get_smv_header(1, (64, 64))['BEAM_CENTER_X'] == '20.0000'
+    outputs = sorted((tmp_path / 'SMV').rglob('*.img')) + sorted((tmp_path / 'RED').glob('*.mrc'))
+    assert len(outputs) == 10
+    stamps = [fn.stat().st_mtime_ns for fn in outputs]
+
+    def fail(fn):
+        raise AssertionError(f'{fn} should be read from the cache')
+
+    # frames, beam centers and unchanged files come from the cache
+    img_conv2 = run(fail, rotation_axis=1.0)
+    assert img_conv2.headers == img_conv.headers
+    assert [fn.stat().st_mtime_ns for fn in outputs] == stamps
+
+    # modified outputs are rewritten
+    outputs[0].write_bytes(b'')
+    run(fail)
+    img, h = formats.read_adsc(outputs[0])
+    np.testing.assert_array_equal(img, img_conv.data[1])
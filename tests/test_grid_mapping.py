@@ -1,6 +1,23 @@
-def test_grid_mapping(ctrl):
+import numpy as np
+
+
+def test_grid_mapping(ctrl, tmp_path):
     gm = ctrl.grid_montage()
     gm.setup(3, 3)
-    gm.start()
+    gm.start(drc=str(tmp_path))  # `str` as documented
 
     montage = gm.to_montage()
+
+    assert len(gm.timings) == 9
+    assert {'move', 'acquire', 'expose', 'readout', 'write'} <= set(gm.timings[0])
+    assert gm.drc == tmp_path
+    assert (tmp_path / 'montage.yaml').exists()
+    assert len(list(tmp_path.glob('mont_*.tiff'))) == 9
+
+    # the overlaps correlated during the acquisition match those of pyserialem
+    precomputed = montage.raw_difference_vectors
+    montage.calculate_difference_vectors(verbose=False)
+    assert precomputed.keys() == montage.raw_difference_vectors.keys()
+    for key, item in precomputed.items():
+        np.testing.assert_array_equal(item['shift'], montage.raw_difference_vectors[key]['shift'])
+        assert item['fft_score'] == montage.raw_difference_vectors[key]['fft_score']
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from instamatic.imreg import Registration
+from instamatic.imreg import translation
+
+
+@pytest.fixture
+def imgs():
+    rng = np.random.RandomState(0)
+    reference = rng.random_sample((96, 128))
+    shifts = [(3, -5), (0, 7), (-12, 4), (20, -30)]
+    imgs = [np.roll(reference, shift, axis=(0, 1)) + 0.1 * rng.random_sample(reference.shape) for shift in shifts]
+    return reference, np.array(imgs), shifts
+
+
+@pytest.mark.parametrize('limit_shift', (False, True))
+def test_registration(imgs, limit_shift):
+    reference, imgs, shifts = imgs
+
+    reg = Registration(reference)
+    for img in imgs:
+        shift, ir = reg.translation(img, limit_shift=limit_shift, return_fft=True)
+        expected, expected_ir = translation(reference, img, limit_shift=limit_shift, return_fft=True)
+        assert shift == expected
+        np.testing.assert_array_equal(ir, expected_ir)
+
+    expected = [translation(reference, img, limit_shift=limit_shift) for img in imgs]
+    np.testing.assert_array_equal(reg.translations(imgs, limit_shift=limit_shift, batch_size=3), expected)
+
+
+@pytest.mark.parametrize('kwargs', ({'dtype': np.float32}, {'workers': 2}, {'window': 'hann'}))
+def test_registration_options(imgs, kwargs):
+    reference, imgs, shifts = imgs
+
+    # the window suppresses the edges, use only the small shifts
+    imgs, shifts = imgs[:2], shifts[:2]
+
+    reg = Registration(reference, **kwargs)
+    np.testing.assert_array_equal(reg.translations(imgs), -np.array(shifts))
+
+    shift, error, phasediff = reg.phase_cross_correlation(imgs[0], upsample_factor=10)
+    np.testing.assert_allclose(shift, -np.array(shifts[0]), atol=0.1)
+
+
+def test_registration_shape(imgs):
+    reference, imgs, shifts = imgs
+
+    reg = Registration(reference)
+    with pytest.raises(ValueError):
+        reg.translation(imgs[0, :64, :64])
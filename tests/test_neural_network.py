@@ -0,0 +1,72 @@
+import numpy as np
+
+
+def predict_loop(image, weights):
+    """Reference implementation scoring a single image with the loop-based
+    layers."""
+    from instamatic.neural_network.neural_network import conv_layer
+    from instamatic.neural_network.neural_network import logistic
+    from instamatic.neural_network.neural_network import max_pooling
+    from instamatic.neural_network.neural_network import relu
+
+    x = image
+    for i in range(0, 8, 2):
+        x = max_pooling(relu(conv_layer(x, weights[i], weights[i + 1])))
+    x = relu(conv_layer(x, weights[8], weights[9]))
+    flattened = x.reshape((1, 1600))
+    dense1 = relu(np.tensordot(flattened, weights[10], axes=(1, 0)) + weights[11])
+    dense2 = relu(np.tensordot(dense1, weights[12], axes=(1, 0)) + weights[13])
+    dense3 = np.tensordot(dense2, weights[14], axes=(1, 0)) + weights[15]
+    return logistic(dense3)[0][0]
+
+
+def test_layers():
+    from instamatic.neural_network.neural_network import conv_layer
+    from instamatic.neural_network.neural_network import conv_layer_batch
+    from instamatic.neural_network.neural_network import max_pooling
+    from instamatic.neural_network.neural_network import max_pooling_batch
+    from instamatic.neural_network.neural_network import weights
+
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=(3, 17, 15, 64))
+
+    ref = np.stack([conv_layer(img, weights[2], weights[3]) for img in x])
+    out = conv_layer_batch(x, weights[2], weights[3])
+    np.testing.assert_allclose(out, ref, rtol=1e-10, atol=1e-10)
+
+    ref = np.stack([max_pooling(img) for img in x])
+    out = max_pooling_batch(x)
+    np.testing.assert_array_equal(out, ref)
+
+
+def test_predict_batch():
+    from instamatic.neural_network import predict
+    from instamatic.neural_network import predict_batch
+    from instamatic.neural_network.neural_network import weights
+
+    rng = np.random.default_rng(0)
+    # small values, so that the scores are not saturated
+    images = rng.random((4, 150, 150, 1)) * np.array([0.01, 0.02, 0.05, 0.1])[:, None, None, None]
+
+    ref = np.array([predict_loop(img, weights) for img in images])
+
+    scores = predict_batch(images)
+    assert scores.shape == (4,)
+    np.testing.assert_allclose(scores, ref, rtol=1e-10)
+
+    assert np.isclose(predict(images[0]), ref[0], rtol=1e-10)
+
+    scores = predict_batch(list(images), dtype=np.float32)
+    np.testing.assert_allclose(scores, ref, atol=1e-4)
+
+
+def test_weights_lazy():
+    from instamatic.neural_network import neural_network
+
+    neural_network.get_weights.cache_clear()
+    weights = neural_network.weights
+    assert len(weights) == 16
+    assert neural_network.get_weights() is weights  # cached
+
+    weights32 = neural_network.get_weights('float32')
+    assert all(w.dtype == np.float32 for w in weights32)
@@ -0,0 +1,35 @@
+import pytest
+
+
+@pytest.fixture()
+def datasets(tmp_path):
+    credlogs = []
+    for name in ('a', 'b', 'c/d'):
+        drc = tmp_path / name
+        drc.mkdir(parents=True)
+        fn = drc / 'cRED_log.txt'
+        fn.write_text('Rotation axis: 0.0\n')
+        credlogs.append(fn)
+    return tmp_path, credlogs
+
+
+def test_reprocess_datasets(datasets, monkeypatch):
+    from scripts import reprocess
+
+    root, credlogs = datasets
+    assert reprocess.find_datasets(root) == sorted(credlogs)
+
+    # opening the log of `b` fails, the others are "converted"
+    monkeypatch.setitem(reprocess.CONVERTERS, 'test', ('builtins', 'open'))
+    (root / 'b' / 'cRED_log.txt').unlink()
+    (root / 'b' / 'cRED_log.txt').mkdir()
+
+    state = reprocess.ReprocessState(root / reprocess.STATE_FILE)
+    counts = reprocess.reprocess_datasets(credlogs, kind='test', state=state, workers=2)
+    assert counts == {'done': 2, 'skipped': 0, 'failed': 1}
+
+    # resume: only the failed dataset is tried again
+    state = reprocess.ReprocessState(root / reprocess.STATE_FILE)
+    assert [state.is_done(fn) for fn in credlogs] == [True, False, True]
+    counts = reprocess.reprocess_datasets(credlogs, kind='test', state=state, workers=2)
+    assert counts == {'done': 0, 'skipped': 2, 'failed': 1}
@@ -0,0 +1,129 @@
+import pickle
+import socket
+import threading
+
+import numpy as np
+import pytest
+
+
+def test_framing():
+    from instamatic.server.framing import array_header
+    from instamatic.server.framing import is_array_header
+    from instamatic.server.framing import recv_array
+    from instamatic.server.framing import recv_frame
+    from instamatic.server.framing import send_array
+    from instamatic.server.framing import send_frame
+
+    a, b = socket.socketpair()
+
+    arr = np.arange(512 * 512, dtype=np.uint16).reshape(512, 512)
+    payload = pickle.dumps({'attr_name': 'getImage', 'args': (), 'kwargs': {}})
+
+    def sender():
+        send_frame(a, payload)
+        send_frame(a, pickle.dumps((200, array_header(arr))))
+        send_array(a, arr)
+        send_array(a, arr.T)  # not contiguous
+        a.close()
+
+    thread = threading.Thread(target=sender)
+    thread.start()
+
+    assert recv_frame(b) == payload
+
+    status, header = pickle.loads(recv_frame(b))
+    assert is_array_header(header)
+    out = recv_array(b, **header)
+    assert np.array_equal(out, arr)
+
+    ret = recv_array(b, out=out, **header)
+    assert ret is out  # buffer is reused
+    assert np.array_equal(ret, arr.T)
+
+    assert recv_frame(b) == b''  # connection closed
+
+    thread.join()
+    b.close()
+
+
+def test_tem_server(monkeypatch):
+    import queue
+    from concurrent.futures import ThreadPoolExecutor
+    from instamatic.server import tem_server
+    from instamatic.TEMController import microscope_client
+
+    q = queue.Queue()
+    server = tem_server.TemServer(q=q)
+    server.daemon = True
+    server.start()
+
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.bind(('localhost', 0))
+    s.listen(1)
+
+    def accept():
+        conn, addr = s.accept()
+        tem_server.handle(conn, q)
+
+    threading.Thread(target=accept, daemon=True).start()
+
+    monkeypatch.setattr(microscope_client, 'HOST', 'localhost')
+    monkeypatch.setattr(microscope_client, 'PORT', s.getsockname()[1])
+    tem = microscope_client.MicroscopeClient('simulate')
+
+    tem.setBeamShift(1, 2)
+    assert tuple(tem.getBeamShift()) == (1, 2)
+
+    with tem.batch() as batch:
+        batch.setBeamShift(3, 4)
+        batch.getBeamShift()
+        batch.setSpotSize(2)
+        batch.getSpotSize()
+    assert len(batch.results) == 4
+    assert tuple(batch.results[1]) == (3, 4)
+    assert batch.results[3] == 2
+
+    # calls from several threads are matched up with their responses
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(lambda i: tem.getSpotSize(), range(20)))
+    assert results == [2] * 20
+
+    with pytest.raises(AttributeError):
+        tem.batch().doesNotExist
+
+    tem.s.close()
+    s.close()
+
+
+def test_client_receive():
+    from instamatic.server.framing import send_frame
+    from instamatic.server.serializer import dumper
+    from instamatic.TEMController.microscope_client import MicroscopeClient
+
+    a, b = socket.socketpair()
+
+    # bypass `__init__`, which connects to a server
+    tem = MicroscopeClient.__new__(MicroscopeClient)
+    tem._ids = iter(range(10))
+    tem._pending = {}
+    tem._lock = threading.Lock()
+    tem._closed = False
+    tem.s = a
+
+    future, = tem._send([{'func_name': 'getSpotSize'}])
+
+    receiver = threading.Thread(target=tem._receive, args=(a,))
+    receiver.start()
+
+    send_frame(b, dumper((99, 200, None)))  # unknown id is skipped
+    send_frame(b, b'not a response')  # cannot be decoded
+    receiver.join(timeout=5)
+
+    assert not receiver.is_alive()
+    with pytest.raises(ConnectionError):
+        future.result(timeout=5)
+    with pytest.raises(ConnectionError):
+        tem._send([{'func_name': 'getSpotSize'}])
+
+    a.close()
+    b.close()
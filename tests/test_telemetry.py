@@ -0,0 +1,97 @@
+import json
+import math
+import urllib.request
+
+import pytest
+
+from instamatic.telemetry import ExperimentTelemetry
+from instamatic.telemetry import Histogram
+from instamatic.telemetry import Metrics
+from instamatic.telemetry import metrics
+
+
+def test_histogram():
+    hist = Histogram(buckets=(1, 2, 4, math.inf))
+    for value in (0.5, 1.5, 1.5, 3, 10):
+        hist.observe(value)
+
+    assert hist.counts == [1, 2, 1, 1]
+    assert hist.count == 5
+    assert hist.sum == pytest.approx(16.5)
+    assert hist.min == 0.5
+    assert hist.max == 10
+    assert 1 <= hist.quantile(0.5) <= 2
+    assert hist.quantile(1.0) == 10
+
+
+def test_metrics_prometheus():
+    metrics = Metrics()
+    metrics.inc('skipped_frames_total', 2, experiment='cred')
+    metrics.set('queue_depth', 3)
+    with metrics.timer('tem_rpc_seconds', func='getStagePosition'):
+        pass
+    metrics.observe('tem_rpc_seconds', 0.2, func='getStagePosition')
+
+    text = metrics.to_prometheus()
+    assert 'skipped_frames_total{experiment="cred"} 2' in text
+    assert 'queue_depth 3' in text
+    assert 'tem_rpc_seconds_bucket{func="getStagePosition",le="+Inf"} 2' in text
+    assert 'tem_rpc_seconds_count{func="getStagePosition"} 2' in text
+
+    snapshot = metrics.snapshot()
+    assert snapshot['histograms']['tem_rpc_seconds{func="getStagePosition"}']['count'] == 2
+
+    metrics.reset()
+    assert metrics.to_prometheus() == '\n'
+
+
+def test_metrics_serve():
+    metrics = Metrics()
+    metrics.inc('frames_total')
+    metrics.serve(0)
+    try:
+        host, port = metrics._server.server_address
+        with urllib.request.urlopen(f'http://{host}:{port}/metrics', timeout=5) as response:
+            body = response.read().decode()
+    finally:
+        metrics.shutdown()
+
+    assert 'frames_total 1' in body
+
+
+def test_experiment_telemetry(tmp_path):
+    fn = tmp_path / 'metrics.jsonl'
+
+    # recorded before the experiment, not part of its summary
+    metrics.inc('skipped_frames_total', 5, experiment='test')
+    metrics.observe('write_seconds', 1.0, format='tiff')
+
+    with ExperimentTelemetry(fn, experiment='test') as telemetry:
+        for i, t in enumerate((0.0, 0.5, 1.0, 1.6), start=1):
+            telemetry.frame(i, t=telemetry.t0 + t)
+        telemetry.skipped(4, n=2, reason='test')
+        metrics.observe('write_seconds', 0.01, format='tiff')
+
+    # recorded after the experiment
+    metrics.observe('write_seconds', 1.0, format='tiff')
+
+    lines = [json.loads(line) for line in fn.read_text().splitlines()]
+    events = [line['event'] for line in lines]
+    assert events == ['start', 'frame', 'frame', 'frame', 'frame', 'skipped', 'summary']
+
+    assert lines[1]['dt'] is None
+    assert lines[4]['dt'] == pytest.approx(0.6)
+
+    summary = lines[-1]
+    assert summary['frames'] == 4
+    assert summary['skipped'] == 2
+    assert summary['interval']['count'] == 3
+    assert summary['fps'] == pytest.approx(3 / 1.6)
+    assert summary['jitter'] == pytest.approx(0.0471, abs=1e-3)
+    assert summary['metrics']['counters']['skipped_frames_total{experiment="test"}'] == 2
+    assert summary['metrics']['histograms']['write_seconds{format="tiff"}']['count'] == 1
+    assert summary['metrics']['histograms']['write_seconds{format="tiff"}']['max'] == 0.01
+    assert summary['metrics']['histograms']['frame_interval_seconds{experiment="test",kind="diff"}']['count'] == 3
+
+    # the global registry keeps everything
+    assert metrics.snapshot()['counters']['skipped_frames_total{experiment="test"}'] >= 7
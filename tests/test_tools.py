@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from instamatic.tools import find_beam_center
+from instamatic.tools import find_beam_center_with_beamstop
+from instamatic.tools import find_beam_centers
+
+
+@pytest.fixture
+def imgs():
+    np.random.seed(0)
+    size = 128
+    yy, xx = np.mgrid[:size, :size]
+
+    # include a beam close to the edge, where the initial guess is returned
+    centers = [(64.3, 60.8), (20.5, 100.1), (3.0, 125.0), (90.0, 40.7)]
+
+    return np.array([1000 * np.exp(-((xx - cy)**2 + (yy - cx)**2) / 32) + np.random.poisson(5, size=(size, size))
+                     for cx, cy in centers])
+
+
+@pytest.mark.parametrize('dtype', (np.uint16, np.float32))
+def test_find_beam_centers(imgs, dtype):
+    imgs = imgs.astype(dtype)
+    ref = np.array([find_beam_center(img, sigma=10) for img in imgs])
+
+    np.testing.assert_array_equal(find_beam_centers(imgs, sigma=10), ref)
+    np.testing.assert_array_equal(find_beam_centers(iter(imgs), sigma=10), ref)
+
+
+def test_find_beam_centers_beamstop(imgs):
+    ref = np.array([find_beam_center_with_beamstop(img, z=99) for img in imgs])
+
+    np.testing.assert_array_equal(find_beam_centers(imgs, use_beamstop=True, processes=1), ref)
+    np.testing.assert_array_equal(find_beam_centers(imgs, use_beamstop=True, processes=2), ref)